@@ -1,9 +1,19 @@
 from flask import Flask
 from app.utils import db
+from app.utils.db_setup import init_db
 from app.routes import init_routes
 from app.config import Config
 from flask_cors import CORS
 from app.utils import mail
+from app.utils.mail_queue import init_mail_queue
+from app.utils.passwords import init_password_hasher
+from app.utils.rate_limit import init_rate_limiter
+from app.utils.revocation import init_token_revocations
+from app.model_warmup import init_model_warmup
+from app.record_writer import init_record_writer
+from app.drift_monitor import init_drift_monitor
+from app.cli import init_cli
+from app.utils.metrics import init_metrics
 
 def create_app():
     app = Flask(__name__)
@@ -14,18 +24,37 @@ def create_app():
     # Configure the app using your custom config
     app.config.from_object(Config)
 
-    # Initialize extensions
-    db.init_app(app)
+    # Initialize extensions (database engine and pool are tuned from the config)
+    init_db(app)
 
     # Initialize Flask-Mail
     mail.init_app(app)
+    init_mail_queue(app)
+
+    # Password hashing (optionally in a process pool)
+    init_password_hasher(app)
+
+    # Rate limits of /login and /forgotpassword
+    init_rate_limiter(app)
+
+    # Tokens revoked by /logout
+    init_token_revocations(app)
+
+    # Keep the stroke model in memory for the whole process, loaded as MODEL_LOAD_MODE says
+    init_model_warmup(app)
+    init_record_writer(app)
+
+    # Input and prediction distributions of the scored records, served on /records/drift
+    init_drift_monitor(app)
 
     # Register your blueprints (routes)
     init_routes(app)
 
-    # Create database tables (e.g., User, etc.)
-    with app.app_context():
-        db.create_all()
+    # Request counts and latencies, served on /metrics
+    init_metrics(app)
+
+    # Register the flask CLI commands (flask init-db, flask records ...)
+    init_cli(app)
 
     return app
 
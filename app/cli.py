@@ -0,0 +1,165 @@
+import os
+import click
+from flask import current_app
+from flask.cli import AppGroup
+from app.utils import db
+from app.utils.db_setup import upgrade_schema
+from app.risk_rollups import rebuild_rollups, check_rollups
+
+# Commands import the ML stack (record_io, rescore, stroke_model) when they run,
+# so registering them doesn't slow down the app's startup
+
+# File formats of flask records import/export (app.record_io.FORMATS)
+FORMATS = ('csv', 'parquet')
+
+
+@click.command('init-db')
+def init_db_command():
+    """Create the database tables that don't exist yet and add missing columns and indexes."""
+    db.create_all()
+    try:
+        changes = upgrade_schema()
+    except ValueError as e:
+        raise click.ClickException(str(e))
+    for change in changes:
+        click.echo(f"Added {change}.")
+    click.echo(f"Database tables are in place: {', '.join(sorted(db.metadata.tables))}.")
+
+# flask records ... maintenance commands for the medical records
+records_cli = AppGroup('records', help='Maintain the stored medical records.')
+
+
+@records_cli.command('rebuild-rollups')
+def rebuild_rollups_command():
+    """Recompute the risk rollups from the raw medical records."""
+    buckets = rebuild_rollups()
+    click.echo(f"Rebuilt {buckets} rollup buckets.")
+
+
+@records_cli.command('check-rollups')
+def check_rollups_command():
+    """Check that the risk rollups match the raw medical records."""
+    mismatches = check_rollups()
+    for mismatch in mismatches[:20]:
+        click.echo(f"Mismatch in {mismatch['bucket']}: expected {mismatch['expected']}, stored {mismatch['stored']}")
+    if mismatches:
+        raise click.ClickException(f"{len(mismatches)} rollup buckets don't match the records, run 'flask records rebuild-rollups'.")
+    click.echo("Rollups are consistent with the records.")
+
+
+@records_cli.command('import')
+@click.argument('path', type=click.Path(exists=True, dir_okay=False))
+@click.option('--format', 'fmt', type=click.Choice(FORMATS), help='File format, guessed from the extension by default.')
+@click.option('--batch-size', default=1000, show_default=True, help='Rows validated, inserted and committed at a time.')
+@click.option('--score', is_flag=True, help='Compute stroke_risk and prediction with the model instead of reading them from the file.')
+def import_command(path, fmt, batch_size, score):
+    """Bulk import medical records from a CSV or Parquet file."""
+    from app.record_io import format_for, import_records
+
+    def progress(summary):
+        click.echo(f"{summary['read']} rows read, {summary['inserted']} inserted, {summary['skipped']} skipped", err=True)
+
+    try:
+        summary = import_records(path, format_for(path, fmt), batch_size, score, progress=progress)
+    except (ValueError, ImportError) as e:
+        raise click.ClickException(str(e))
+    for error in summary['errors']:
+        click.echo(f"Line {error['line']}: {error['error']}")
+    click.echo(f"Imported {summary['inserted']} of {summary['read']} records.")
+
+
+@records_cli.command('export')
+@click.argument('path', type=click.Path(dir_okay=False, writable=True))
+@click.option('--format', 'fmt', type=click.Choice(FORMATS), help='File format, guessed from the extension by default.')
+@click.option('--chunk-size', default=1000, show_default=True, help='Rows read from the database at a time.')
+def export_command(path, fmt, chunk_size):
+    """Export all medical records to a CSV or Parquet file."""
+    from app.record_io import format_for, export_records
+
+    try:
+        written = export_records(path, format_for(path, fmt), chunk_size)
+    except ImportError as e:
+        raise click.ClickException(str(e))
+    click.echo(f"Exported {written} records to {path}.")
+
+
+@records_cli.command('rescore')
+@click.option('--n-jobs', type=int, help='Worker processes, -1 for every core (default RESCORE_N_JOBS).')
+@click.option('--chunk-size', type=int, help='Records scored per chunk (default RESCORE_CHUNK_SIZE).')
+@click.option('--checkpoint', type=click.Path(dir_okay=False), help='Progress file, defaults to rescore.json in the instance folder.')
+@click.option('--restart', is_flag=True, help='Ignore the checkpoint and rescore every record.')
+def rescore_command(n_jobs, chunk_size, checkpoint, restart):
+    """Rescore the stored medical records with the current model."""
+    from app.rescore import rescore_records, read_checkpoint
+    from app.stroke_model import get_model_registry
+
+    config = current_app.config
+    checkpoint = checkpoint or os.path.join(current_app.instance_path, 'rescore.json')
+    os.makedirs(os.path.dirname(os.path.abspath(checkpoint)), exist_ok=True)
+
+    # Carry on after the last committed id, as long as the model is still the same
+    start_after = 0
+    saved = None if restart else read_checkpoint(checkpoint)
+    if saved:
+        version = get_model_registry().get().version
+        if saved['model_version'] == version:
+            start_after = saved['last_id']
+            click.echo(f"Resuming after record {start_after}.", err=True)
+        else:
+            click.echo(f"Checkpoint is for model {saved['model_version']}, the current model is {version}, starting over.", err=True)
+
+    def progress(summary):
+        click.echo(f"{summary['scored']} scored, {summary['changed']} changed, up to id {summary['last_id']}, {summary['rows_per_second']:.0f} rows/s", err=True)
+
+    summary = rescore_records(
+        config['RESCORE_N_JOBS'] if n_jobs is None else n_jobs,
+        chunk_size or config['RESCORE_CHUNK_SIZE'],
+        start_after, checkpoint, progress
+    )
+    click.echo(f"Rescored {summary['scored']} records with model {summary['model_version']}, {summary['changed']} changed, {summary['skipped']} could not be scored.")
+
+
+@records_cli.command('drift-baseline')
+@click.option('--output', type=click.Path(dir_okay=False), help='Baseline file, defaults to DRIFT_BASELINE_PATH.')
+@click.option('--since', type=click.DateTime(), help='Only records created from this date on.')
+def drift_baseline_command(output, since):
+    """Save the distributions of the stored records as the baseline of /records/drift."""
+    import datetime
+    import json
+    from app.drift_monitor import sketch_from_records, baseline_path
+
+    sketch = sketch_from_records(since)
+    if not sketch['count']:
+        raise click.ClickException("No medical records to build a baseline from.")
+    output = output or baseline_path(current_app)
+    os.makedirs(os.path.dirname(os.path.abspath(output)), exist_ok=True)
+    with open(output, 'w') as baseline_file:
+        json.dump({'created_at': datetime.datetime.utcnow().isoformat(), 'source': 'medical_records',
+                   'records': sketch['count'], 'sketch': sketch}, baseline_file)
+    click.echo(f"Saved the distributions of {sketch['count']} records to {output}.")
+
+
+# flask model ... commands for the stroke model files
+model_cli = AppGroup('model', help='Manage the stroke model files.')
+
+
+@model_cli.command('export')
+@click.option('--output', type=click.Path(dir_okay=False), help='Artifact path, defaults to stroke_model.artifact in MODEL_BASE_PATH.')
+@click.option('--check-rows', default=5000, show_default=True, help='Random inputs both models must agree on, 0 skips the check.')
+def export_model_command(output, check_rows):
+    """Pack the pickled model and category maps into one memory-mappable artifact."""
+    from app.model_artifact import ArtifactError
+    from app.stroke_model import get_model_registry, export_artifact
+
+    try:
+        manifest = export_artifact(get_model_registry().base_dir, output, check_rows)
+    except ArtifactError as e:
+        raise click.ClickException(str(e))
+    arrays = manifest['arrays']
+    click.echo(f"Exported {manifest['sklearn_class']} ({len(arrays)} arrays, sha256 {manifest['sha256'][:12]}).")
+
+
+def init_cli(app):
+    app.cli.add_command(init_db_command)
+    app.cli.add_command(records_cli)
+    app.cli.add_command(model_cli)
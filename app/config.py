@@ -11,8 +11,38 @@ class Config:
     MAIL_PORT = int(os.getenv("MAIL_PORT", 587))  # Convert to integer from string
     MAIL_USE_TLS = os.getenv("MAIL_USE_TLS", "True").lower() in ["true", "1", "t"]  # Convert to boolean
 
+    # Background mail queue (off by default, mail is then sent on the request thread)
+    MAIL_QUEUE_ENABLED = os.getenv("MAIL_QUEUE_ENABLED", "False").lower() in ["true", "1", "t"]
+    MAIL_QUEUE_WORKERS = int(os.getenv("MAIL_QUEUE_WORKERS", 2))  # Worker threads, each with its own SMTP connection
+    MAIL_QUEUE_MAX_SIZE = int(os.getenv("MAIL_QUEUE_MAX_SIZE", 1000))  # Messages waiting before senders fall back to sending themselves
+    MAIL_QUEUE_BATCH_SIZE = int(os.getenv("MAIL_QUEUE_BATCH_SIZE", 20))  # Messages a worker sends in one go
+    MAIL_QUEUE_MAX_RETRIES = int(os.getenv("MAIL_QUEUE_MAX_RETRIES", 3))
+    MAIL_QUEUE_RETRY_BACKOFF = float(os.getenv("MAIL_QUEUE_RETRY_BACKOFF", 2))  # Seconds before the first retry, doubled every attempt
+    MAIL_CONNECTION_IDLE_TIMEOUT = float(os.getenv("MAIL_CONNECTION_IDLE_TIMEOUT", 30))  # Close idle SMTP connections after this many seconds
+
+    # Password hashing, existing hashes are upgraded on the next login when these change
+    PASSWORD_HASH_METHOD = os.getenv("PASSWORD_HASH_METHOD", "scrypt:32768:8:1")  # werkzeug method string with its work factors
+    PASSWORD_SALT_LENGTH = int(os.getenv("PASSWORD_SALT_LENGTH", 16))
+    PASSWORD_HASH_WORKERS = int(os.getenv("PASSWORD_HASH_WORKERS", 0))  # Processes used for hashing, 0 hashes on the request thread
+
     # Password reset token settings
     PASSWORD_RESET_SALT = os.getenv("PASSWORD_RESET_SALT", "password-reset-salt")
+    PASSWORD_RESET_MAX_AGE = int(os.getenv("PASSWORD_RESET_MAX_AGE", 3600))  # Seconds a reset link stays valid, repeated requests within it send no new mail
+
+    # Authentication cache, role changes and deletions take effect within AUTH_CACHE_TTL seconds
+    AUTH_CACHE_TTL = float(os.getenv("AUTH_CACHE_TTL", 30))
+    AUTH_CACHE_SIZE = int(os.getenv("AUTH_CACHE_SIZE", 10000))
+    # Trust the role claim of tokens issued less than AUTH_ROLE_CLAIM_MAX_AGE seconds ago (no database lookup)
+    AUTH_TRUST_TOKEN_ROLE = os.getenv("AUTH_TRUST_TOKEN_ROLE", "False").lower() in ["true", "1", "t"]
+    AUTH_ROLE_CLAIM_MAX_AGE = int(os.getenv("AUTH_ROLE_CLAIM_MAX_AGE", 300))
+
+    # Largest page GET /users returns when paginating
+    USERS_PAGE_MAX_LIMIT = int(os.getenv("USERS_PAGE_MAX_LIMIT", 1000))
+    USERS_IMPORT_MAX_ROWS = int(os.getenv("USERS_IMPORT_MAX_ROWS", 1000))  # Users one POST /users/import may register
+
+    # Serialized GET /users bodies kept per version of the users table, and the size from which they are gzipped (or brotli compressed)
+    PAYLOAD_CACHE_SIZE = int(os.getenv("PAYLOAD_CACHE_SIZE", 64))
+    COMPRESS_MIN_BYTES = int(os.getenv("COMPRESS_MIN_BYTES", 1024))
 
     # mongo uri
     MONGO_URI = os.getenv("MONGO_URI", "mongodb://localhost:27017/")
@@ -21,3 +51,82 @@ class Config:
     SQLALCHEMY_DATABASE_URI = os.getenv("DATABASE_URL", "sqlite:///default.db")
     SQLALCHEMY_TRACK_MODIFICATIONS = False  # Disable Flask-SQLAlchemy modification tracking
 
+    # Connection pool (ignored for in-memory SQLite)
+    DB_POOL_SIZE = int(os.getenv("DB_POOL_SIZE", 5))  # Connections kept open
+    DB_MAX_OVERFLOW = int(os.getenv("DB_MAX_OVERFLOW", 10))  # Extra connections allowed under load
+    DB_POOL_TIMEOUT = float(os.getenv("DB_POOL_TIMEOUT", 30))  # Seconds to wait for a free connection
+    DB_POOL_PRE_PING = os.getenv("DB_POOL_PRE_PING", "True").lower() in ["true", "1", "t"]  # Test connections before use
+    DB_POOL_RECYCLE = int(os.getenv("DB_POOL_RECYCLE", 1800))  # Replace connections older than this many seconds, -1 never
+
+    # SQLite profile applied to every connection
+    SQLITE_WAL = os.getenv("SQLITE_WAL", "True").lower() in ["true", "1", "t"]  # Write-ahead log journal
+    SQLITE_SYNCHRONOUS = os.getenv("SQLITE_SYNCHRONOUS", "NORMAL")  # OFF, NORMAL, FULL or EXTRA
+    SQLITE_BUSY_TIMEOUT = int(os.getenv("SQLITE_BUSY_TIMEOUT", 5000))  # Milliseconds a writer waits for the database lock
+
+    # Stroke model configuration
+    MODEL_BASE_PATH = os.getenv("MODEL_BASE_PATH", os.path.join(os.path.dirname(os.path.abspath(__file__)), "StrokeModels"))
+    MODEL_LOAD_MODE = os.getenv("MODEL_LOAD_MODE", "eager")  # "eager" loads the model (and imports the ML stack) in create_app, "background" in a thread started by create_app, "lazy" on the first prediction
+    MODEL_RELOAD_INTERVAL = float(os.getenv("MODEL_RELOAD_INTERVAL", 0))  # Seconds between checks for new model files, 0 disables hot reload
+    MODEL_ARTIFACT = os.getenv("MODEL_ARTIFACT", "auto")  # "auto" maps stroke_model.artifact when it is up to date, "off" always unpickles
+    MODEL_ARTIFACT_VERIFY = os.getenv("MODEL_ARTIFACT_VERIFY", "True").lower() in ["true", "1", "t"]  # Check the artifact's sha256 on load
+
+    # Cache of recent predictions, answers repeated identical requests without running the model
+    PREDICTION_CACHE_SIZE = int(os.getenv("PREDICTION_CACHE_SIZE", 10000))  # Entries kept, 0 disables the cache
+    PREDICTION_CACHE_TTL = float(os.getenv("PREDICTION_CACHE_TTL", 300))  # Seconds an entry stays valid
+
+    # Batch prediction limits
+    PREDICT_BATCH_MAX_ROWS = int(os.getenv("PREDICT_BATCH_MAX_ROWS", 10000))  # Largest batch accepted by /predict/batch
+    PREDICT_BATCH_CHUNK_SIZE = int(os.getenv("PREDICT_BATCH_CHUNK_SIZE", 1000))  # Records passed to the model per call
+
+    # Offline rescoring of the stored records (flask records rescore)
+    RESCORE_N_JOBS = int(os.getenv("RESCORE_N_JOBS", -1))  # Worker processes, joblib style (-1 uses every core, 1 scores in process)
+    RESCORE_CHUNK_SIZE = int(os.getenv("RESCORE_CHUNK_SIZE", 5000))  # Records read, scored and updated per chunk
+
+    # Micro-batching of concurrent /predict requests (off by default)
+    PREDICT_MICROBATCH_ENABLED = os.getenv("PREDICT_MICROBATCH_ENABLED", "False").lower() in ["true", "1", "t"]
+    PREDICT_MICROBATCH_WINDOW_MS = float(os.getenv("PREDICT_MICROBATCH_WINDOW_MS", 2))  # Longest a request waits for others to join its batch
+    PREDICT_MICROBATCH_MAX_ROWS = int(os.getenv("PREDICT_MICROBATCH_MAX_ROWS", 64))  # A full batch is scored right away
+    PREDICT_MICROBATCH_TIMEOUT = float(os.getenv("PREDICT_MICROBATCH_TIMEOUT", 10))  # Seconds a request waits for its result
+
+    # Model calls of /predict in a process pool, keeps CPU bound inference off the serving threads (0 scores in the request thread)
+    PREDICT_EXECUTOR_WORKERS = int(os.getenv("PREDICT_EXECUTOR_WORKERS", 0))
+    PREDICT_EXECUTOR_TIMEOUT = float(os.getenv("PREDICT_EXECUTOR_TIMEOUT", 10))  # Seconds a request waits for its result
+
+    # Write-behind for the medical records /predict stores: a background writer commits them in groups
+    RECORD_WRITE_BEHIND = os.getenv("RECORD_WRITE_BEHIND", "False").lower() in ["true", "1", "t"]
+    RECORD_WRITE_DURABILITY = os.getenv("RECORD_WRITE_DURABILITY", "sync")  # "sync" answers once the record is committed, "group" right away
+    RECORD_WRITE_MAX_ROWS = int(os.getenv("RECORD_WRITE_MAX_ROWS", 200))  # Records per transaction
+    RECORD_WRITE_MAX_DELAY_MS = float(os.getenv("RECORD_WRITE_MAX_DELAY_MS", 20))  # With durability "group", longest a record waits for others to join its transaction
+    RECORD_WRITE_BUFFER_SIZE = int(os.getenv("RECORD_WRITE_BUFFER_SIZE", 5000))  # Records waiting before requests are held back
+    RECORD_WRITE_PUT_TIMEOUT = float(os.getenv("RECORD_WRITE_PUT_TIMEOUT", 1))  # Seconds a request waits for room before writing itself
+
+    # Threads of the ASGI entry point (asgi.py) that run the Flask app
+    ASGI_THREADS = int(os.getenv("ASGI_THREADS", 32))
+
+    # Token bucket rate limits ("count/second|minute|hour|day") of /login and /forgotpassword, per client IP and per account
+    RATE_LIMIT_ENABLED = os.getenv("RATE_LIMIT_ENABLED", "True").lower() in ["true", "1", "t"]
+    RATE_LIMIT_BACKEND = os.getenv("RATE_LIMIT_BACKEND", "memory")  # "memory" per worker process, "local" shared by the workers of the host
+    RATE_LIMIT_LOGIN_PER_IP = os.getenv("RATE_LIMIT_LOGIN_PER_IP", "30/minute")
+    RATE_LIMIT_LOGIN_PER_USERNAME = os.getenv("RATE_LIMIT_LOGIN_PER_USERNAME", "10/minute")
+    RATE_LIMIT_FORGOT_PASSWORD_PER_IP = os.getenv("RATE_LIMIT_FORGOT_PASSWORD_PER_IP", "10/minute")
+    RATE_LIMIT_FORGOT_PASSWORD_PER_EMAIL = os.getenv("RATE_LIMIT_FORGOT_PASSWORD_PER_EMAIL", "5/hour")
+
+    # Distributions of the inputs and results of /predict and /predict/batch per time window, compared with a baseline on /records/drift
+    DRIFT_MONITOR_ENABLED = os.getenv("DRIFT_MONITOR_ENABLED", "True").lower() in ["true", "1", "t"]
+    DRIFT_BACKEND = os.getenv("DRIFT_BACKEND", "memory")  # "memory" per worker process, "local" merged for the workers of the host
+    DRIFT_WINDOW_SECONDS = int(os.getenv("DRIFT_WINDOW_SECONDS", 86400))
+    DRIFT_FLUSH_INTERVAL = float(os.getenv("DRIFT_FLUSH_INTERVAL", 5))  # With the local backend, seconds a worker's records may wait before they are merged
+    DRIFT_BASELINE_PATH = os.getenv("DRIFT_BASELINE_PATH", "")  # Defaults to drift_baseline.json in the instance folder
+    DRIFT_PSI_THRESHOLD = float(os.getenv("DRIFT_PSI_THRESHOLD", 0.2))  # Population stability index from which a feature counts as drifted
+
+    # Tokens revoked by /logout are kept until they expire, "memory" per worker process or "local" shared by the workers of the host
+    TOKEN_REVOCATION_BACKEND = os.getenv("TOKEN_REVOCATION_BACKEND", "memory")
+    TOKEN_REVOCATION_SYNC_INTERVAL = float(os.getenv("TOKEN_REVOCATION_SYNC_INTERVAL", 1))  # Seconds a worker may miss revocations made by another
+
+    # SQLite file for state shared by the worker processes of a host, defaults to local_store.db in the instance folder
+    LOCAL_STORE_PATH = os.getenv("LOCAL_STORE_PATH", "")
+
+    # Prometheus metrics on GET /metrics (request counts, stage and query latencies, cache hit rates), off by default
+    METRICS_ENABLED = os.getenv("METRICS_ENABLED", "False").lower() in ["true", "1", "t"]
+    METRICS_TOKEN = os.getenv("METRICS_TOKEN", "")  # When set, scrapers must send "Authorization: Bearer <token>"
+    METRICS_ALLOWED_IPS = os.getenv("METRICS_ALLOWED_IPS", "127.0.0.1,::1")  # Client addresses allowed to scrape, empty allows any
@@ -0,0 +1,306 @@
+import json
+import math
+import os
+import threading
+import time
+from sqlalchemy import select
+from app.models import MedicalRecord
+from app.utils import db
+from app.utils.local_store import get_local_store
+
+# Distribution of the inputs /predict and /predict/batch score, and of their results,
+# kept in process instead of queried from medical_records. Every scored record is added
+# to a sketch of fixed size: a histogram with fixed bins per numeric feature, a counter
+# per category value and the number of high risk predictions. Sketches of the same bins
+# add up exactly, so the workers' sketches merge into one per time window and can be
+# compared with a baseline sketch (see `flask records drift-baseline`).
+
+# Numeric features and their bins: (lowest edge, highest edge, bin width). Values
+# outside the edges are counted in an underflow and an overflow bin.
+NUMERIC_FEATURES = {
+    'age': (0, 100, 5),
+    'avg_glucose_level': (50, 300, 10),
+    'bmi': (10, 60, 2),
+}
+
+CATEGORICAL_FEATURES = ['gender', 'hypertension', 'heart_disease', 'ever_married', 'work_type', 'Residence_type', 'smoking_status']
+
+# Distinct values counted per categorical feature, the rest share the "other" counter
+MAX_CATEGORIES = 50
+
+QUANTILES = (0.05, 0.25, 0.5, 0.75, 0.95)
+
+
+def _bin_count(low, high, width):
+    return int(math.ceil((high - low) / width)) + 2
+
+
+def empty_sketch():
+    return {
+        'count': 0,
+        'high_risk': 0,
+        'numeric': {feature: {'bins': [0] * _bin_count(*edges), 'sum': 0.0} for feature, edges in NUMERIC_FEATURES.items()},
+        'categorical': {feature: {} for feature in CATEGORICAL_FEATURES},
+    }
+
+
+# Add one scored record to a sketch, in place
+def add_to_sketch(sketch, record, stroke_risk):
+    sketch['count'] += 1
+    if stroke_risk == 'High':
+        sketch['high_risk'] += 1
+    for feature, (low, high, width) in NUMERIC_FEATURES.items():
+        value = record.get(feature)
+        try:
+            value = float(value)
+        except (TypeError, ValueError):
+            continue
+        if math.isnan(value):
+            continue
+        histogram = sketch['numeric'][feature]
+        bins = histogram['bins']
+        if value < low:
+            bins[0] += 1
+        elif value >= high:
+            bins[-1] += 1
+        else:
+            bins[int((value - low) // width) + 1] += 1
+        histogram['sum'] += value
+    for feature in CATEGORICAL_FEATURES:
+        counts = sketch['categorical'][feature]
+        value = str(record.get(feature))
+        if value not in counts and len(counts) >= MAX_CATEGORIES:
+            value = 'other'
+        counts[value] = counts.get(value, 0) + 1
+
+
+# Add sketch `other` to `sketch`, in place. Returns sketch (a new one when it is None).
+def merge_sketches(sketch, other):
+    if sketch is None:
+        sketch = empty_sketch()
+    sketch['count'] += other['count']
+    sketch['high_risk'] += other['high_risk']
+    for feature, histogram in other['numeric'].items():
+        target = sketch['numeric'][feature]
+        target['bins'] = [a + b for a, b in zip(target['bins'], histogram['bins'])]
+        target['sum'] += histogram['sum']
+    for feature, counts in other['categorical'].items():
+        target = sketch['categorical'][feature]
+        for value, count in counts.items():
+            if value not in target and len(target) >= MAX_CATEGORIES:
+                value = 'other'
+            target[value] = target.get(value, 0) + count
+    return sketch
+
+
+# Approximate quantiles of a histogram, interpolated within the bin they fall in
+def histogram_quantiles(bins, low, width):
+    total = sum(bins)
+    if not total:
+        return {}
+    quantiles = {}
+    for q in QUANTILES:
+        rank = q * total
+        seen = 0
+        for position, count in enumerate(bins):
+            if count and seen + count >= rank:
+                # The underflow and overflow bins have no width, their edge is reported
+                if position == 0:
+                    value = low
+                elif position == len(bins) - 1:
+                    value = low + (len(bins) - 2) * width
+                else:
+                    value = low + (position - 1 + (rank - seen) / count) * width
+                quantiles[f"p{int(q * 100)}"] = round(value, 2)
+                break
+            seen += count
+    return quantiles
+
+
+# Population stability index of two distributions given as counts of the same buckets.
+# Below 0.1 means no real change, 0.1-0.2 a moderate and above 0.2 a significant shift.
+def population_stability_index(actual, expected, smoothing=0.5):
+    actual_total = sum(actual) + smoothing * len(actual)
+    expected_total = sum(expected) + smoothing * len(expected)
+    psi = 0.0
+    for a, e in zip(actual, expected):
+        a = (a + smoothing) / actual_total
+        e = (e + smoothing) / expected_total
+        psi += (a - e) * math.log(a / e)
+    return psi
+
+
+def _frequencies(counts):
+    total = sum(counts.values())
+    return {value: round(count / total, 4) for value, count in sorted(counts.items())} if total else {}
+
+
+# Compare a sketch with a baseline sketch, feature by feature
+def compare_sketches(current, baseline, threshold):
+    report = {'predictions': current['count'],
+              'high_risk_rate': current['high_risk'] / current['count'] if current['count'] else None,
+              'features': {}}
+    if baseline is not None:
+        report['baseline_predictions'] = baseline['count']
+        report['baseline_high_risk_rate'] = baseline['high_risk'] / baseline['count'] if baseline['count'] else None
+
+    for feature, (low, high, width) in NUMERIC_FEATURES.items():
+        bins = current['numeric'][feature]['bins']
+        total = sum(bins)
+        entry = {'mean': current['numeric'][feature]['sum'] / total if total else None,
+                 'quantiles': histogram_quantiles(bins, low, width)}
+        if baseline is not None:
+            expected = baseline['numeric'][feature]['bins']
+            expected_total = sum(expected)
+            entry['baseline_mean'] = baseline['numeric'][feature]['sum'] / expected_total if expected_total else None
+            entry['baseline_quantiles'] = histogram_quantiles(expected, low, width)
+            if total and expected_total:
+                entry['psi'] = round(population_stability_index(bins, expected), 4)
+        report['features'][feature] = entry
+
+    for feature in CATEGORICAL_FEATURES:
+        counts = current['categorical'][feature]
+        entry = {'frequencies': _frequencies(counts)}
+        if baseline is not None:
+            expected = baseline['categorical'][feature]
+            entry['baseline_frequencies'] = _frequencies(expected)
+            values = sorted(set(counts) | set(expected))
+            if counts and expected:
+                entry['psi'] = round(population_stability_index([counts.get(value, 0) for value in values],
+                                                                [expected.get(value, 0) for value in values]), 4)
+        report['features'][feature] = entry
+
+    report['drifted'] = sorted(feature for feature, entry in report['features'].items() if entry.get('psi', 0) >= threshold)
+    return report
+
+
+# Window sketches in process memory, each worker process only sees its own predictions
+class MemoryBackend:
+    def __init__(self):
+        self._windows = {}
+        self._lock = threading.Lock()
+
+    def merge(self, window, sketch, ttl):
+        with self._lock:
+            self._windows[window] = merge_sketches(self._windows.get(window), sketch)
+            # Only the current and the previous window are kept
+            for old in [key for key in self._windows if key < window - ttl / 2]:
+                del self._windows[old]
+
+    def get(self, window):
+        with self._lock:
+            sketch = self._windows.get(window)
+            return json.loads(json.dumps(sketch)) if sketch is not None else None
+
+
+# Window sketches in the local store, merged from every worker process of the host
+class LocalStoreBackend:
+    def __init__(self, store):
+        self.store = store
+
+    def merge(self, window, sketch, ttl):
+        self.store.update(f"drift:{window}", lambda current: merge_sketches(current, sketch), ttl=ttl)
+
+    def get(self, window):
+        return self.store.get(f"drift:{window}")
+
+
+class DriftMonitor:
+    def __init__(self, backend, window_seconds=86400, flush_interval=5.0):
+        self.backend = backend
+        self.window_seconds = window_seconds
+        self.flush_interval = flush_interval
+        self._lock = threading.Lock()
+        self._pending = empty_sketch()
+        self._pending_window = self.window_start()
+        self._next_flush = time.monotonic() + flush_interval
+
+    def window_start(self, now=None):
+        now = time.time() if now is None else now
+        return int(now // self.window_seconds * self.window_seconds)
+
+    # Add a scored record, a few dict and list updates. The records of the last
+    # flush_interval seconds are merged into the window's sketch together, after the
+    # lock is released: the merge may wait for the local store's write lock, and the
+    # other request threads keep adding their records meanwhile.
+    def record(self, data, stroke_risk):
+        window = self.window_start()
+        taken = []
+        with self._lock:
+            if window != self._pending_window:
+                taken.append(self._take_locked())
+                self._pending_window = window
+            add_to_sketch(self._pending, data, stroke_risk)
+            if time.monotonic() >= self._next_flush:
+                taken.append(self._take_locked())
+        self._merge(taken)
+
+    def flush(self):
+        with self._lock:
+            taken = [self._take_locked()]
+        self._merge(taken)
+
+    # Swap the pending sketch for an empty one, returns (window, sketch) or None when empty
+    def _take_locked(self):
+        self._next_flush = time.monotonic() + self.flush_interval
+        if not self._pending['count']:
+            return None
+        pending, self._pending = self._pending, empty_sketch()
+        return self._pending_window, pending
+
+    def _merge(self, taken):
+        for window, pending in filter(None, taken):
+            # Kept for two windows, the previous one stays readable after the window changed
+            self.backend.merge(window, pending, ttl=2 * self.window_seconds)
+
+    # The sketch of a window, the current one by default, including this worker's pending records
+    def sketch(self, window=None):
+        self.flush()
+        return self.backend.get(self.window_start() if window is None else window) or empty_sketch()
+
+
+# Baseline sketch saved by `flask records drift-baseline`, None when there is none yet
+def load_baseline(path):
+    if not os.path.exists(path):
+        return None
+    with open(path) as baseline_file:
+        return json.load(baseline_file)
+
+
+# Sketch of the stored medical records, read in chunks, optionally from a date on
+def sketch_from_records(since=None, chunk_size=1000):
+    sketch = empty_sketch()
+    columns = [getattr(MedicalRecord, feature) for feature in [*NUMERIC_FEATURES, *CATEGORICAL_FEATURES]]
+    query = select(*columns, MedicalRecord.stroke_risk)
+    if since is not None:
+        query = query.where(MedicalRecord.created_at >= since)
+    for row in db.session.execute(query.execution_options(yield_per=chunk_size)):
+        record = row._asdict()
+        add_to_sketch(sketch, record, record['stroke_risk'])
+    return sketch
+
+
+def baseline_path(app):
+    return app.config.get('DRIFT_BASELINE_PATH') or os.path.join(app.instance_path, 'drift_baseline.json')
+
+
+# Monitor the scored records when DRIFT_MONITOR_ENABLED is set, per worker or merged
+# through the local store (DRIFT_BACKEND)
+def init_drift_monitor(app):
+    if not app.config.get('DRIFT_MONITOR_ENABLED', True):
+        return None
+
+    backend_name = app.config.get('DRIFT_BACKEND', 'memory')
+    if backend_name == 'local':
+        backend = LocalStoreBackend(get_local_store(app))
+        flush_interval = app.config['DRIFT_FLUSH_INTERVAL']
+    elif backend_name == 'memory':
+        # Nothing to share, the pending records are merged when the sketch is read
+        backend = MemoryBackend()
+        flush_interval = app.config['DRIFT_WINDOW_SECONDS']
+    else:
+        raise ValueError(f"Unknown DRIFT_BACKEND {backend_name!r}, expected 'memory' or 'local'")
+
+    monitor = DriftMonitor(backend, app.config['DRIFT_WINDOW_SECONDS'], flush_interval)
+    app.extensions['drift_monitor'] = monitor
+    return monitor
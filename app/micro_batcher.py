@@ -0,0 +1,136 @@
+import queue
+import threading
+import time
+from concurrent.futures import Future
+import numpy as np
+from app.stroke_model import interpret_prediction
+from app.utils.metrics import PREDICTION_STAGE_SECONDS
+
+# Collects /predict requests that arrive within a short window and scores them
+# with a single model.predict call, handing every caller its own result.
+class MicroBatcher:
+    def __init__(self, registry, window_ms=2.0, max_rows=64):
+        self.registry = registry
+        self.window = window_ms / 1000.0
+        self.max_rows = max_rows
+        self._queue = queue.Queue()
+        self._worker = None
+        self._start_lock = threading.Lock()
+        self._stats_lock = threading.Lock()
+        self._batches = 0
+        self._rows = 0
+        self._largest_batch = 0
+        self._total_wait = 0.0
+        self._max_wait = 0.0
+
+    # Queue a request, the returned future resolves to the same dict predict_stroke_risk returns
+    def submit(self, data):
+        future = Future()
+
+        # Repeated inputs are answered from the prediction cache without joining a batch
+        cache_key, cached_result = self.registry.cached_prediction(data, self.registry.get())
+        if cached_result is not None:
+            future.set_result(cached_result)
+            return future
+
+        self._ensure_worker()
+        self._queue.put((data, future, time.perf_counter(), cache_key))
+        return future
+
+    # Blocking helper used by the predict view
+    def predict(self, data, timeout=None):
+        return self.submit(data).result(timeout)
+
+    # Batch sizes and the time requests spent waiting for their batch to start
+    def stats(self):
+        with self._stats_lock:
+            return {
+                'batches': self._batches,
+                'rows': self._rows,
+                'largest_batch': self._largest_batch,
+                'avg_batch_size': self._rows / self._batches if self._batches else 0.0,
+                'avg_wait_ms': self._total_wait / self._rows * 1000 if self._rows else 0.0,
+                'max_wait_ms': self._max_wait * 1000,
+                'queued': self._queue.qsize()
+            }
+
+    def _ensure_worker(self):
+        if self._worker is not None:
+            return
+        with self._start_lock:
+            if self._worker is None:
+                self._worker = threading.Thread(target=self._run, name='predict-micro-batcher', daemon=True)
+                self._worker.start()
+
+    def _run(self):
+        while True:
+            batch = [self._queue.get()]
+            # The window starts when the oldest request arrived, so no request waits longer than it
+            deadline = batch[0][2] + self.window
+            while len(batch) < self.max_rows:
+                remaining = deadline - time.perf_counter()
+                try:
+                    if remaining > 0:
+                        batch.append(self._queue.get(timeout=remaining))
+                    else:
+                        batch.append(self._queue.get_nowait())
+                except queue.Empty:
+                    break
+            self._process(batch)
+
+    def _process(self, batch):
+        started = time.perf_counter()
+        try:
+            bundle = self.registry.get()
+            if bundle.missing_from_input:
+                raise ValueError(f"Input data does not match the model's expected features. Missing: {bundle.missing_from_input}")
+
+            # Encode every request into its own row of one matrix, invalid requests fail on their own
+            matrix = np.empty((len(batch), len(bundle.feature_names)), dtype=np.float64)
+            pending = []
+            with PREDICTION_STAGE_SECONDS.time(stage='preprocess'):
+                for data, future, _, cache_key in batch:
+                    try:
+                        bundle.encode(data, out=matrix[len(pending):len(pending) + 1])
+                    except (ValueError, TypeError) as e:
+                        # e.g. a list or an object where a number belongs
+                        future.set_exception(ValueError(f"Preprocessing Error: {e}"))
+                        continue
+                    pending.append((future, cache_key))
+
+            if pending:
+                with PREDICTION_STAGE_SECONDS.time(stage='predict'):
+                    predictions = bundle.array_model.predict(matrix[:len(pending)])
+                for (future, cache_key), value in zip(pending, predictions):
+                    result = interpret_prediction(value)
+                    self.registry.cache_prediction(cache_key, result)
+                    future.set_result(result)
+        except Exception as e:
+            for _, future, _, _ in batch:
+                if not future.done():
+                    future.set_exception(e)
+        finally:
+            self._record(batch, started)
+
+    def _record(self, batch, started):
+        with self._stats_lock:
+            self._batches += 1
+            self._rows += len(batch)
+            self._largest_batch = max(self._largest_batch, len(batch))
+            for _, _, enqueued, _ in batch:
+                wait = started - enqueued
+                self._total_wait += wait
+                self._max_wait = max(self._max_wait, wait)
+
+# Put a micro-batcher in front of the model when PREDICT_MICROBATCH_ENABLED is set
+def init_micro_batcher(app, registry=None):
+    if not app.config.get('PREDICT_MICROBATCH_ENABLED'):
+        return None
+
+    batcher = MicroBatcher(
+        registry or app.extensions['stroke_model'],
+        window_ms=app.config['PREDICT_MICROBATCH_WINDOW_MS'],
+        max_rows=app.config['PREDICT_MICROBATCH_MAX_ROWS']
+    )
+    app.extensions['micro_batcher'] = batcher
+    return batcher
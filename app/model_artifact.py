@@ -0,0 +1,267 @@
+import hashlib
+import json
+import os
+import struct
+import numpy as np
+
+# Single file model artifact, written by 'flask model export':
+#
+#   8 bytes   magic "STRKMDL1"
+#   8 bytes   manifest length (little endian uint64)
+#   manifest  UTF-8 JSON: format version, model type, feature names, classes,
+#             category maps, the sha256 of the array section and where every array lives
+#   padding   up to the next multiple of ALIGNMENT
+#   arrays    raw little endian arrays, each starting on an ALIGNMENT byte boundary
+#
+# The arrays are memory-mapped read only, so loading costs a few page faults
+# instead of an unpickle, and every worker process maps the same pages of the OS page cache.
+
+MAGIC = b'STRKMDL1'
+FORMAT_VERSION = 1
+ALIGNMENT = 64
+ARTIFACT_FILE = 'stroke_model.artifact'
+
+TREE_ENSEMBLES = ('RandomForestClassifier', 'ExtraTreesClassifier')
+
+
+class ArtifactError(ValueError):
+    pass
+
+
+def _align(offset):
+    return (offset + ALIGNMENT - 1) // ALIGNMENT * ALIGNMENT
+
+
+def _sklearn_version():
+    try:
+        import sklearn
+    except ImportError:
+        return None
+    return sklearn.__version__
+
+
+def _json_value(value):
+    return value.item() if isinstance(value, np.generic) else value
+
+
+# The parameters of a fitted scikit-learn model as (model_type, plain arrays, extra manifest entries)
+def model_parameters(model):
+    name = type(model).__name__
+    if name == 'LogisticRegression':
+        arrays = {
+            'coef': np.ascontiguousarray(model.coef_, dtype='<f8'),
+            'intercept': np.ascontiguousarray(model.intercept_, dtype='<f8'),
+        }
+        return 'linear', arrays, {}
+
+    if name == 'DecisionTreeClassifier' or name in TREE_ENSEMBLES:
+        estimators = [model] if name == 'DecisionTreeClassifier' else model.estimators_
+        if getattr(model, 'n_outputs_', 1) != 1:
+            raise ArtifactError("Only single output tree models can be exported")
+
+        left, right, feature, threshold, value, roots = [], [], [], [], [], []
+        offset, depth = 0, 0
+        for estimator in estimators:
+            tree = estimator.tree_
+            # Child indexes become positions in the concatenated node arrays, leaves keep -1
+            is_leaf = tree.children_left == -1
+            left.append(np.where(is_leaf, -1, tree.children_left + offset))
+            right.append(np.where(is_leaf, -1, tree.children_right + offset))
+            feature.append(np.where(is_leaf, 0, tree.feature))
+            threshold.append(tree.threshold)
+            # Class probabilities of every node, the same normalisation as predict_proba
+            counts = tree.value[:, 0, :]
+            totals = counts.sum(axis=1, keepdims=True)
+            totals[totals == 0] = 1.0
+            value.append(counts / totals)
+            roots.append(offset)
+            offset += tree.node_count
+            depth = max(depth, tree.max_depth)
+
+        arrays = {
+            'children_left': np.concatenate(left).astype('<i4'),
+            'children_right': np.concatenate(right).astype('<i4'),
+            'feature': np.concatenate(feature).astype('<i4'),
+            'threshold': np.concatenate(threshold).astype('<f8'),
+            'value': np.ascontiguousarray(np.concatenate(value), dtype='<f8'),
+            'roots': np.asarray(roots, dtype='<i8'),
+        }
+        return ('tree' if name == 'DecisionTreeClassifier' else 'forest'), arrays, {'max_depth': int(depth)}
+
+    raise ArtifactError(f"Can't export a {name}, supported models: LogisticRegression, DecisionTreeClassifier, {', '.join(TREE_ENSEMBLES)}")
+
+
+# Pack a fitted model and its category maps into a single artifact file
+def write_artifact(path, model, category_maps):
+    model_type, arrays, extra = model_parameters(model)
+
+    layout, data_offset = {}, 0
+    for name, array in arrays.items():
+        data_offset = _align(data_offset)
+        layout[name] = {'offset': data_offset, 'dtype': array.dtype.str, 'shape': list(array.shape)}
+        data_offset += array.nbytes
+
+    checksum = hashlib.sha256()
+    for name, array in arrays.items():
+        checksum.update(array.tobytes())
+
+    feature_names = getattr(model, 'feature_names_in_', None)
+    manifest = {
+        'format_version': FORMAT_VERSION,
+        'model_type': model_type,
+        'sklearn_class': type(model).__name__,
+        'sklearn_version': _sklearn_version(),
+        'feature_names': None if feature_names is None else [str(name) for name in feature_names],
+        'n_features': int(model.n_features_in_),
+        'classes': [_json_value(value) for value in model.classes_],
+        'category_maps': {feature: {str(key): _json_value(code) for key, code in mapping.items()} for feature, mapping in category_maps.items()},
+        'arrays': layout,
+        'sha256': checksum.hexdigest(),
+        **extra,
+    }
+    manifest_bytes = json.dumps(manifest, sort_keys=True).encode()
+    header = MAGIC + struct.pack('<Q', len(manifest_bytes)) + manifest_bytes
+    data_start = _align(len(header))
+
+    # Write next to the target and rename, a running worker never maps a half written file
+    temporary = f"{path}.tmp"
+    with open(temporary, 'wb') as artifact:
+        artifact.write(header.ljust(data_start, b'\0'))
+        for name, array in arrays.items():
+            position = data_start + layout[name]['offset']
+            artifact.write(b'\0' * (position - artifact.tell()))
+            artifact.write(array.tobytes())
+    os.replace(temporary, path)
+    return manifest
+
+
+# Map an artifact and return (manifest, arrays). The arrays are read only views of the mapping.
+def read_artifact(path, verify=True):
+    with open(path, 'rb') as artifact:
+        head = artifact.read(len(MAGIC) + 8)
+        if len(head) < len(MAGIC) + 8 or head[:len(MAGIC)] != MAGIC:
+            raise ArtifactError(f"{path} is not a stroke model artifact")
+        (manifest_length,) = struct.unpack('<Q', head[len(MAGIC):])
+        manifest = json.loads(artifact.read(manifest_length))
+
+    if manifest.get('format_version') != FORMAT_VERSION:
+        raise ArtifactError(f"Unsupported artifact format version {manifest.get('format_version')}")
+
+    data_start = _align(len(MAGIC) + 8 + manifest_length)
+    mapping = np.memmap(path, dtype=np.uint8, mode='r')
+    arrays = {}
+    for name, spec in manifest['arrays'].items():
+        dtype = np.dtype(spec['dtype'])
+        start = data_start + spec['offset']
+        size = int(np.prod(spec['shape'], dtype=np.int64)) * dtype.itemsize
+        if start + size > len(mapping):
+            raise ArtifactError(f"{path} is truncated")
+        arrays[name] = mapping[start:start + size].view(dtype).reshape(spec['shape'])
+
+    if verify:
+        # The checksum covers the arrays in file order (the manifest keys are sorted)
+        checksum = hashlib.sha256()
+        for name in sorted(arrays, key=lambda name: manifest['arrays'][name]['offset']):
+            checksum.update(arrays[name].data)
+        if checksum.hexdigest() != manifest['sha256']:
+            raise ArtifactError(f"Checksum mismatch, {path} is corrupted")
+    return manifest, arrays
+
+
+# Predictions straight from the artifact arrays with NumPy, a drop-in for the
+# scikit-learn model as far as this app uses it (predict, predict_proba,
+# feature_names_in_, classes_)
+class ArtifactModel:
+    def __init__(self, manifest, arrays):
+        self.manifest = manifest
+        self.model_type = manifest['model_type']
+        self.arrays = arrays
+        self.classes_ = np.asarray(manifest['classes'])
+        self.n_features_in_ = manifest['n_features']
+        if manifest['feature_names'] is not None:
+            self.feature_names_in_ = np.asarray(manifest['feature_names'], dtype=object)
+
+    @classmethod
+    def load(cls, path, verify=True):
+        return cls(*read_artifact(path, verify))
+
+    @property
+    def category_maps(self):
+        return self.manifest['category_maps']
+
+    def _as_array(self, X):
+        X = np.asarray(X, dtype=np.float64)
+        return X.reshape(1, -1) if X.ndim == 1 else X
+
+    def predict_proba(self, X):
+        X = self._as_array(X)
+        if self.model_type == 'linear':
+            scores = X @ self.arrays['coef'].T + self.arrays['intercept']
+            if scores.shape[1] == 1:
+                positive = 1.0 / (1.0 + np.exp(-scores[:, 0]))
+                return np.column_stack([1.0 - positive, positive])
+            scores = np.exp(scores - scores.max(axis=1, keepdims=True))
+            return scores / scores.sum(axis=1, keepdims=True)
+
+        leaves = self._leaves(X)
+        value = self.arrays['value']
+        # Add the trees up one at a time, in order, exactly like the forest does
+        proba = value[leaves[:, 0]].copy()
+        for tree in range(1, leaves.shape[1]):
+            proba += value[leaves[:, tree]]
+        if leaves.shape[1] > 1:
+            proba /= leaves.shape[1]
+        return proba
+
+    def predict(self, X):
+        X = self._as_array(X)
+        if self.model_type == 'linear':
+            scores = X @ self.arrays['coef'].T + self.arrays['intercept']
+            indices = (scores[:, 0] > 0).astype(int) if scores.shape[1] == 1 else scores.argmax(axis=1)
+            return self.classes_[indices]
+        return self.classes_[self.predict_proba(X).argmax(axis=1)]
+
+    # Leaf reached by every row in every tree, walking all of them level by level
+    def _leaves(self, X):
+        # Trees compare float32 features against float64 thresholds
+        X = X.astype(np.float32).astype(np.float64)
+        left, right = self.arrays['children_left'], self.arrays['children_right']
+        feature, threshold = self.arrays['feature'], self.arrays['threshold']
+
+        nodes = np.broadcast_to(self.arrays['roots'], (X.shape[0], len(self.arrays['roots']))).copy()
+        rows = np.arange(X.shape[0])[:, None]
+        for _ in range(self.manifest['max_depth']):
+            is_leaf = left[nodes] == -1
+            if is_leaf.all():
+                break
+            go_left = X[rows, feature[nodes]] <= threshold[nodes]
+            nodes = np.where(is_leaf, nodes, np.where(go_left, left[nodes], right[nodes]))
+        return nodes
+
+
+# Random inputs spanning the category codes and the model's own split points, for
+# checking an exported artifact against the model it came from
+def comparison_inputs(n_features, category_maps, feature_names, thresholds=None, n_rows=5000, seed=0):
+    rng = np.random.default_rng(seed)
+    X = rng.uniform(0, 300, (n_rows, n_features))
+    names = list(feature_names) if feature_names is not None else []
+    for column, name in enumerate(names):
+        if name in category_maps:
+            X[:, column] = rng.choice(list(category_maps[name].values()), n_rows)
+    if thresholds is not None and len(thresholds):
+        # Values right at the split points catch float32/float64 comparison differences
+        edge = rng.choice(thresholds, (n_rows // 2, n_features))
+        X[:n_rows // 2] = edge
+    return X
+
+
+# Predictions of the model and the artifact that disagree, as a count
+def compare_predictions(model, artifact_model, category_maps, n_rows=5000):
+    feature_names = getattr(model, 'feature_names_in_', None)
+    thresholds = artifact_model.arrays.get('threshold')
+    X = comparison_inputs(model.n_features_in_, category_maps, feature_names, thresholds, n_rows)
+    frame = X
+    if feature_names is not None:
+        import pandas as pd
+        frame = pd.DataFrame(X, columns=feature_names)
+    return int((np.asarray(model.predict(frame)) != artifact_model.predict(X)).sum())
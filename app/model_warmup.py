@@ -0,0 +1,99 @@
+import logging
+import threading
+import time
+from flask import jsonify
+
+logger = logging.getLogger(__name__)
+
+# NumPy, pandas, scikit-learn and joblib make up most of the startup time, so nothing
+# on the way to serving /login or /users imports them. They are imported together with
+# the stroke model: in create_app (MODEL_LOAD_MODE=eager), by a background thread
+# started from create_app (background) or by the first prediction (lazy).
+# GET /ready tells a load balancer when the model is warm.
+
+LOAD_MODES = ('eager', 'background', 'lazy')
+
+_stack_lock = threading.Lock()
+
+
+class ModelWarmup:
+    def __init__(self, mode):
+        self.mode = mode
+        self.state = 'cold'  # cold, loading, warm or failed
+        self.error = None
+        self.seconds = None
+
+
+# Import the ML stack and attach the model registry (plus the micro-batcher and the
+# prediction executor when they are enabled) to the app, once. Doesn't load the model.
+def load_model_stack(app):
+    registry = app.extensions.get('stroke_model')
+    if registry is not None:
+        return registry
+
+    with _stack_lock:
+        registry = app.extensions.get('stroke_model')
+        if registry is None:
+            from app.stroke_model import ModelRegistry
+            from app.micro_batcher import init_micro_batcher
+            from app.prediction_executor import init_prediction_executor
+
+            registry = ModelRegistry(app.config)
+            init_micro_batcher(app, registry)
+            init_prediction_executor(app, registry)
+            # Published last, a registry in app.extensions means the whole stack is ready
+            app.extensions['stroke_model'] = registry
+    return registry
+
+
+# Import the ML stack and load the model, returns True once the model is warm
+def warm_up(app):
+    warmup = app.extensions['model_warmup']
+    warmup.state = 'loading'
+    started = time.perf_counter()
+    try:
+        load_model_stack(app).get()
+    except Exception as e:
+        # Don't prevent the app from starting, the model is loaded again on first use
+        warmup.state = 'failed'
+        warmup.error = str(e)
+        logger.warning(f"Stroke model could not be loaded at startup: {e}")
+        return False
+    warmup.seconds = time.perf_counter() - started
+    warmup.state = 'warm'
+    return True
+
+
+# The model's state, a lazily loaded model counts as warm once a prediction loaded it
+def model_status(app):
+    warmup = app.extensions['model_warmup']
+    registry = app.extensions.get('stroke_model')
+    state = 'warm' if registry is not None and registry.loaded else warmup.state
+    status = {'mode': warmup.mode, 'model': state}
+    if state == 'warm':
+        status['model_version'] = registry.get().version
+    if warmup.seconds is not None:
+        status['load_seconds'] = round(warmup.seconds, 3)
+    if state == 'failed':
+        status['error'] = warmup.error
+    return status
+
+
+# Load the model as MODEL_LOAD_MODE says and serve GET /ready: 200 once the model is warm,
+# 503 before. With the lazy mode the app is ready right away, the first prediction loads it.
+def init_model_warmup(app):
+    mode = app.config.get('MODEL_LOAD_MODE', 'eager')
+    if mode not in LOAD_MODES:
+        raise ValueError(f"Unknown MODEL_LOAD_MODE {mode!r}, expected one of: {', '.join(LOAD_MODES)}")
+    app.extensions['model_warmup'] = ModelWarmup(mode)
+
+    if mode == 'eager':
+        warm_up(app)
+    elif mode == 'background':
+        threading.Thread(target=warm_up, args=(app, ), name='model-warmup', daemon=True).start()
+
+    @app.route('/ready', endpoint='ready')
+    def ready():
+        status = model_status(app)
+        status['ready'] = status['model'] == 'warm' or mode == 'lazy'
+        return jsonify(status), 200 if status['ready'] else 503
@@ -1,2 +1,3 @@
 from app.models.user import User
 from app.models.user import MedicalRecord
+from app.models.other_models import RiskRollup, TableVersion
@@ -0,0 +1,29 @@
+from app.utils import db
+
+# Pre-aggregated prediction counts per (day, gender, age band, smoking status, risk).
+# Kept up to date by every insert into medical_records so dashboards read a few
+# buckets instead of scanning the records (see app/risk_rollups.py).
+class RiskRollup(db.Model):
+    __tablename__ = "risk_rollups"
+    __table_args__ = (
+        db.UniqueConstraint('day', 'gender', 'age_band', 'smoking_status', 'stroke_risk', name='uq_risk_rollups_bucket'),
+    )
+    id = db.Column(db.Integer, primary_key=True)
+    day = db.Column(db.Date, nullable=False)
+    gender = db.Column(db.String(20), nullable=False)
+    age_band = db.Column(db.Integer, nullable=False)  # Lower bound of the age band, -1 when the age is unknown
+    smoking_status = db.Column(db.String(50), nullable=False)
+    stroke_risk = db.Column(db.String(50), nullable=False)
+    count = db.Column(db.Integer, nullable=False, default=0)
+    sum_age = db.Column(db.Float, nullable=False, default=0)
+    sum_avg_glucose_level = db.Column(db.Float, nullable=False, default=0)
+    sum_bmi = db.Column(db.Float, nullable=False, default=0)
+
+
+# A counter per table that is bumped in the same transaction as every change to the
+# table's rows, so readers can tell whether anything changed with a primary key lookup
+# (see app/table_versions.py)
+class TableVersion(db.Model):
+    __tablename__ = "table_versions"
+    name = db.Column(db.String(64), primary_key=True)
+    version = db.Column(db.Integer, nullable=False, default=0)
@@ -1,5 +1,6 @@
 from app.utils import db  # Import db from your utils (or wherever it's defined)
 from sqlalchemy import Column, String
+from datetime import datetime
 
 class User(db.Model):
     __tablename__ = "users"
@@ -18,10 +19,18 @@ class User(db.Model):
 # Define the MedicalRecord model
 class MedicalRecord(db.Model):
     __tablename__ = "medical_records"
+    __table_args__ = (
+        # Risk reporting over time windows and the usual demographic filters
+        db.Index('ix_medical_records_risk_created', 'stroke_risk', 'created_at'),
+        db.Index('ix_medical_records_smoking_created', 'smoking_status', 'created_at'),
+        db.Index('ix_medical_records_work_created', 'work_type', 'created_at'),
+        db.Index('ix_medical_records_gender_age', 'gender', 'age'),
+    )
     id = db.Column(db.Integer, primary_key=True)
     gender = db.Column(db.String(20))
     age = db.Column(db.Integer)
     hypertension = db.Column(db.Integer)
+    heart_disease = db.Column(db.Integer)
     ever_married = db.Column(db.String(20))
     work_type = db.Column(db.String(50))
     Residence_type = db.Column(db.String(50))
@@ -30,3 +39,5 @@ class MedicalRecord(db.Model):
     smoking_status = db.Column(db.String(50))
     stroke_risk = db.Column(db.String(50))
     prediction = db.Column(db.String(50))
+    created_at = db.Column(db.DateTime, nullable=False, default=datetime.utcnow, index=True)
+    user_id = db.Column(db.Integer, db.ForeignKey('users.id', ondelete='SET NULL'), index=True)  # Who requested the prediction, if signed in
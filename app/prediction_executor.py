@@ -0,0 +1,60 @@
+import logging
+import threading
+from concurrent.futures import ProcessPoolExecutor
+from app.stroke_model import ModelVersionMismatch, predict_stroke_risk, worker_bundle
+
+logger = logging.getLogger(__name__)
+
+# Runs in a pool process: score already encoded rows with the same model version as the app
+def _predict_in_worker(base_dir, artifact, version, rows):
+    return worker_bundle(base_dir, artifact, version).array_model.predict(rows)
+
+# Runs the model call of /predict in a pool of worker processes. Encoding, validation
+# and the prediction cache stay on the request thread, only the encoded row crosses the
+# process boundary. The request thread waits on the result without holding the GIL, so
+# the other threads of the worker keep serving I/O bound requests meanwhile.
+class PredictionExecutor:
+    def __init__(self, registry, workers):
+        self.registry = registry
+        self.workers = workers
+        self._executor = None
+        self._executor_lock = threading.Lock()
+        self._stale_version = None
+
+    def predict(self, data, timeout=None):
+        registry = self.registry
+
+        def predict_rows(bundle, rows):
+            future = self._pool().submit(_predict_in_worker, registry.base_dir, registry.artifact_mode, bundle.version, rows.copy())
+            try:
+                return future.result(timeout)
+            except ModelVersionMismatch as e:
+                # The workers only score with the model the rows were encoded for, until
+                # the app reloads the new files this request is scored here
+                if self._stale_version != bundle.version:
+                    self._stale_version = bundle.version
+                    logger.warning(f"Scoring /predict in the request threads until the new model is loaded: {e}")
+                return bundle.array_model.predict(rows)
+
+        return predict_stroke_risk(data, predict=predict_rows)
+
+    def shutdown(self):
+        if self._executor is not None:
+            self._executor.shutdown(wait=False, cancel_futures=True)
+            self._executor = None
+
+    def _pool(self):
+        if self._executor is None:
+            with self._executor_lock:
+                if self._executor is None:
+                    self._executor = ProcessPoolExecutor(max_workers=self.workers)
+        return self._executor
+
+# Score /predict requests in worker processes when PREDICT_EXECUTOR_WORKERS > 0
+def init_prediction_executor(app, registry=None):
+    if not app.config.get('PREDICT_EXECUTOR_WORKERS'):
+        return None
+
+    executor = PredictionExecutor(registry or app.extensions['stroke_model'], app.config['PREDICT_EXECUTOR_WORKERS'])
+    app.extensions['prediction_executor'] = executor
+    return executor
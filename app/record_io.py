@@ -0,0 +1,194 @@
+import csv
+import datetime
+import io
+import numpy as np
+import pandas as pd
+from sqlalchemy import select, insert
+from app.models import MedicalRecord
+from app.utils import db
+from app.risk_rollups import apply_rollups
+from app.stroke_model import (
+    CATEGORICAL_FEATURES, REQUIRED_FEATURES, encode_frame, get_model_registry, interpret_predictions, load_category_maps
+)
+
+# Columns every imported record needs
+IMPORT_COLUMNS = [
+    'gender', 'age', 'hypertension', 'ever_married', 'work_type',
+    'Residence_type', 'avg_glucose_level', 'bmi', 'smoking_status'
+]
+NUMERIC_COLUMNS = ['age', 'hypertension', 'heart_disease', 'avg_glucose_level', 'bmi']
+RISK_VALUES = {'High': 1, 'Low': 0}
+
+# Columns written by an export, in table order
+EXPORT_COLUMNS = [column.name for column in MedicalRecord.__table__.columns]
+
+FORMATS = ('csv', 'parquet')
+
+
+def _require_pyarrow():
+    try:
+        import pyarrow
+        import pyarrow.parquet
+    except ImportError:
+        raise ImportError("Parquet support needs pyarrow, install it with 'pip install pyarrow'")
+    return pyarrow
+
+
+# Guess the file format from its name
+def format_for(path, fmt=None):
+    if fmt:
+        if fmt not in FORMATS:
+            raise ValueError(f"Unknown format {fmt}, use one of: {', '.join(FORMATS)}")
+        return fmt
+    return 'parquet' if str(path).endswith(('.parquet', '.pq')) else 'csv'
+
+
+# Read a CSV or Parquet file (path or binary file object) in DataFrames of chunk_size rows
+def read_chunks(source, fmt, chunk_size):
+    if fmt == 'parquet':
+        _require_pyarrow()
+        import pyarrow.parquet as pq
+        for batch in pq.ParquetFile(source).iter_batches(batch_size=chunk_size):
+            yield batch.to_pandas()
+        return
+
+    # Everything is read as text and validated/converted below
+    yield from pd.read_csv(source, chunksize=chunk_size, dtype=str, keep_default_na=False, na_values=[''])
+
+
+# Validate one chunk of imported records. Returns the rows to insert (dicts of
+# MedicalRecord column values) and an error message per rejected line number.
+def prepare_chunk(frame, first_line, category_maps, bundle=None):
+    required = IMPORT_COLUMNS + (['heart_disease'] if bundle is not None else ['stroke_risk', 'prediction'])
+    missing = [column for column in required if column not in frame.columns]
+    if missing:
+        raise ValueError(f"Missing required columns: {', '.join(missing)}")
+
+    frame = frame.reset_index(drop=True)
+    problems = pd.Series('', index=frame.index)
+
+    def reject(mask, message):
+        problems[mask & (problems == '')] = message
+
+    for column in CATEGORICAL_FEATURES:
+        reject(~frame[column].isin(category_maps[column].keys()), f"invalid {column}")
+    for column in NUMERIC_COLUMNS:
+        if column in frame.columns:
+            values = pd.to_numeric(frame[column], errors='coerce')
+            optional = column == 'heart_disease' and bundle is None
+            reject(values.isnull() & (frame[column].notnull() | (not optional)), f"invalid {column}")
+            frame[column] = values
+
+    if bundle is None:
+        reject(~frame['stroke_risk'].isin(RISK_VALUES.keys()), "invalid stroke_risk")
+    else:
+        # Score the valid rows in one model call
+        valid = problems == ''
+        if valid.any():
+            encoded = encode_frame(frame.loc[valid, REQUIRED_FEATURES], bundle)
+            stroke_risk, prediction = interpret_predictions(bundle.model.predict(encoded[bundle.feature_names]))
+            frame['stroke_risk'] = None
+            frame['prediction'] = None
+            frame.loc[valid, 'stroke_risk'] = stroke_risk
+            frame.loc[valid, 'prediction'] = prediction.astype(str)
+
+    # Keep the timestamps of exported records, anything else is stamped with the import time
+    now = datetime.datetime.utcnow()
+    created_at = pd.to_datetime(frame['created_at'], errors='coerce') if 'created_at' in frame.columns else pd.Series(pd.NaT, index=frame.index)
+    frame['created_at'] = [value.to_pydatetime() if pd.notnull(value) else now for value in created_at]
+
+    columns = [column for column in EXPORT_COLUMNS if column in frame.columns and column not in ('id', 'user_id')]
+    good = frame.loc[problems == '', columns]
+    good = good.astype(object).where(good.notnull(), None)
+    rows = good.to_dict('records')
+    for row in rows:
+        for column in ('age', 'hypertension', 'heart_disease'):
+            if row.get(column) is not None:
+                row[column] = int(row[column])
+        row['prediction'] = str(row['prediction'])
+
+    errors = {first_line + int(index): problems[index] for index in np.flatnonzero((problems != '').to_numpy())}
+    return rows, errors
+
+
+# Import records from a CSV or Parquet source in batches of batch_size rows. Each batch is
+# validated, optionally scored, bulk inserted and committed, so memory use stays flat.
+def import_records(source, fmt='csv', batch_size=1000, score=False, max_errors=20, progress=None):
+    bundle = get_model_registry().get() if score else None
+    category_maps = (
+        {feature: getattr(bundle, attribute) for feature, attribute in CATEGORICAL_FEATURES.items()}
+        if bundle is not None else load_category_maps(get_model_registry().base_dir)
+    )
+
+    summary = {'read': 0, 'inserted': 0, 'skipped': 0, 'errors': []}
+    for chunk in read_chunks(source, fmt, batch_size):
+        # Line numbers count the header line of a CSV file
+        rows, errors = prepare_chunk(chunk, summary['read'] + 2, category_maps, bundle)
+        if rows:
+            db.session.execute(insert(MedicalRecord), rows)
+            apply_rollups(rows)
+            db.session.commit()
+
+        summary['read'] += len(chunk)
+        summary['inserted'] += len(rows)
+        summary['skipped'] += len(errors)
+        for line, message in errors.items():
+            if len(summary['errors']) < max_errors:
+                summary['errors'].append({'line': line, 'error': message})
+        if progress:
+            progress(summary)
+    return summary
+
+
+# Stored records in id order, chunk_size rows at a time (keyset pagination, no long running cursor)
+def iter_record_chunks(chunk_size):
+    columns = [getattr(MedicalRecord, column) for column in EXPORT_COLUMNS]
+    last_id = 0
+    while True:
+        rows = db.session.execute(select(*columns).where(MedicalRecord.id > last_id).order_by(MedicalRecord.id).limit(chunk_size)).all()
+        if not rows:
+            return
+        yield rows
+        last_id = rows[-1].id
+
+
+# CSV export as a stream of text chunks (header first)
+def iter_csv(chunk_size):
+    buffer = io.StringIO()
+    writer = csv.writer(buffer)
+    writer.writerow(EXPORT_COLUMNS)
+    for rows in iter_record_chunks(chunk_size):
+        writer.writerows(rows)
+        yield buffer.getvalue()
+        buffer.seek(0)
+        buffer.truncate()
+    if buffer.tell():
+        yield buffer.getvalue()
+
+
+# Write every stored record to a CSV or Parquet file, returns the number of rows written
+def export_records(path, fmt='csv', chunk_size=1000):
+    written = 0
+    if fmt == 'parquet':
+        pyarrow = _require_pyarrow()
+        import pyarrow.parquet as pq
+        writer = None
+        try:
+            for rows in iter_record_chunks(chunk_size):
+                table = pyarrow.Table.from_pylist([dict(row._mapping) for row in rows])
+                if writer is None:
+                    writer = pq.ParquetWriter(path, table.schema)
+                writer.write_table(table)
+                written += len(rows)
+        finally:
+            if writer is not None:
+                writer.close()
+        return written
+
+    with open(path, 'w', newline='') as output:
+        writer = csv.writer(output)
+        writer.writerow(EXPORT_COLUMNS)
+        for rows in iter_record_chunks(chunk_size):
+            writer.writerows(rows)
+            written += len(rows)
+    return written
@@ -0,0 +1,191 @@
+import atexit
+import logging
+import queue
+import threading
+import time
+from concurrent.futures import Future
+from sqlalchemy import insert
+from app.models import MedicalRecord
+from app.risk_rollups import apply_rollups
+from app.utils import db
+from app.utils.metrics import DB_QUERY_SECONDS
+
+logger = logging.getLogger(__name__)
+
+_STOP = object()
+
+# Write-behind buffer for the MedicalRecord rows /predict stores. A background writer
+# takes whatever is buffered (up to max_rows) and stores it with one bulk insert, one
+# rollup update and one commit, so concurrent predictions share a transaction and its
+# fsync instead of queueing up on the database write lock one by one.
+#
+# durability "sync": the request waits until the transaction holding its row committed.
+# durability "group": the request returns right away and the writer waits up to
+# max_delay_ms for more rows before committing. Rows still buffered are lost if the
+# process dies (they are written on a normal shutdown).
+class RecordWriter:
+    def __init__(self, app, max_rows=200, max_delay_ms=20.0, max_buffer=5000, put_timeout=1.0, durability='sync',
+                 max_retries=3, retry_backoff=0.05):
+        if durability not in ('sync', 'group'):
+            raise ValueError(f"Unknown durability {durability!r}, expected 'sync' or 'group'")
+        self.app = app
+        self.max_rows = max_rows
+        self.max_delay = max_delay_ms / 1000.0
+        self.put_timeout = put_timeout
+        self.durability = durability
+        self.max_retries = max_retries
+        self.retry_backoff = retry_backoff
+        self._queue = queue.Queue(maxsize=max_buffer)
+        self._worker = None
+        self._start_lock = threading.Lock()
+        self._stats_lock = threading.Lock()
+        self.buffered = 0
+        self.written = 0
+        self.batches = 0
+        self.failed = 0
+        self.written_inline = 0
+
+    # Buffer the column values of a record. When the buffer stays full for put_timeout
+    # seconds the row is written on the calling thread, slowing the caller down to the
+    # pace the database can take. With durability "sync" this returns once it is committed.
+    def write(self, fields):
+        self._ensure_worker()
+        future = Future() if self.durability == 'sync' else None
+        try:
+            self._queue.put((fields, future), timeout=self.put_timeout)
+        except queue.Full:
+            logger.warning("Record write buffer is full, writing on the request thread")
+            self._store([fields])
+            db.session.commit()
+            with self._stats_lock:
+                self.written_inline += 1
+            return
+        with self._stats_lock:
+            self.buffered += 1
+        if future is not None:
+            future.result()
+
+    # Wait until everything buffered so far was written (or given up on)
+    def flush(self, timeout=None):
+        deadline = time.monotonic() + timeout if timeout is not None else None
+        while self._queue.unfinished_tasks:
+            if deadline is not None and time.monotonic() >= deadline:
+                return False
+            time.sleep(0.005)
+        return True
+
+    # Write what is buffered and stop the writer, called at interpreter exit
+    def close(self, timeout=10.0):
+        worker = self._worker
+        if worker is None or not worker.is_alive():
+            return
+        try:
+            self._queue.put(_STOP, timeout=timeout)
+        except queue.Full:
+            logger.error("Record write buffer didn't drain, %d records are lost", self._queue.qsize())
+            return
+        worker.join(timeout)
+
+    def stats(self):
+        with self._stats_lock:
+            return {
+                'depth': self._queue.qsize(),
+                'buffered': self.buffered,
+                'written': self.written,
+                'batches': self.batches,
+                'failed': self.failed,
+                'written_inline': self.written_inline,
+                'avg_batch_size': self.written / self.batches if self.batches else 0.0
+            }
+
+    def _ensure_worker(self):
+        if self._worker is not None:
+            return
+        with self._start_lock:
+            if self._worker is None:
+                self._worker = threading.Thread(target=self._run, name='record-writer', daemon=True)
+                self._worker.start()
+
+    def _run(self):
+        with self.app.app_context():
+            stopping = False
+            while not stopping:
+                item = self._queue.get()
+                if item is _STOP:
+                    self._queue.task_done()
+                    break
+
+                # The first row waits at most max_delay for others to join its transaction.
+                # With durability "sync" its request is waiting, so only the rows that
+                # arrived while the previous transaction committed join it.
+                batch = [item]
+                deadline = time.monotonic() + (self.max_delay if self.durability == 'group' else 0)
+                while len(batch) < self.max_rows:
+                    remaining = deadline - time.monotonic()
+                    try:
+                        item = self._queue.get(timeout=remaining) if remaining > 0 else self._queue.get_nowait()
+                    except queue.Empty:
+                        break
+                    if item is _STOP:
+                        self._queue.task_done()
+                        stopping = True
+                        break
+                    batch.append(item)
+
+                self._write(batch)
+            db.session.remove()
+
+    def _write(self, batch):
+        error = None
+        for attempt in range(self.max_retries + 1):
+            try:
+                with DB_QUERY_SECONDS.time(operation='write_records'):
+                    self._store([fields for fields, _ in batch])
+                    db.session.commit()
+                error = None
+                break
+            except Exception as e:
+                db.session.rollback()
+                error = e
+                if attempt < self.max_retries:
+                    time.sleep(self.retry_backoff * (2 ** attempt))
+
+        with self._stats_lock:
+            if error is None:
+                self.written += len(batch)
+                self.batches += 1
+            else:
+                self.failed += len(batch)
+        if error is not None and self.durability == 'group':
+            logger.error("Giving up on %d medical records after %d attempts: %s", len(batch), self.max_retries + 1, error)
+
+        for _, future in batch:
+            if future is not None:
+                if error is None:
+                    future.set_result(None)
+                else:
+                    future.set_exception(error)
+            self._queue.task_done()
+
+    @staticmethod
+    def _store(rows):
+        db.session.execute(insert(MedicalRecord), rows)
+        apply_rollups(rows)
+
+# Buffer /predict's records when RECORD_WRITE_BEHIND is set, the writer starts with the
+# first record and whatever is still buffered is written when the process exits
+def init_record_writer(app):
+    if not app.config.get('RECORD_WRITE_BEHIND'):
+        return None
+
+    writer = RecordWriter(
+        app,
+        max_rows=app.config['RECORD_WRITE_MAX_ROWS'],
+        max_delay_ms=app.config['RECORD_WRITE_MAX_DELAY_MS'],
+        max_buffer=app.config['RECORD_WRITE_BUFFER_SIZE'],
+        put_timeout=app.config['RECORD_WRITE_PUT_TIMEOUT'],
+        durability=app.config['RECORD_WRITE_DURABILITY']
+    )
+    app.extensions['record_writer'] = writer
+    atexit.register(writer.close)
+    return writer
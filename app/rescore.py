@@ -0,0 +1,131 @@
+import json
+import os
+import time
+import pandas as pd
+from joblib import Parallel, delayed, effective_n_jobs
+from sqlalchemy import select, update
+from app.models import MedicalRecord
+from app.utils import db
+from app.risk_rollups import apply_rollups
+from app.stroke_model import REQUIRED_FEATURES, encode_frame, get_model_registry, interpret_predictions, worker_bundle
+
+# Columns read for every record: the model features plus what the update and the rollups need
+RESCORE_COLUMNS = ['id', *REQUIRED_FEATURES, 'stroke_risk', 'prediction', 'created_at']
+
+# Score a chunk of (id, *REQUIRED_FEATURES) rows. Returns (id, stroke_risk, prediction)
+# for every row the model could score, rows with unknown categories are left out.
+def score_rows(bundle, rows):
+    frame = pd.DataFrame(rows, columns=['id', *REQUIRED_FEATURES])
+    encoded = encode_frame(frame, bundle)
+    valid = encoded.notnull().all(axis=1).to_numpy()
+    if not valid.any():
+        return []
+    stroke_risk, prediction = interpret_predictions(bundle.model.predict(encoded[valid][bundle.feature_names]))
+    return list(zip(frame['id'][valid].tolist(), stroke_risk.tolist(), prediction.astype(str).tolist()))
+
+
+# Runs in a worker process: load the model once per process and score the chunk with it.
+# joblib's loky workers limit their BLAS/OpenMP thread pools (threadpoolctl), so
+# n_jobs processes don't oversubscribe the cores.
+def _score_in_worker(base_dir, artifact, version, rows):
+    # Raises ModelVersionMismatch when the model files changed during the rescore
+    return score_rows(worker_bundle(base_dir, artifact, version), rows)
+
+
+def read_checkpoint(path):
+    try:
+        with open(path) as checkpoint:
+            return json.load(checkpoint)
+    except FileNotFoundError:
+        return None
+
+
+def write_checkpoint(path, summary):
+    # Write then rename, a crash never leaves a half written checkpoint behind
+    temporary = f"{path}.tmp"
+    with open(temporary, 'w') as checkpoint:
+        json.dump({'last_id': summary['last_id'], 'model_version': summary['model_version']}, checkpoint)
+    os.replace(temporary, path)
+
+
+# Records after last_id in id order, chunk_size rows per chunk. Legacy records
+# without heart_disease can't be scored and are left alone.
+def _read_chunks(last_id, chunk_size, count):
+    columns = [getattr(MedicalRecord, column) for column in RESCORE_COLUMNS]
+    chunks = []
+    for _ in range(count):
+        rows = db.session.execute(
+            select(*columns)
+            .where(MedicalRecord.id > last_id, MedicalRecord.heart_disease.isnot(None))
+            .order_by(MedicalRecord.id)
+            .limit(chunk_size)
+        ).all()
+        if not rows:
+            break
+        chunks.append(rows)
+        last_id = rows[-1].id
+    return chunks
+
+
+# Write the new scores of one chunk back with a single bulk UPDATE, only for the
+# records whose result changed, and move those records to their new rollup buckets
+def _write_scores(rows, scores, summary):
+    by_id = {row.id: row for row in rows}
+    changes, old_records, new_records = [], [], []
+    for record_id, stroke_risk, prediction in scores:
+        row = by_id[record_id]
+        if row.stroke_risk == stroke_risk and row.prediction == prediction:
+            continue
+        changes.append({'id': record_id, 'stroke_risk': stroke_risk, 'prediction': prediction})
+        if row.created_at is not None:
+            old = dict(row._mapping)
+            old_records.append(old)
+            new_records.append(dict(old, stroke_risk=stroke_risk, prediction=prediction))
+
+    if changes:
+        db.session.execute(update(MedicalRecord), changes)
+        apply_rollups(old_records, sign=-1)
+        apply_rollups(new_records)
+
+    summary['scored'] += len(scores)
+    summary['skipped'] += len(rows) - len(scores)
+    summary['changed'] += len(changes)
+
+
+# Rescore the stored records with the current model. Records are streamed in
+# chunks, every round reads one chunk per worker, scores them in parallel and
+# commits the updates together with a checkpoint holding the last committed id,
+# so an interrupted run can carry on from there.
+def rescore_records(n_jobs=1, chunk_size=5000, start_after=0, checkpoint=None, progress=None):
+    registry = get_model_registry()
+    bundle = registry.get()
+    jobs = effective_n_jobs(n_jobs)
+
+    summary = {
+        'model_version': bundle.version, 'last_id': start_after,
+        'scored': 0, 'changed': 0, 'skipped': 0, 'rows_per_second': 0.0
+    }
+    started = time.monotonic()
+    with Parallel(n_jobs=jobs) as parallel:
+        while True:
+            chunks = _read_chunks(summary['last_id'], chunk_size, jobs)
+            if not chunks:
+                break
+
+            feature_rows = [[tuple(row[:len(REQUIRED_FEATURES) + 1]) for row in chunk] for chunk in chunks]
+            if jobs == 1:
+                results = [score_rows(bundle, rows) for rows in feature_rows]
+            else:
+                results = parallel(delayed(_score_in_worker)(registry.base_dir, registry.artifact_mode, bundle.version, rows) for rows in feature_rows)
+
+            for rows, scores in zip(chunks, results):
+                _write_scores(rows, scores, summary)
+            db.session.commit()
+
+            summary['last_id'] = chunks[-1][-1].id
+            if checkpoint:
+                write_checkpoint(checkpoint, summary)
+            summary['rows_per_second'] = (summary['scored'] + summary['skipped']) / max(time.monotonic() - started, 1e-9)
+            if progress:
+                progress(summary)
+    return summary
@@ -0,0 +1,153 @@
+import math
+from sqlalchemy import select, func, case, cast, Integer, delete, insert
+from app.models import MedicalRecord, RiskRollup
+from app.utils import db
+
+# Width of the age bands used by the rollups (60 means ages 60-69)
+AGE_BAND_WIDTH = 10
+
+# Columns identifying a rollup bucket
+BUCKET_COLUMNS = ['day', 'gender', 'age_band', 'smoking_status', 'stroke_risk']
+
+# Running sums kept per bucket, next to the count
+SUM_COLUMNS = {
+    'sum_age': 'age',
+    'sum_avg_glucose_level': 'avg_glucose_level',
+    'sum_bmi': 'bmi',
+}
+
+def _number(value):
+    try:
+        number = float(value)
+    except (TypeError, ValueError):
+        return None
+    return None if math.isnan(number) else number
+
+def age_band(age):
+    age = _number(age)
+    return -1 if age is None else int(age) // AGE_BAND_WIDTH * AGE_BAND_WIDTH
+
+# Bucket of a medical record given as a dict of MedicalRecord column values
+def bucket_key(record):
+    return (
+        record['created_at'].date(),
+        record.get('gender') or '',
+        age_band(record.get('age')),
+        record.get('smoking_status') or '',
+        record.get('stroke_risk') or '',
+    )
+
+# Add newly inserted records to their buckets, in the caller's transaction.
+# With sign=-1 the records are taken out of their buckets again (e.g. before a rescore moves them).
+def apply_rollups(records, sign=1):
+    buckets = {}
+    for record in records:
+        totals = buckets.setdefault(bucket_key(record), {'count': 0, 'sum_age': 0.0, 'sum_avg_glucose_level': 0.0, 'sum_bmi': 0.0})
+        totals['count'] += sign
+        for total, column in SUM_COLUMNS.items():
+            totals[total] += sign * (_number(record.get(column)) or 0.0)
+
+    if not buckets:
+        return
+
+    rows = [dict(zip(BUCKET_COLUMNS, key), **totals) for key, totals in buckets.items()]
+    dialect = db.session.get_bind().dialect.name
+    if dialect in ('sqlite', 'postgresql'):
+        if dialect == 'sqlite':
+            from sqlalchemy.dialects.sqlite import insert as upsert
+        else:
+            from sqlalchemy.dialects.postgresql import insert as upsert
+        statement = upsert(RiskRollup).values(rows)
+        statement = statement.on_conflict_do_update(
+            index_elements=BUCKET_COLUMNS,
+            set_={column: getattr(RiskRollup, column) + getattr(statement.excluded, column) for column in ['count', *SUM_COLUMNS]}
+        )
+        db.session.execute(statement)
+        return
+
+    # Other databases: update the bucket and create it when it doesn't exist yet
+    for row in rows:
+        bucket = db.session.execute(select(RiskRollup).filter_by(**{column: row[column] for column in BUCKET_COLUMNS})).scalar_one_or_none()
+        if bucket is None:
+            db.session.add(RiskRollup(**row))
+        else:
+            for column in ['count', *SUM_COLUMNS]:
+                setattr(bucket, column, getattr(bucket, column) + row[column])
+
+# The buckets recomputed from the raw medical records, as a select statement
+def rollups_from_records():
+    band = cast(MedicalRecord.age, Integer) // AGE_BAND_WIDTH * AGE_BAND_WIDTH
+    key_columns = [
+        func.date(MedicalRecord.created_at).label('day'),
+        func.coalesce(MedicalRecord.gender, '').label('gender'),
+        func.coalesce(band, -1).label('age_band'),
+        func.coalesce(MedicalRecord.smoking_status, '').label('smoking_status'),
+        func.coalesce(MedicalRecord.stroke_risk, '').label('stroke_risk'),
+    ]
+    return (
+        select(
+            *key_columns,
+            func.count().label('count'),
+            *[func.coalesce(func.sum(getattr(MedicalRecord, column)), 0.0).label(total) for total, column in SUM_COLUMNS.items()]
+        )
+        .where(MedicalRecord.created_at.isnot(None))
+        .group_by(*key_columns)
+    )
+
+# Throw the rollups away and recompute them from medical_records in one statement
+def rebuild_rollups():
+    db.session.execute(delete(RiskRollup))
+    columns = [*BUCKET_COLUMNS, 'count', *SUM_COLUMNS]
+    db.session.execute(insert(RiskRollup).from_select(columns, rollups_from_records()))
+    db.session.commit()
+    return db.session.execute(select(func.count()).select_from(RiskRollup)).scalar()
+
+# Compare the stored rollups with the raw records, returns the buckets that differ
+def check_rollups():
+    def normalize(row):
+        values = row._mapping
+        key = tuple(str(values[column]) for column in BUCKET_COLUMNS)
+        return key, [values['count']] + [float(values[total]) for total in SUM_COLUMNS]
+
+    expected = dict(normalize(row) for row in db.session.execute(rollups_from_records()))
+    stored_columns = [getattr(RiskRollup, column) for column in [*BUCKET_COLUMNS, 'count', *SUM_COLUMNS]]
+    stored = dict(normalize(row) for row in db.session.execute(select(*stored_columns)) if row.count)
+
+    mismatches = []
+    for key in sorted(set(expected) | set(stored)):
+        want, have = expected.get(key), stored.get(key)
+        if want is None or have is None or want[0] != have[0] or any(not math.isclose(a, b, rel_tol=1e-9, abs_tol=1e-6) for a, b in zip(want[1:], have[1:])):
+            mismatches.append({'bucket': dict(zip(BUCKET_COLUMNS, key)), 'expected': want, 'stored': have})
+    return mismatches
+
+# Dashboard aggregates read from the rollups, cost grows with the buckets, not the records
+def query_rollups(group_by, start_day=None, end_day=None, filters=None):
+    group = getattr(RiskRollup, group_by)
+    total = func.sum(RiskRollup.count)
+    query = select(
+        group.label('key'),
+        total.label('total'),
+        func.sum(case((RiskRollup.stroke_risk == 'High', RiskRollup.count), else_=0)).label('high_risk'),
+        *[func.sum(getattr(RiskRollup, column)).label(column) for column in SUM_COLUMNS]
+    ).group_by(group).order_by(group)
+
+    if start_day is not None:
+        query = query.where(RiskRollup.day >= start_day)
+    if end_day is not None:
+        query = query.where(RiskRollup.day <= end_day)
+    for column, value in (filters or {}).items():
+        query = query.where(getattr(RiskRollup, column) == value)
+
+    groups = []
+    for row in db.session.execute(query):
+        count = row.total or 0
+        groups.append({
+            'key': row.key.isoformat() if hasattr(row.key, 'isoformat') else row.key,
+            'total': count,
+            'high_risk': row.high_risk or 0,
+            'high_risk_rate': (row.high_risk or 0) / count if count else 0.0,
+            'avg_age': row.sum_age / count if count else None,
+            'avg_glucose_level': row.sum_avg_glucose_level / count if count else None,
+            'avg_bmi': row.sum_bmi / count if count else None,
+        })
+    return groups
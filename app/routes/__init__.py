@@ -1,7 +1,12 @@
-from .auth_routes import auth_bp
+from .auth_routes import auth_bp, init_principal_cache
 from .users import users_bp
+from .records import records_bp
+from app.utils.http_cache import init_payload_cache
 
 def init_routes(app):
+    init_principal_cache(app)
+    init_payload_cache(app)
     app.register_blueprint(auth_bp)
     app.register_blueprint(users_bp)
+    app.register_blueprint(records_bp)
 
@@ -1,5 +1,4 @@
 from flask import Blueprint, request, jsonify, make_response
-from werkzeug.security import check_password_hash, generate_password_hash
 import jwt
 import datetime
 from app.models import User
@@ -10,9 +9,25 @@ from sqlalchemy.exc import IntegrityError
 from itsdangerous import URLSafeTimedSerializer
 from flask_mail import Message
 from app.utils import mail
-from app.stroke_model import predict_stroke_risk
 from app.models import MedicalRecord
-import numpy as np
+from sqlalchemy import insert, select
+from flask import current_app
+import json
+import time
+import uuid
+from collections import namedtuple
+from app.utils.helpers import TTLCache
+from app.utils.passwords import hash_password, verify_password, password_needs_rehash
+from app.risk_rollups import apply_rollups
+from app.utils.metrics import PREDICTION_STAGE_SECONDS, DB_QUERY_SECONDS
+from app.utils.rate_limit import rate_limit
+from app.utils.revocation import revoke_token
+from app.model_warmup import load_model_stack
+from app.table_versions import bump_version
+import logging
+import re
+
+logger = logging.getLogger(__name__)
 
 auth_bp = Blueprint('auth', __name__)
 
@@ -38,7 +53,9 @@ def token_required(f):
         try:
             # Decode the token to get the user info
             data = jwt.decode(token, SECRET_KEY, algorithms=["HS256"])
-            current_user = User.query.get(data['user_id'])
+            if current_app.extensions['token_revocations'].is_revoked(data.get('jti')):
+                return jsonify({"error": "Token has been revoked"}), 403
+            current_user = load_principal(data)
             if not current_user:
                 return jsonify({"error": "User not found"}), 404
         except jwt.ExpiredSignatureError:
@@ -54,6 +71,64 @@ def token_required(f):
 
     return decorated_function
 
+# The parts of a user needed to authorize a request, cached instead of the ORM object
+Principal = namedtuple('Principal', ['id', 'username', 'role'])
+
+# Per-app cache of principals by user id (see AUTH_CACHE_TTL)
+def init_principal_cache(app):
+    app.extensions['principal_cache'] = TTLCache(app.config['AUTH_CACHE_SIZE'], app.config['AUTH_CACHE_TTL'])
+
+# Drop a cached principal after the user's role changed or the user was deleted
+def invalidate_principal(user_id):
+    current_app.extensions['principal_cache'].pop(user_id)
+
+# Resolve the user a decoded token belongs to, with as few database round trips as possible
+def load_principal(data):
+    user_id = data['user_id']
+
+    # Optionally trust the role claim of recently issued tokens, no database access at all
+    if current_app.config['AUTH_TRUST_TOKEN_ROLE'] and 'role' in data and 'username' in data and 'iat' in data:
+        if time.time() - data['iat'] <= current_app.config['AUTH_ROLE_CLAIM_MAX_AGE']:
+            return Principal(user_id, data['username'], data['role'])
+
+    cache = current_app.extensions['principal_cache']
+    principal = cache.get(user_id)
+    if principal is None:
+        with DB_QUERY_SECONDS.time(operation='load_principal'):
+            row = db.session.execute(select(User.id, User.username, User.role).where(User.id == user_id)).first()
+        if row is None:
+            return None
+        principal = Principal(*row)
+        cache.set(user_id, principal)
+    return principal
+
+# The id of the signed in user when the request carries a valid token, None otherwise
+def optional_user_id():
+    auth_header = request.headers.get('Authorization', '')
+    if not auth_header.startswith('Bearer '):
+        return None
+    try:
+        data = jwt.decode(auth_header.split(" ")[1], SECRET_KEY, algorithms=["HS256"])
+    except jwt.InvalidTokenError:
+        return None
+    if current_app.extensions['token_revocations'].is_revoked(data.get('jti')):
+        return None
+    return data.get('user_id')
+
+# Send mail through the background queue when it is enabled, otherwise right away.
+# on_failure(error) is called when the mail can't be sent, also when the queue gives up on it later.
+def send_mail(msg, on_failure=None):
+    mail_queue = current_app.extensions.get('mail_queue')
+    try:
+        if mail_queue:
+            mail_queue.send(msg, on_failure)
+        else:
+            mail.send(msg)
+    except Exception as e:
+        if on_failure is not None:
+            on_failure(e)
+        raise
+
 # Role-based access decorator
 def role_required(*roles):
     def decorator(f):
@@ -66,6 +141,23 @@ def role_required(*roles):
     return decorator
 
 
+# Unique user columns and the request fields they come from
+UNIQUE_USER_FIELDS = {'username': 'username', 'email': 'email', 'phone_number': 'phoneNumber'}
+
+# The unique user column an IntegrityError collided on, None when it can't be told.
+# PostgreSQL names the violated constraint (users_email_key), SQLite
+# ("UNIQUE constraint failed: users.email") and MySQL ("Duplicate entry ... for key
+# 'users.email'") name it in the message.
+def conflicting_user_field(error):
+    diag = getattr(error.orig, 'diag', None)
+    candidates = [getattr(diag, 'constraint_name', None) or '', str(error.orig)]
+    for candidate in candidates:
+        for column in UNIQUE_USER_FIELDS:
+            if re.search(rf'(\busers\.|\busers_|\(|\'){column}(?![a-z])', candidate):
+                return column
+    return None
+
+
 # the route responsible for registering users
 @auth_bp.route('/register', methods=['POST'])
 def register_user():
@@ -83,13 +175,8 @@ def register_user():
     if not all([first_name, last_name, email, phone_number, username, password]):
         return jsonify({"message": "All fields are required!"}), 400
 
-    # Validate if the username or phone number is already taken (if necessary)
-    existing_user = User.query.filter((User.username == username) | (User.phone_number == phone_number) | (User.email == email)).first()
-    if existing_user:
-        return jsonify({"message": "Username or phone number already exists!"}), 400
-
     # Hash the password before storing it
-    hashed_password = generate_password_hash(password)
+    hashed_password = hash_password(password)
 
     # Create a new user record
     new_user = User(
@@ -101,14 +188,20 @@ def register_user():
         password=hashed_password
     )
 
-    # Save the user to the database
+    # Save the user to the database, the unique constraints reject a taken username,
+    # email or phone number (no lookup beforehand, it would cost a round trip and could race)
     try:
         db.session.add(new_user)
+        bump_version('users')
         db.session.commit()
         return jsonify({"message": "User registered successfully!"}), 201
-    except IntegrityError:
+    except IntegrityError as e:
         db.session.rollback()  # Rollback in case of error
-        return jsonify({"error": "Database integrity error, possibly due to duplicate entry!"}), 400
+        field = conflicting_user_field(e)
+        if field is None:
+            return jsonify({"error": "Database integrity error, possibly due to duplicate entry!"}), 400
+        return jsonify({"error": f"{field.replace('_', ' ').capitalize()} already exists!",
+                        "field": UNIQUE_USER_FIELDS[field]}), 409
     except Exception as e:
         db.session.rollback()  # Rollback in case of other errors
         return jsonify({"error": "Error registering user", "details": str(e)}), 500
@@ -124,15 +217,28 @@ def login_user():
     if not username or not password:
         return jsonify({"error": "Username and password are required!"}), 400
 
+    # Throttle password guessing per client and per account before any hashing happens
+    limited = rate_limit('login', ip=request.remote_addr, username=username)
+    if limited:
+        return limited
+
     # Find the user by username
     user = User.query.filter_by(username=username).first()
-    if not user or not check_password_hash(user.password, password):
+    if not user or not verify_password(user.password, password):
         return jsonify({"error": "Invalid credentials!"}), 401
 
+    # Upgrade the stored hash when the hashing parameters changed since it was made
+    if password_needs_rehash(user.password):
+        user.password = hash_password(password)
+        db.session.commit()
+
     # Create JWT token with the user ID and role
     token = jwt.encode({
         'user_id': user.id,
+        'username': user.username,
         'role': user.role,
+        'jti': uuid.uuid4().hex,  # lets /logout revoke this token
+        'iat': datetime.datetime.utcnow(),
         'exp': datetime.datetime.utcnow() + datetime.timedelta(hours=1)
     }, SECRET_KEY, algorithm="HS256")
 
@@ -147,6 +253,15 @@ def login_user():
 # route used for signing out users
 @auth_bp.route('/logout', methods=['GET'])
 def logout():
+   # Revoke the token so it can't be used until it expires, whether it came in the header or the cookie
+   auth_header = request.headers.get('Authorization', '')
+   token = auth_header.split(" ")[1] if auth_header.startswith('Bearer ') else request.cookies.get('token')
+   if token:
+       try:
+           revoke_token(jwt.decode(token, SECRET_KEY, algorithms=["HS256"]))
+       except jwt.InvalidTokenError:
+           pass  # expired or forged, nothing to revoke
+
    response = make_response(jsonify({"message": "Logout successful"}))
    response.set_cookie('token', '', expires=0, httponly=True)  # Clear JWT cookie
    return response
@@ -185,9 +300,18 @@ def forgot_password():
     if not email:
         return jsonify({"error": "Email is required!"}), 400
 
+    limited = rate_limit('forgot_password', ip=request.remote_addr, email=email)
+    if limited:
+        return limited
+
     user = User.query.filter_by(email=email).first()
 
     if user:
+        # The link sent first is still valid, repeated requests within its lifetime send nothing
+        limiter = current_app.extensions['rate_limiter']
+        if not limiter.first_within('password_reset', user.email, current_app.config['PASSWORD_RESET_MAX_AGE']):
+            return jsonify({"message": "Password reset link has been sent to your email."}), 200
+
         # Generate a password reset token
         token = s.dumps(user.email, salt=os.getenv("PASSWORD_RESET_SALT"))
         reset_url = f"http://localhost:5173/resetpassword/{token}"
@@ -195,7 +319,9 @@ def forgot_password():
         # Send email with the reset URL (you need to configure your SMTP settings)
         msg = Message("Password Reset Request", sender=os.getenv("MAIL_USERNAME"), recipients=[email])
         msg.body = f"Click the following link to reset your password: {reset_url}"
-        mail.send(msg)
+        # Nothing was sent when it fails (now or in the mail queue), the next request may try again
+        user_email = user.email
+        send_mail(msg, on_failure=lambda error: limiter.forget('password_reset', user_email))
 
         return jsonify({"message": "Password reset link has been sent to your email."}), 200
     else:
@@ -205,7 +331,7 @@ def forgot_password():
 @auth_bp.route('/resetpassword/<token>', methods=['POST'])
 def reset_password(token):
     try:
-        email = s.loads(token, salt=os.getenv("PASSWORD_RESET_SALT"), max_age=3600)  # Token expires after 1 hour
+        email = s.loads(token, salt=os.getenv("PASSWORD_RESET_SALT"), max_age=current_app.config['PASSWORD_RESET_MAX_AGE'])
     except Exception as e:
         return jsonify({"error": "The reset link is invalid or has expired."}), 400
 
@@ -219,15 +345,25 @@ def reset_password(token):
         return jsonify({"error": "User not found!"}), 404
 
     # Hash the new password and update in the database
-    user.password = generate_password_hash(new_password)
+    user.password = hash_password(new_password)
+    bump_version('users')
     db.session.commit()
 
+    # The link was used, a new request may send a new one
+    current_app.extensions['rate_limiter'].forget('password_reset', user.email)
+
     return jsonify({"message": "Your password has been reset successfully!"}), 200
 
 
 @auth_bp.route('/predict', methods=['POST'])
 def predict():
+    # The ML stack is imported by the first prediction (see app/model_warmup.py)
+    import numpy as np
+    from app.stroke_model import predict_stroke_risk
+
     try:
+        load_model_stack(current_app._get_current_object())
+
         # Get data from the frontend
         data = request.get_json()
 
@@ -252,31 +388,42 @@ def predict():
             if isinstance(data[key], np.generic):  # Check if the value is a numpy type
                 data[key] = data[key].item()  # Convert to native Python type
 
+        # Score the request on its own, together with concurrent requests (micro-batching)
+        # or in a worker process (prediction executor)
+        batcher = current_app.extensions.get('micro_batcher')
+        executor = current_app.extensions.get('prediction_executor')
+        if batcher:
+            result = batcher.predict(data, timeout=current_app.config['PREDICT_MICROBATCH_TIMEOUT'])
+        elif executor:
+            result = executor.predict(data, timeout=current_app.config['PREDICT_EXECUTOR_TIMEOUT'])
+        else:
+            result = predict_stroke_risk(data)
+
         preds = []
-        for value in predict_stroke_risk(data).values():
+        for value in result.values():
             preds.append(value)
         
         stroke_risk = preds[0]
         prediction = preds[1]
 
+        drift_monitor = current_app.extensions.get('drift_monitor')
+        if drift_monitor:
+            drift_monitor.record(data, stroke_risk)
+
         # Store the data in SQLite using SQLAlchemy
-        new_record = MedicalRecord(
-            gender=data['gender'],
-            age=data['age'],
-            hypertension=data['hypertension'],
-            ever_married=data['ever_married'],
-            work_type=data['work_type'],
-            Residence_type=data['Residence_type'],
-            avg_glucose_level=data['avg_glucose_level'],
-            bmi=data['bmi'],
-            smoking_status=data['smoking_status'],
-            stroke_risk=stroke_risk,
-            prediction=prediction
-        )
-
-        # Add the new record to the session and commit to the database
-        db.session.add(new_record)
-        db.session.commit()
+        fields = medical_record_fields(data, stroke_risk, prediction)
+        fields['user_id'] = optional_user_id()
+
+        # Add the new record, update the dashboard rollups and commit to the database,
+        # or hand the record to the write-behind buffer (committed together with others)
+        record_writer = current_app.extensions.get('record_writer')
+        with PREDICTION_STAGE_SECONDS.time(stage='persist'):
+            if record_writer:
+                record_writer.write(fields)
+            else:
+                db.session.add(MedicalRecord(**fields))
+                apply_rollups([fields])
+                db.session.commit()
 
         # Return the prediction result to the frontend
         return jsonify({
@@ -284,7 +431,95 @@ def predict():
             'prediction': prediction
         }), 200
 
-    except Exception as e:
-        print(f"Error: {e}")
+    except Exception:
+        logger.exception("Prediction failed")
+        return jsonify({'error': 'Something went wrong!'}), 500
+
+
+
+# Column values of the MedicalRecord stored for a scored request
+def medical_record_fields(data, stroke_risk, prediction):
+    return {
+        'gender': data['gender'],
+        'age': data['age'],
+        'hypertension': data['hypertension'],
+        'heart_disease': data['heart_disease'],
+        'ever_married': data['ever_married'],
+        'work_type': data['work_type'],
+        'Residence_type': data['Residence_type'],
+        'avg_glucose_level': data['avg_glucose_level'],
+        'bmi': data['bmi'],
+        'smoking_status': data['smoking_status'],
+        'stroke_risk': stroke_risk,
+        'prediction': prediction,
+        'created_at': datetime.datetime.utcnow()
+    }
+
+
+# Read the records of a batch request, either a JSON array or NDJSON (one object per line).
+# Lines that aren't valid JSON are reported per record instead of failing the batch.
+def read_batch_records():
+    parse_errors = {}
+    if request.mimetype in ('application/x-ndjson', 'application/ndjson', 'application/jsonl'):
+        records = []
+        for line in request.get_data(as_text=True).splitlines():
+            if not line.strip():
+                continue
+            try:
+                records.append(json.loads(line))
+            except ValueError:
+                parse_errors[len(records)] = "Invalid JSON"
+                records.append(None)
+        return records, parse_errors
+
+    records = request.get_json(silent=True)
+    if not isinstance(records, list):
+        return None, parse_errors
+    return records, parse_errors
+
+
+@auth_bp.route('/predict/batch', methods=['POST'])
+def predict_batch():
+    from app.stroke_model import predict_stroke_risk_batch
+
+    records, parse_errors = read_batch_records()
+    if records is None:
+        return jsonify({'error': 'Expected a JSON array or NDJSON body of records'}), 400
+
+    max_rows = current_app.config['PREDICT_BATCH_MAX_ROWS']
+    if len(records) > max_rows:
+        return jsonify({'error': f'A batch can contain at most {max_rows} records'}), 413
+
+    try:
+        results = predict_stroke_risk_batch(records, chunk_size=current_app.config['PREDICT_BATCH_CHUNK_SIZE'])
+        for position, message in parse_errors.items():
+            results[position] = {'error': message}
+
+        # Store all scored records with one bulk insert and a single commit
+        user_id = optional_user_id()
+        new_records = [
+            dict(medical_record_fields(records[position], result['stroke_risk'], result['prediction']), user_id=user_id)
+            for position, result in enumerate(results) if 'error' not in result
+        ]
+        drift_monitor = current_app.extensions.get('drift_monitor')
+        if drift_monitor:
+            for record in new_records:
+                drift_monitor.record(record, record['stroke_risk'])
+
+        if new_records:
+            with PREDICTION_STAGE_SECONDS.time(stage='persist'):
+                db.session.execute(insert(MedicalRecord), new_records)
+                apply_rollups(new_records)
+                db.session.commit()
+    except Exception:
+        db.session.rollback()
+        logger.exception("Batch prediction failed")
         return jsonify({'error': 'Something went wrong!'}), 500
 
+    failed = sum(1 for result in results if 'error' in result)
+    return jsonify({
+        'results': [dict(index=position, **result) for position, result in enumerate(results)],
+        'total': len(results),
+        'succeeded': len(results) - failed,
+        'failed': failed
+    }), 200
@@ -0,0 +1,201 @@
+from flask import Blueprint, jsonify, request, Response, stream_with_context, current_app
+from sqlalchemy import select, func, case, cast, Integer
+from datetime import datetime
+import shutil
+import tempfile
+from app.models import MedicalRecord
+from app.utils import db
+from app.routes.auth_routes import token_required, role_required
+from app.risk_rollups import query_rollups
+from app.drift_monitor import compare_sketches, load_baseline, baseline_path
+
+records_bp = Blueprint('records', __name__)
+
+# Columns /records/stats can group and filter by (age_band is computed from age)
+GROUPABLE_COLUMNS = ['gender', 'hypertension', 'ever_married', 'work_type', 'Residence_type', 'smoking_status']
+FILTER_COLUMNS = ['gender', 'ever_married', 'work_type', 'Residence_type', 'smoking_status']
+
+# Columns /records/rollups can group and filter by
+ROLLUP_COLUMNS = ['day', 'gender', 'age_band', 'smoking_status', 'stroke_risk']
+
+# Parse an ISO 8601 date or datetime query parameter
+def parse_datetime(value, name):
+    try:
+        return datetime.fromisoformat(value)
+    except ValueError:
+        raise ValueError(f"{name} must be an ISO 8601 date or datetime")
+
+# SQL expression for the age band of a record, e.g. 60 for ages 60-69 with a width of 10
+def age_band_expression(width):
+    return (cast(MedicalRecord.age, Integer) // width) * width
+
+# The aggregate query of /records/stats: totals and high risk counts per group_by value
+def stats_query(group_by, band_width=10, start=None, end=None, filters=None):
+    group = age_band_expression(band_width) if group_by == 'age_band' else getattr(MedicalRecord, group_by)
+    high_risk = func.sum(case((MedicalRecord.stroke_risk == 'High', 1), else_=0))
+    query = select(group.label('key'), func.count().label('total'), high_risk.label('high_risk')).group_by(group).order_by(group)
+
+    # Filters only touch indexed columns (created_at and the demographic columns)
+    if start is not None:
+        query = query.where(MedicalRecord.created_at >= start)
+    if end is not None:
+        query = query.where(MedicalRecord.created_at < end)
+    for column, value in (filters or {}).items():
+        query = query.where(getattr(MedicalRecord, column) == value)
+    return query
+
+# Stroke risk aggregates, computed by the database
+@records_bp.route('/records/stats', methods=['GET'])
+@token_required
+@role_required('admin', 'manager')
+def record_stats():
+    group_by = request.args.get('group_by', 'age_band')
+    if group_by != 'age_band' and group_by not in GROUPABLE_COLUMNS:
+        return jsonify({"error": f"group_by must be one of: age_band, {', '.join(GROUPABLE_COLUMNS)}"}), 400
+
+    band_width = request.args.get('band_width', 10, type=int)
+    if not band_width or band_width < 1:
+        return jsonify({"error": "band_width must be a positive integer"}), 400
+
+    try:
+        start = parse_datetime(request.args['from'], 'from') if 'from' in request.args else None
+        end = parse_datetime(request.args['to'], 'to') if 'to' in request.args else None
+    except ValueError as e:
+        return jsonify({"error": str(e)}), 400
+
+    filters = {column: request.args[column] for column in FILTER_COLUMNS if column in request.args}
+    query = stats_query(group_by, band_width, start, end, filters)
+
+    groups = []
+    for row in db.session.execute(query):
+        groups.append({
+            'key': row.key,
+            'total': row.total,
+            'high_risk': row.high_risk or 0,
+            'high_risk_rate': (row.high_risk or 0) / row.total if row.total else 0.0
+        })
+
+    total = sum(group['total'] for group in groups)
+    total_high_risk = sum(group['high_risk'] for group in groups)
+    return jsonify({
+        'group_by': group_by,
+        'from': start.isoformat() if start else None,
+        'to': end.isoformat() if end else None,
+        'total': total,
+        'high_risk': total_high_risk,
+        'high_risk_rate': total_high_risk / total if total else 0.0,
+        'groups': groups
+    }), 200
+
+
+# Dashboard aggregates from the incrementally maintained rollups (no scan of medical_records)
+@records_bp.route('/records/rollups', methods=['GET'])
+@token_required
+@role_required('admin', 'manager')
+def record_rollups():
+    group_by = request.args.get('group_by', 'day')
+    if group_by not in ROLLUP_COLUMNS:
+        return jsonify({"error": f"group_by must be one of: {', '.join(ROLLUP_COLUMNS)}"}), 400
+
+    try:
+        start = parse_datetime(request.args['from'], 'from').date() if 'from' in request.args else None
+        end = parse_datetime(request.args['to'], 'to').date() if 'to' in request.args else None
+    except ValueError as e:
+        return jsonify({"error": str(e)}), 400
+
+    filters = {column: request.args[column] for column in ROLLUP_COLUMNS if column != 'day' and column in request.args}
+    if 'age_band' in filters:
+        filters['age_band'] = request.args.get('age_band', type=int)
+
+    groups = query_rollups(group_by, start, end, filters)
+    total = sum(group['total'] for group in groups)
+    total_high_risk = sum(group['high_risk'] for group in groups)
+    return jsonify({
+        'group_by': group_by,
+        'from': start.isoformat() if start else None,
+        'to': end.isoformat() if end else None,
+        'total': total,
+        'high_risk': total_high_risk,
+        'high_risk_rate': total_high_risk / total if total else 0.0,
+        'groups': groups
+    }), 200
+
+
+# Input and prediction distributions of the current (or previous) window of scored
+# records from the in-process monitor, compared with the baseline
+@records_bp.route('/records/drift', methods=['GET'])
+@token_required
+@role_required('admin', 'manager')
+def record_drift():
+    monitor = current_app.extensions.get('drift_monitor')
+    if monitor is None:
+        return jsonify({"error": "The drift monitor is disabled (DRIFT_MONITOR_ENABLED)"}), 404
+
+    window = request.args.get('window', 'current')
+    if window not in ('current', 'previous'):
+        return jsonify({"error": "window must be current or previous"}), 400
+    start = monitor.window_start()
+    if window == 'previous':
+        start -= monitor.window_seconds
+
+    baseline = load_baseline(baseline_path(current_app))
+    report = compare_sketches(monitor.sketch(start), baseline['sketch'] if baseline else None,
+                              current_app.config['DRIFT_PSI_THRESHOLD'])
+    report.update({
+        'window_start': datetime.utcfromtimestamp(start).isoformat(),
+        'window_seconds': monitor.window_seconds,
+        'baseline': {key: baseline[key] for key in ('created_at', 'source', 'records')} if baseline else None
+    })
+    return jsonify(report), 200
+
+
+# Bulk import of medical records, the request body is a CSV or Parquet file
+@records_bp.route('/records/import', methods=['POST'])
+@token_required
+@role_required('admin')
+def import_medical_records():
+    from app.record_io import FORMATS, import_records
+
+    fmt = request.args.get('format', 'csv')
+    if fmt not in FORMATS:
+        return jsonify({"error": f"format must be one of: {', '.join(FORMATS)}"}), 400
+
+    batch_size = request.args.get('batch_size', 1000, type=int)
+    if batch_size is None or batch_size < 1:
+        return jsonify({"error": "batch_size must be a positive integer"}), 400
+    score = request.args.get('score', 'false').lower() in ('1', 'true', 'yes')
+
+    try:
+        if fmt == 'csv':
+            # CSV is parsed straight off the request stream, chunk by chunk
+            summary = import_records(request.stream, fmt, batch_size, score)
+        else:
+            # Parquet needs a seekable file, large bodies spill to disk
+            with tempfile.SpooledTemporaryFile(max_size=16 * 1024 * 1024) as body:
+                shutil.copyfileobj(request.stream, body)
+                body.seek(0)
+                summary = import_records(body, fmt, batch_size, score)
+    except ImportError as e:
+        return jsonify({"error": str(e)}), 501
+    except ValueError as e:
+        return jsonify({"error": str(e)}), 400
+
+    return jsonify(summary), 200
+
+
+# All medical records as a streamed CSV download
+@records_bp.route('/records/export', methods=['GET'])
+@token_required
+@role_required('admin')
+def export_medical_records():
+    from app.record_io import iter_csv
+
+    chunk_size = request.args.get('chunk_size', 1000, type=int)
+    if chunk_size is None or chunk_size < 1:
+        return jsonify({"error": "chunk_size must be a positive integer"}), 400
+
+    return Response(
+        stream_with_context(iter_csv(chunk_size)),
+        mimetype='text/csv',
+        headers={'Content-Disposition': 'attachment; filename=medical_records.csv'}
+    )
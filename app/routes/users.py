@@ -1,40 +1,174 @@
-from flask import Blueprint, jsonify, request
+from flask import Blueprint, jsonify, request, Response, stream_with_context, current_app
+from sqlalchemy import select, insert
+from sqlalchemy.exc import IntegrityError
+import json
 from app.models import User
 from app.utils import db
+from app.routes.auth_routes import invalidate_principal, token_required, role_required, conflicting_user_field, UNIQUE_USER_FIELDS
+from app.utils.metrics import DB_QUERY_SECONDS
+from app.utils.passwords import hash_passwords
+from app.utils.http_cache import versioned_json
+from app.table_versions import bump_version, table_version
 
 users_bp = Blueprint('users', __name__)
 
-# Helper function to serialize user
-def user_to_dict(user):
-    return {
-        'id': user.id,
-        'first_name': user.first_name,
-        'last_name': user.last_name,
-        'username': user.username,
-        'email': user.email,
-        'phone_number': user.phone_number,
-        'role': user.role
-    }
-
-# Get all users
+# Rows fetched from the database at a time when streaming users
+USERS_STREAM_CHUNK_SIZE = 500
+
+# Columns GET /users can return, the password hash is never selected
+USER_FIELDS = ['id', 'first_name', 'last_name', 'username', 'email', 'phone_number', 'role']
+
+# Read the listing options from the query string, raises ValueError for invalid values
+def parse_listing_args(args):
+    fields = USER_FIELDS
+    if args.get('fields'):
+        fields = [field.strip() for field in args['fields'].split(',') if field.strip()]
+        unknown = [field for field in fields if field not in USER_FIELDS]
+        if unknown or not fields:
+            raise ValueError(f"Unknown fields: {', '.join(unknown)}. Allowed fields: {', '.join(USER_FIELDS)}")
+
+    limit = args.get('limit', type=int)
+    if 'limit' in args and (limit is None or not 1 <= limit <= current_app.config['USERS_PAGE_MAX_LIMIT']):
+        raise ValueError(f"limit must be between 1 and {current_app.config['USERS_PAGE_MAX_LIMIT']}")
+
+    after_id = args.get('after_id', type=int)
+    if 'after_id' in args and after_id is None:
+        raise ValueError("after_id must be an integer")
+
+    return fields, args.get('role'), after_id or 0, limit
+
+# Get all users, optionally a page at a time (keyset pagination on id) or streamed as NDJSON
 @users_bp.route('/users', methods=['GET'])
 def all_users():
-    users = User.query.all()
-    return jsonify([user_to_dict(user) for user in users])
+    try:
+        fields, role, after_id, limit = parse_listing_args(request.args)
+    except ValueError as e:
+        return jsonify({"error": str(e)}), 400
+
+    # Select only the serialized columns, id is always needed for the cursor
+    columns = [User.id] + [getattr(User, field) for field in fields if field != 'id']
+    query = select(*columns).where(User.id > after_id).order_by(User.id)
+    if role:
+        query = query.where(User.role == role)
+
+    # Streaming export: rows are sent as they are read, memory use doesn't grow with the table
+    if request.args.get('format') == 'ndjson' or request.accept_mimetypes.best == 'application/x-ndjson':
+        if limit is not None:
+            query = query.limit(limit)
+
+        def generate():
+            for row in db.session.execute(query.execution_options(yield_per=USERS_STREAM_CHUNK_SIZE)):
+                yield json.dumps({field: getattr(row, field) for field in fields}) + "\n"
+
+        return Response(stream_with_context(generate()), mimetype='application/x-ndjson')
+
+    def build():
+        # Without a limit the whole list is returned like before
+        if limit is None:
+            with DB_QUERY_SECONDS.time(operation='list_users'):
+                rows = db.session.execute(query).all()
+            return [{field: getattr(row, field) for field in fields} for row in rows]
+
+        # Fetch one extra row to know whether there is a next page
+        with DB_QUERY_SECONDS.time(operation='list_users'):
+            rows = db.session.execute(query.limit(limit + 1)).all()
+        page = rows[:limit]
+        return {
+            "users": [{field: getattr(row, field) for field in fields} for row in page],
+            "next_after_id": page[-1].id if len(rows) > limit else None
+        }
+
+    # Read before the rows, a body is never older than the version it is cached and tagged with
+    with DB_QUERY_SECONDS.time(operation='users_version'):
+        version = table_version('users')
+    return versioned_json('users', version, (tuple(fields), role, after_id, limit), build)
+
+# Request fields of a user in POST /users/import (the ones /register takes) and their columns
+IMPORT_FIELDS = {'firstName': 'first_name', 'lastName': 'last_name', 'phoneNumber': 'phone_number',
+                 'username': 'username', 'email': 'email', 'password': 'password'}
+
+# Roles the app authorizes (see role_required), an imported user gets one of them
+ROLES = ('user', 'manager', 'admin')
+
+# Register many users in one transaction. Every user is inserted in its own savepoint,
+# so a user that collides with an existing one (or an earlier one of the same request)
+# is reported and skipped while the others are stored. The passwords are hashed
+# together beforehand, in the password hashing pool when PASSWORD_HASH_WORKERS is set.
+@users_bp.route('/users/import', methods=['POST'])
+@token_required
+@role_required('admin')
+def import_users():
+    rows = request.get_json(silent=True)
+    if isinstance(rows, dict):
+        rows = rows.get('users')
+    if not isinstance(rows, list):
+        return jsonify({"error": "Expected a JSON list of users"}), 400
+    if len(rows) > current_app.config['USERS_IMPORT_MAX_ROWS']:
+        return jsonify({"error": f"At most {current_app.config['USERS_IMPORT_MAX_ROWS']} users per request"}), 413
+
+    errors = []
+    valid = []
+    for number, row in enumerate(rows):
+        if not isinstance(row, dict):
+            errors.append({"row": number, "error": "Expected an object"})
+            continue
+        missing = [field for field in IMPORT_FIELDS if not row.get(field)]
+        if missing:
+            errors.append({"row": number, "error": f"Missing fields: {', '.join(missing)}"})
+            continue
+        not_strings = [field for field in IMPORT_FIELDS if not isinstance(row[field], str)]
+        if not_strings:
+            errors.append({"row": number, "error": f"Fields must be strings: {', '.join(not_strings)}"})
+            continue
+        if row.get('role') is not None and row['role'] not in ROLES:
+            errors.append({"row": number, "error": f"Unknown role, expected one of: {', '.join(ROLES)}", "field": "role"})
+            continue
+        valid.append((number, row))
+
+    hashes = hash_passwords([row['password'] for _, row in valid])
+
+    imported = 0
+    with DB_QUERY_SECONDS.time(operation='import_users'):
+        for (number, row), password in zip(valid, hashes):
+            values = {column: row[field] for field, column in IMPORT_FIELDS.items()}
+            values.update(password=password, role=row.get('role') or 'user')
+            try:
+                with db.session.begin_nested():
+                    db.session.execute(insert(User), [values])
+            except IntegrityError as e:
+                field = conflicting_user_field(e)
+                if field is None:
+                    errors.append({"row": number, "error": "Database integrity error"})
+                else:
+                    errors.append({"row": number, "error": f"{field.replace('_', ' ').capitalize()} already exists!",
+                                   "field": UNIQUE_USER_FIELDS[field]})
+                continue
+            imported += 1
+        if imported:
+            bump_version('users')
+        db.session.commit()
+
+    errors.sort(key=lambda error: error['row'])
+    return jsonify({"received": len(rows), "imported": imported, "skipped": len(rows) - imported, "errors": errors}), 200
+
 
 # Flask route to update user role
 @users_bp.route('/users/<int:user_id>', methods=['PUT'])
 def update_user(user_id):
     try:
-        user = User.query.get(user_id)  # Find the user by ID
+        with DB_QUERY_SECONDS.time(operation='get_user'):
+            user = User.query.get(user_id)  # Find the user by ID
         if not user:
             return jsonify({"error": "User not found"}), 404
 
         # Update the user role
         new_role = request.json.get('role')  # Role sent from the client (e.g., "admin" or "user")
         user.role = new_role
+        bump_version('users')
 
-        db.session.commit()  # Commit the change to the database
+        with DB_QUERY_SECONDS.time(operation='update_user'):
+            db.session.commit()  # Commit the change to the database
+        invalidate_principal(user_id)  # Authorize the next request with the new role
         return jsonify({"message": "User updated successfully"}), 200
 
     except Exception as e:
@@ -45,12 +179,16 @@ def update_user(user_id):
 @users_bp.route('/users/<int:user_id>', methods=['DELETE'])
 def delete_user(user_id):
     try:
-        user = User.query.get(user_id)  # Find the user by ID
+        with DB_QUERY_SECONDS.time(operation='get_user'):
+            user = User.query.get(user_id)  # Find the user by ID
         if not user:
             return jsonify({"error": "User not found"}), 404
 
-        db.session.delete(user)  # Delete the user from the database
-        db.session.commit()  # Commit the change to the database
+        with DB_QUERY_SECONDS.time(operation='delete_user'):
+            db.session.delete(user)  # Delete the user from the database
+            bump_version('users')
+            db.session.commit()  # Commit the change to the database
+        invalidate_principal(user_id)  # Reject the user's tokens from now on
         return jsonify({"message": "User deleted successfully"}), 200
 
     except Exception as e:
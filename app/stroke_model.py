@@ -2,11 +2,54 @@ import joblib
 import pandas as pd
 import os
 import numpy as np
+import hashlib
+import threading
+import time
+import logging
+import math
+import copy
+import numbers
+from flask import current_app
+from app.utils.helpers import TTLCache
+from app.utils.metrics import PREDICTION_STAGE_SECONDS
+from app.model_artifact import ARTIFACT_FILE, ArtifactModel, ArtifactError, read_artifact, write_artifact, compare_predictions
+
+logger = logging.getLogger(__name__)
+
+# Default location of the model artifacts (overridable with MODEL_BASE_PATH)
+DEFAULT_MODEL_BASE_PATH = os.path.join(os.path.dirname(os.path.abspath(__file__)), 'StrokeModels')
+
+# Every file that makes up one version of the stroke model
+MODEL_FILES = [
+    'gender_map.pkl',
+    'ever_married_map.pkl',
+    'work_type_map.pkl',
+    'residence_type_map.pkl',
+    'smoking_status_map.pkl',
+    'stroke_prediction_model.pkl',
+    ARTIFACT_FILE,
+]
+
+# Features every prediction request has to provide
+REQUIRED_FEATURES = [
+    'gender', 'age', 'hypertension', 'heart_disease',
+    'ever_married', 'work_type', 'Residence_type',
+    'avg_glucose_level', 'bmi', 'smoking_status'
+]
+
+# Categorical features and the ModelBundle attribute holding their label encoding
+CATEGORICAL_FEATURES = {
+    'gender': 'gender_map',
+    'ever_married': 'ever_married_map',
+    'work_type': 'work_type_map',
+    'Residence_type': 'residence_type_map',
+    'smoking_status': 'smoking_status_map',
+}
 
 # Load the pre-trained model and the label encodings
-def load_model():
+def load_model(base_dir=None):
     # Set the base directory for models (use environment variable or default path)
-    BASE_DIR = os.getenv('MODEL_BASE_PATH', '/home/code/MyProjects/Systems/HospitalSystemServer/app/StrokeModels')
+    BASE_DIR = base_dir or os.getenv('MODEL_BASE_PATH', DEFAULT_MODEL_BASE_PATH)
 
     # Load the mappings for categorical variables
     gender_map = joblib.load(os.path.join(BASE_DIR, 'gender_map.pkl'))
@@ -20,6 +63,298 @@ def load_model():
 
     return model, gender_map, ever_married_map, work_type_map, residence_type_map, smoking_status_map
 
+# Only the label encodings (feature -> map), for validating records without loading the model
+def load_category_maps(base_dir):
+    if artifact_is_current(base_dir):
+        return read_artifact(os.path.join(base_dir, ARTIFACT_FILE), verify=False)[0]['category_maps']
+    return {feature: joblib.load(os.path.join(base_dir, f'{attribute}.pkl')) for feature, attribute in CATEGORICAL_FEATURES.items()}
+
+# True when base_dir holds an exported artifact at least as new as the pickles it was made from
+def artifact_is_current(base_dir):
+    try:
+        artifact_mtime = os.stat(os.path.join(base_dir, ARTIFACT_FILE)).st_mtime_ns
+    except FileNotFoundError:
+        return False
+    for name in MODEL_FILES:
+        path = os.path.join(base_dir, name)
+        if name != ARTIFACT_FILE and os.path.exists(path) and os.stat(path).st_mtime_ns > artifact_mtime:
+            logger.warning(f"{path} is newer than {ARTIFACT_FILE}, loading the pickled model (run 'flask model export' again)")
+            return False
+    return True
+
+# Fingerprint of the model files on disk, changes whenever one of them is replaced
+def model_files_signature(base_dir):
+    signature = []
+    for name in MODEL_FILES:
+        try:
+            stat = os.stat(os.path.join(base_dir, name))
+            signature.append((name, stat.st_mtime_ns, stat.st_size))
+        except FileNotFoundError:
+            signature.append((name, None, None))
+    return tuple(signature)
+
+# Version of the model whose files have this signature
+def signature_version(signature):
+    return hashlib.sha1(repr(signature).encode()).hexdigest()[:12]
+
+# Load the model files in base_dir into a ModelBundle. With artifact="auto" an up to date
+# artifact (see app/model_artifact.py) is memory-mapped instead of unpickling the model.
+def load_bundle(base_dir, artifact='auto', verify=True):
+    signature = model_files_signature(base_dir)
+    if artifact != 'off' and artifact_is_current(base_dir):
+        model = ArtifactModel.load(os.path.join(base_dir, ARTIFACT_FILE), verify)
+        maps = [model.category_maps[feature] for feature in CATEGORICAL_FEATURES]
+        return ModelBundle(model, *maps, signature=signature)
+    return ModelBundle(*load_model(base_dir), signature=signature)
+
+# Pack the pickled model and maps in base_dir into an artifact (by default next to them).
+# The artifact is only put in place once its predictions match the pickled model's.
+def export_artifact(base_dir, path=None, check_rows=5000):
+    model, *maps = load_model(base_dir)
+    category_maps = dict(zip(CATEGORICAL_FEATURES, maps))
+    path = path or os.path.join(base_dir, ARTIFACT_FILE)
+
+    candidate = f"{path}.new"
+    manifest = write_artifact(candidate, model, category_maps)
+    try:
+        mismatches = compare_predictions(model, ArtifactModel.load(candidate), category_maps, check_rows) if check_rows else 0
+        if mismatches:
+            raise ArtifactError(f"The artifact disagrees with the pickled model on {mismatches} of {check_rows} test inputs")
+    except Exception:
+        os.remove(candidate)
+        raise
+    os.replace(candidate, path)
+    return manifest
+
+# Raised in a worker process when the model files on disk aren't the version the parent uses
+class ModelVersionMismatch(RuntimeError):
+    pass
+
+# Model bundles loaded by worker processes (rescoring, the prediction executor), one per
+# model directory, reused until the parent asks for another version of the model
+_worker_bundles = {}
+
+def worker_bundle(base_dir, artifact, version):
+    bundle = _worker_bundles.get(base_dir)
+    if bundle is not None and bundle.version == version:
+        return bundle
+
+    # Only load files of the requested version (a stat() per file tells), so a parent that
+    # hasn't reloaded new files yet doesn't make every call load them again
+    found = signature_version(model_files_signature(base_dir))
+    if found == version:
+        bundle = load_bundle(base_dir, artifact)
+        found = bundle.version
+    if found != version:
+        raise ModelVersionMismatch(f"Model files changed (expected version {version}, found {found})")
+    _worker_bundles[base_dir] = bundle
+    return bundle
+
+# One loaded version of the model together with its label encodings
+class ModelBundle:
+    def __init__(self, model, gender_map, ever_married_map, work_type_map, residence_type_map, smoking_status_map, signature):
+        self.model = model
+        self.gender_map = gender_map
+        self.ever_married_map = ever_married_map
+        self.work_type_map = work_type_map
+        self.residence_type_map = residence_type_map
+        self.smoking_status_map = smoking_status_map
+        self.signature = signature
+        self.version = signature_version(signature)
+        self.loaded_at = time.time()
+        self._compile()
+
+    # Precompute everything the single-row fast path needs: one lookup table per
+    # categorical feature and the position of every feature in the model's input
+    def _compile(self):
+        self.feature_names = [str(feature) for feature in getattr(self.model, 'feature_names_in_', REQUIRED_FEATURES)]
+        self.missing_from_input = [feature for feature in self.feature_names if feature not in REQUIRED_FEATURES]
+        self.lookup_tables = {
+            feature: {key: float(value) for key, value in getattr(self, attribute).items()}
+            for feature, attribute in CATEGORICAL_FEATURES.items()
+        }
+        self._columns = [
+            (position, feature, self.lookup_tables.get(feature))
+            for position, feature in enumerate(self.feature_names) if feature in REQUIRED_FEATURES
+        ]
+        self._buffers = threading.local()
+        self.array_model = array_model(self.model)
+
+    # Validate one request and encode it into a (1, n_features) row ready for model.predict.
+    # Raises the same ValueErrors as preprocess_input. Unless an output row is given the
+    # row is a per-thread buffer that is overwritten by the next call.
+    def encode(self, data, out=None):
+        missing_features = [feature for feature in REQUIRED_FEATURES if feature not in data]
+        if missing_features:
+            raise ValueError(f"Missing required features: {', '.join(missing_features)}")
+
+        # Same rules as the pandas path: unknown categories, None and NaN are rejected
+        unmapped_columns = []
+        for feature in REQUIRED_FEATURES:
+            value = data[feature]
+            table = self.lookup_tables.get(feature)
+            if table is not None:
+                try:
+                    valid = value in table
+                except TypeError:
+                    valid = False
+            else:
+                valid = value is not None and not (isinstance(value, float) and math.isnan(value))
+            if not valid:
+                unmapped_columns.append(feature)
+        if unmapped_columns:
+            invalid_values = {column: data[column] for column in unmapped_columns}
+            raise ValueError(f"Some categorical variables have invalid values. Unmapped columns: {unmapped_columns}. Invalid values: {invalid_values}")
+
+        if out is None:
+            out = getattr(self._buffers, 'row', None)
+            if out is None:
+                out = self._buffers.row = np.empty((1, len(self.feature_names)), dtype=np.float64)
+        row = out.reshape(-1)
+        for position, feature, table in self._columns:
+            row[position] = table[data[feature]] if table is not None else float(data[feature])
+        return out
+
+    # The label encodings in the order preprocess_input expects them
+    @property
+    def maps(self):
+        return self.gender_map, self.ever_married_map, self.work_type_map, self.residence_type_map, self.smoking_status_map
+
+# The model the NumPy fast paths score with. An estimator fitted on a DataFrame warns
+# about every array it gets, so they use a shallow copy without the fitted feature names
+# (the rows are already in feature_names order). The pandas paths keep using the model.
+def array_model(model):
+    from sklearn.base import BaseEstimator
+    if not isinstance(model, BaseEstimator) or 'feature_names_in_' not in vars(model):
+        return model
+    model = copy.copy(model)
+    del model.feature_names_in_
+    return model
+
+# Keeps the loaded model in memory and shares it across requests and threads.
+# A new bundle is always built completely before it replaces the old one, so
+# readers only ever see a fully loaded model (a plain attribute swap is atomic).
+class ModelRegistry:
+    def __init__(self, config):
+        self.config = config
+        self._bundle = None
+        self._load_lock = threading.Lock()
+        self._reloading = False
+        self._last_check = 0.0
+        self._reload_listeners = []
+
+        # Results of recent predictions, keyed by model version and the canonical input
+        self.prediction_cache = None
+        if config.get('PREDICTION_CACHE_SIZE', 0) > 0:
+            self.prediction_cache = TTLCache(config['PREDICTION_CACHE_SIZE'], config.get('PREDICTION_CACHE_TTL'))
+            self.on_reload(lambda bundle: self.prediction_cache.clear())
+
+    @property
+    def base_dir(self):
+        return self.config.get('MODEL_BASE_PATH') or DEFAULT_MODEL_BASE_PATH
+
+    @property
+    def loaded(self):
+        return self._bundle is not None
+
+    # Called with the new bundle every time a (re)load swaps the model in
+    def on_reload(self, listener):
+        self._reload_listeners.append(listener)
+        return listener
+
+    # Return the current bundle, loading it on first use
+    def get(self):
+        bundle = self._bundle
+        if bundle is None:
+            with self._load_lock:
+                if self._bundle is None:
+                    self._swap(self._load())
+                return self._bundle
+
+        interval = self.config.get('MODEL_RELOAD_INTERVAL', 0)
+        if interval and time.monotonic() - self._last_check >= interval:
+            self._check_for_changes(bundle)
+        return bundle
+
+    # Load the model files again and swap them in, the old model keeps serving meanwhile
+    def reload(self):
+        with self._load_lock:
+            bundle = self._load()
+            # Files changed while we were reading them (deploy still in progress), try again later
+            if model_files_signature(self.base_dir) != bundle.signature:
+                return self._bundle
+            self._swap(bundle)
+            return bundle
+
+    # Look up the result of an identical earlier prediction. Returns the cache key to
+    # store the new result under (None when the input can't be cached) and the cached result.
+    def cached_prediction(self, data, bundle):
+        if self.prediction_cache is None:
+            return None, None
+        key = prediction_cache_key(data, bundle)
+        if key is None:
+            return None, None
+        result = self.prediction_cache.get(key)
+        return key, dict(result) if result is not None else None
+
+    def cache_prediction(self, key, result):
+        if key is not None:
+            self.prediction_cache.set(key, dict(result))
+
+    @property
+    def artifact_mode(self):
+        return self.config.get('MODEL_ARTIFACT', 'auto')
+
+    def _load(self):
+        with PREDICTION_STAGE_SECONDS.time(stage='load'):
+            return load_bundle(self.base_dir, self.artifact_mode, self.config.get('MODEL_ARTIFACT_VERIFY', True))
+
+    def _swap(self, bundle):
+        self._bundle = bundle
+        self._last_check = time.monotonic()
+        for listener in self._reload_listeners:
+            listener(bundle)
+
+    # Cheap stat() based change detection, the actual reload runs in the background
+    def _check_for_changes(self, bundle):
+        self._last_check = time.monotonic()
+        if self._reloading or model_files_signature(self.base_dir) == bundle.signature:
+            return
+
+        self._reloading = True
+        threading.Thread(target=self._background_reload, name='stroke-model-reload', daemon=True).start()
+
+    def _background_reload(self):
+        try:
+            self.reload()
+        except Exception as e:
+            # Keep serving the previous model if the new files can't be loaded (e.g. half copied)
+            logger.warning(f"Stroke model reload failed, keeping version {self._bundle.version}: {e}")
+        finally:
+            self._reloading = False
+
+# Canonical form of the 10 input features, so that e.g. 67 and 67.0 share a cache entry.
+# Inputs that are incomplete or hold unexpected types aren't cached (they fail validation anyway).
+def prediction_cache_key(data, bundle):
+    values = [bundle.version]
+    for feature in REQUIRED_FEATURES:
+        value = data.get(feature) if isinstance(data, dict) else None
+        if isinstance(value, str):
+            values.append(value)
+        elif isinstance(value, numbers.Real):
+            values.append(float(value))
+        else:
+            return None
+    return tuple(values)
+
+# The model registry of the current app, attached on first use (see app/model_warmup.py)
+def get_model_registry():
+    registry = current_app.extensions.get('stroke_model')
+    if registry is None:
+        from app.model_warmup import load_model_stack
+        registry = load_model_stack(current_app._get_current_object())
+    return registry
+
 # Preprocess the input data
 def preprocess_input(data, gender_map, ever_married_map, work_type_map, residence_type_map, smoking_status_map):
     # List of required features
@@ -57,25 +392,34 @@ def preprocess_input(data, gender_map, ever_married_map, work_type_map, residenc
 
     return input_data
 
-# Make prediction using the model
-def predict_stroke_risk(data):
-    # Load the model and label encodings
-    model, gender_map, ever_married_map, work_type_map, residence_type_map, smoking_status_map = load_model()
+# Score the encoded rows with the model of the bundle (the default for predict_stroke_risk)
+def predict_rows(bundle, rows):
+    return bundle.array_model.predict(rows)
+
+def predict_stroke_risk(data, predict=predict_rows):
+    # Use the model kept in memory by the registry (loaded once per process)
+    registry = get_model_registry()
+    bundle = registry.get()
+
+    # Repeated identical inputs (retries, refreshes) are answered from the cache
+    cache_key, cached_result = registry.cached_prediction(data, bundle)
+    if cached_result is not None:
+        return cached_result
 
-    # Preprocess the input data
+    # Encode the input straight into a NumPy row (preprocess_input does the same with pandas)
     try:
-        processed_data = preprocess_input(data, gender_map, ever_married_map, work_type_map, residence_type_map, smoking_status_map)
+        with PREDICTION_STAGE_SECONDS.time(stage='preprocess'):
+            processed_data = bundle.encode(data)
     except ValueError as e:
         raise ValueError(f"Preprocessing Error: {e}")
 
     # Ensure input features match the model's training features
-    expected_features = model.feature_names_in_  # This contains the features the model was trained on
-    if not all(feature in processed_data.columns for feature in expected_features):
-        missing_from_input = [feature for feature in expected_features if feature not in processed_data.columns]
-        raise ValueError(f"Input data does not match the model's expected features. Missing: {missing_from_input}")
+    if bundle.missing_from_input:
+        raise ValueError(f"Input data does not match the model's expected features. Missing: {bundle.missing_from_input}")
 
     # Make prediction
-    prediction = model.predict(processed_data)
+    with PREDICTION_STAGE_SECONDS.time(stage='predict'):
+        prediction = predict(bundle, processed_data)
 
     # Interpret prediction: 1 means high risk, 0 means low risk
     stroke_risk = "High" if prediction[0] == 1 else "Low"
@@ -85,7 +429,94 @@ def predict_stroke_risk(data):
         'stroke_risk': stroke_risk,
         'prediction': int(prediction[0])  # Convert prediction to int, if it's numpy.int64
     }
-    print(result)
 
+    registry.cache_prediction(cache_key, result)
     return result
 
+# Interpret a raw model output: 1 means high risk, 0 means low risk
+def interpret_prediction(value):
+    return {
+        'stroke_risk': "High" if value == 1 else "Low",
+        'prediction': int(value)
+    }
+
+# Validate and label encode many records in one vectorized pass.
+# Returns the encoded rows (in the model's feature order), the positions of the
+# records they came from and an error message for every record that was rejected.
+def preprocess_batch(records, bundle):
+    errors = {}
+    valid_positions = []
+    rows = []
+    for position, data in enumerate(records):
+        if not isinstance(data, dict):
+            errors[position] = "Preprocessing Error: Each record must be a JSON object"
+            continue
+        missing_features = [feature for feature in REQUIRED_FEATURES if feature not in data]
+        if missing_features:
+            errors[position] = f"Preprocessing Error: Missing required features: {', '.join(missing_features)}"
+            continue
+        # Nested values can't be encoded and would break the vectorized mapping below
+        unmapped_columns = [feature for feature in REQUIRED_FEATURES if isinstance(data[feature], (list, dict))]
+        if unmapped_columns:
+            invalid_values = {column: data[column] for column in unmapped_columns}
+            errors[position] = f"Preprocessing Error: Some categorical variables have invalid values. Unmapped columns: {unmapped_columns}. Invalid values: {invalid_values}"
+            continue
+        valid_positions.append(position)
+        rows.append([data[feature] for feature in REQUIRED_FEATURES])
+
+    input_data = encode_frame(pd.DataFrame(rows, columns=REQUIRED_FEATURES), bundle)
+
+    # Reject the records with unmapped or non numeric values
+    invalid = input_data.isnull()
+    invalid_rows = invalid.any(axis=1).to_numpy()
+    if invalid_rows.any():
+        for row in np.flatnonzero(invalid_rows):
+            data = records[valid_positions[row]]
+            unmapped_columns = [column for column in REQUIRED_FEATURES if invalid.at[row, column]]
+            invalid_values = {column: data[column] for column in unmapped_columns}
+            errors[valid_positions[row]] = f"Preprocessing Error: Some categorical variables have invalid values. Unmapped columns: {unmapped_columns}. Invalid values: {invalid_values}"
+        input_data = input_data[~invalid_rows].reset_index(drop=True)
+        valid_positions = [position for position, bad in zip(valid_positions, invalid_rows) if not bad]
+
+    # Ensure input features match the model's training features
+    expected_features = list(bundle.model.feature_names_in_)
+    missing_from_input = [feature for feature in expected_features if feature not in input_data.columns]
+    if missing_from_input:
+        raise ValueError(f"Input data does not match the model's expected features. Missing: {missing_from_input}")
+
+    return input_data[expected_features], valid_positions, errors
+
+# Label encode a DataFrame holding the required features, column by column.
+# Unknown categories and non numeric values become NaN.
+def encode_frame(frame, bundle):
+    encoded = pd.DataFrame(index=frame.index)
+    for column in REQUIRED_FEATURES:
+        if column in CATEGORICAL_FEATURES:
+            encoded[column] = frame[column].map(getattr(bundle, CATEGORICAL_FEATURES[column]))
+        else:
+            encoded[column] = pd.to_numeric(frame[column], errors='coerce')
+    return encoded
+
+# Interpret the model outputs of a whole chunk, returns the stroke_risk and prediction columns
+def interpret_predictions(predictions):
+    predictions = np.asarray(predictions).astype(int)
+    return np.where(predictions == 1, "High", "Low"), predictions
+
+# Score many records, calling the model once per chunk. Returns one result per
+# record, records that fail validation get an 'error' instead of a prediction.
+def predict_stroke_risk_batch(records, chunk_size=1000):
+    bundle = get_model_registry().get()
+    with PREDICTION_STAGE_SECONDS.time(stage='preprocess'):
+        processed_data, valid_positions, errors = preprocess_batch(records, bundle)
+
+    results = [None] * len(records)
+    for position, message in errors.items():
+        results[position] = {'error': message}
+
+    for start in range(0, len(processed_data), chunk_size):
+        with PREDICTION_STAGE_SECONDS.time(stage='predict'):
+            predictions = bundle.model.predict(processed_data.iloc[start:start + chunk_size])
+        for position, value in zip(valid_positions[start:start + chunk_size], predictions):
+            results[position] = interpret_prediction(value)
+
+    return results
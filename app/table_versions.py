@@ -0,0 +1,37 @@
+from sqlalchemy import select, update, insert
+from sqlalchemy.exc import IntegrityError
+from app.models import TableVersion
+from app.utils import db
+
+# Change counters of tables whose listings are served with ETags. Every view that
+# changes a row of the table calls bump_version() before it commits, the counter then
+# changes in the same transaction as the rows.
+
+
+# Add one to the table's counter, in the caller's transaction
+def bump_version(name):
+    dialect = db.session.get_bind().dialect.name
+    if dialect in ('sqlite', 'postgresql'):
+        if dialect == 'sqlite':
+            from sqlalchemy.dialects.sqlite import insert as upsert
+        else:
+            from sqlalchemy.dialects.postgresql import insert as upsert
+        statement = upsert(TableVersion).values(name=name, version=1)
+        statement = statement.on_conflict_do_update(index_elements=['name'], set_={'version': TableVersion.version + 1})
+        db.session.execute(statement)
+        return
+
+    # Other databases: update the counter and create it when it doesn't exist yet
+    result = db.session.execute(update(TableVersion).where(TableVersion.name == name).values(version=TableVersion.version + 1))
+    if result.rowcount == 0:
+        try:
+            with db.session.begin_nested():
+                db.session.execute(insert(TableVersion).values(name=name, version=1))
+        except IntegrityError:
+            # Another transaction created it in the meantime
+            db.session.execute(update(TableVersion).where(TableVersion.name == name).values(version=TableVersion.version + 1))
+
+
+# The table's counter, 0 while it was never bumped
+def table_version(name):
+    return db.session.execute(select(TableVersion.version).where(TableVersion.name == name)).scalar() or 0
@@ -1,4 +1,87 @@
 from flask_sqlalchemy import SQLAlchemy
+from sqlalchemy import event, inspect, literal, text
+from sqlalchemy.engine import make_url
+from sqlalchemy.schema import CreateColumn
 
 # Initialize SQLAlchemy
 db = SQLAlchemy()
+
+# Engine and pool options derived from the DB_* / SQLITE_* settings in Config
+def engine_options(config):
+    url = make_url(config['SQLALCHEMY_DATABASE_URI'])
+    options = {
+        'pool_pre_ping': config['DB_POOL_PRE_PING'],
+        'pool_recycle': config['DB_POOL_RECYCLE'],
+    }
+
+    # In-memory SQLite uses a single static connection, there is no pool to size
+    in_memory = url.get_backend_name() == 'sqlite' and url.database in (None, '', ':memory:')
+    if not in_memory:
+        options.update({
+            'pool_size': config['DB_POOL_SIZE'],
+            'max_overflow': config['DB_MAX_OVERFLOW'],
+            'pool_timeout': config['DB_POOL_TIMEOUT'],
+        })
+
+    # Explicit SQLALCHEMY_ENGINE_OPTIONS win over the derived ones
+    options.update(config.get('SQLALCHEMY_ENGINE_OPTIONS') or {})
+    return options
+
+# Apply the SQLite profile to every new connection: WAL lets readers and the writer
+# work concurrently, synchronous=NORMAL only fsyncs at checkpoints in WAL mode and
+# busy_timeout makes writers wait for the lock instead of failing right away
+def sqlite_pragmas(config):
+    def on_connect(dbapi_connection, connection_record):
+        cursor = dbapi_connection.cursor()
+        if config['SQLITE_WAL']:
+            cursor.execute("PRAGMA journal_mode=WAL")
+        cursor.execute(f"PRAGMA synchronous={config['SQLITE_SYNCHRONOUS']}")
+        cursor.execute(f"PRAGMA busy_timeout={int(config['SQLITE_BUSY_TIMEOUT'])}")
+        cursor.close()
+    return on_connect
+
+# Configure the engine from the app config and attach SQLAlchemy to the app
+def init_db(app):
+    app.config['SQLALCHEMY_ENGINE_OPTIONS'] = engine_options(app.config)
+    db.init_app(app)
+
+    if make_url(app.config['SQLALCHEMY_DATABASE_URI']).get_backend_name() == 'sqlite':
+        with app.app_context():
+            event.listen(db.engine, "connect", sqlite_pragmas(app.config))
+
+# Bring the tables that already exist up to the models: add the columns and indexes
+# defined since the table was created. create_all() only creates missing tables.
+# A NOT NULL column gets its default as a DEFAULT clause, which also fills the rows
+# already stored (created_at becomes the time of the upgrade). Returns what was added.
+def upgrade_schema():
+    engine = db.engine
+    existing = inspect(engine)
+    added = []
+    with engine.begin() as connection:
+        for table in db.metadata.sorted_tables:
+            if not existing.has_table(table.name):
+                continue
+            columns = {column['name'] for column in existing.get_columns(table.name)}
+            for column in table.columns:
+                if column.name not in columns:
+                    connection.execute(text(f"ALTER TABLE {table.name} ADD COLUMN {_column_ddl(column, engine.dialect)}"))
+                    added.append(f"column {table.name}.{column.name}")
+            indexes = {index['name'] for index in existing.get_indexes(table.name)}
+            for index in table.indexes:
+                if index.name not in indexes:
+                    index.create(connection)
+                    added.append(f"index {index.name}")
+    return added
+
+def _column_ddl(column, dialect):
+    ddl = str(CreateColumn(column).compile(dialect=dialect))
+    if not column.nullable and column.server_default is None:
+        if column.default is None:
+            raise ValueError(f"Can't add {column.table.name}.{column.name} to the stored rows, it is NOT NULL without a default")
+        default = column.default.arg(None) if column.default.is_callable else column.default.arg
+        ddl += f" DEFAULT {literal(default, column.type).compile(dialect=dialect, compile_kwargs={'literal_binds': True})}"
+    for foreign_key in column.foreign_keys:
+        ddl += f" REFERENCES {foreign_key.column.table.name} ({foreign_key.column.name})"
+        if foreign_key.ondelete:
+            ddl += f" ON DELETE {foreign_key.ondelete}"
+    return ddl
@@ -0,0 +1,70 @@
+import gzip
+from flask import request, current_app
+from app.utils.helpers import TTLCache
+
+try:
+    import brotli
+except ImportError:  # optional, responses are only gzipped without it
+    brotli = None
+
+# Conditional GET and compression for JSON listings whose content only changes with a
+# version counter (see app/table_versions.py). The ETag is derived from the version,
+# so a client polling an unchanged listing gets a 304 before anything is queried or
+# serialized. Serialized and compressed bodies are cached per version.
+
+
+def _compress(body, encoding):
+    if encoding == 'br':
+        return brotli.compress(body, quality=5)
+    return gzip.compress(body, compresslevel=6)
+
+
+# Content encodings the client accepts that this process can produce, best first
+def negotiate_encoding():
+    offered = ['br', 'gzip'] if brotli is not None else ['gzip']
+    return request.accept_encodings.best_match(offered)
+
+
+# Respond with the listing of this version. build() returns the data to serialize and
+# is only called when the body isn't cached. key tells the variants of the resource
+# apart (the query arguments), the version is added to it.
+def versioned_json(tag, version, key, build):
+    encoding = negotiate_encoding()
+    etag = f"{tag}-{version}"
+    compressed_etag = f"{etag}-{encoding}" if encoding else None
+
+    # The client has this version, in whichever encoding it was sent
+    for candidate in (etag, compressed_etag):
+        if candidate and request.if_none_match.contains_weak(candidate):
+            return _response(None, candidate, None, 304)
+
+    cache = current_app.extensions['payload_cache']
+    body = cache.get((tag, version, key, None))
+    if body is None:
+        body = current_app.json.response(build()).get_data()
+        cache.set((tag, version, key, None), body)
+
+    if not encoding or len(body) < current_app.config['COMPRESS_MIN_BYTES']:
+        return _response(body, etag, None, 200)
+
+    encoded = cache.get((tag, version, key, encoding))
+    if encoded is None:
+        encoded = _compress(body, encoding)
+        cache.set((tag, version, key, encoding), encoded)
+    return _response(encoded, compressed_etag, encoding, 200)
+
+
+def _response(body, etag, encoding, status):
+    response = current_app.response_class(body, status=status, mimetype='application/json')
+    response.set_etag(etag)
+    # Revalidate on every use, the 304 makes that cheap
+    response.headers['Cache-Control'] = 'no-cache'
+    response.headers['Vary'] = 'Accept-Encoding'
+    if encoding:
+        response.headers['Content-Encoding'] = encoding
+    return response
+
+
+# Per-app cache of serialized bodies (see PAYLOAD_CACHE_SIZE), old versions fall out as the least recently used
+def init_payload_cache(app):
+    app.extensions['payload_cache'] = TTLCache(app.config['PAYLOAD_CACHE_SIZE'])
@@ -0,0 +1,109 @@
+import json
+import os
+import sqlite3
+import threading
+import time
+from contextlib import contextmanager
+
+# Small key/value store in a SQLite file, shared by the worker processes of one host
+# (gunicorn or uvicorn workers). Values are JSON and can expire. Writes that read the
+# current value first run in a BEGIN IMMEDIATE transaction, so concurrent updates from
+# other processes are serialized by SQLite's write lock.
+class LocalStore:
+    def __init__(self, path, busy_timeout=5.0):
+        self.path = path
+        self.busy_timeout = busy_timeout
+        self._local = threading.local()
+        directory = os.path.dirname(os.path.abspath(path))
+        os.makedirs(directory, exist_ok=True)
+        with self.transaction() as connection:
+            connection.execute(
+                "CREATE TABLE IF NOT EXISTS entries (key TEXT PRIMARY KEY, value TEXT NOT NULL, expires_at REAL)")
+
+    # One connection per thread, opened again in a forked worker
+    def _connection(self):
+        connection = getattr(self._local, 'connection', None)
+        if connection is None or self._local.pid != os.getpid():
+            connection = sqlite3.connect(self.path, timeout=self.busy_timeout, isolation_level=None)
+            connection.execute("PRAGMA journal_mode=WAL")
+            connection.execute("PRAGMA synchronous=NORMAL")
+            self._local.connection = connection
+            self._local.pid = os.getpid()
+        return connection
+
+    @contextmanager
+    def transaction(self):
+        connection = self._connection()
+        connection.execute("BEGIN IMMEDIATE")
+        try:
+            yield connection
+        except BaseException:
+            connection.execute("ROLLBACK")
+            raise
+        connection.execute("COMMIT")
+
+    @staticmethod
+    def _expires_at(ttl):
+        return time.time() + ttl if ttl else None
+
+    @staticmethod
+    def _read(connection, key):
+        row = connection.execute("SELECT value, expires_at FROM entries WHERE key = ?", (key, )).fetchone()
+        if row is None or (row[1] is not None and row[1] <= time.time()):
+            return None
+        return json.loads(row[0])
+
+    def get(self, key, default=None):
+        value = self._read(self._connection(), key)
+        return default if value is None else value
+
+    def set(self, key, value, ttl=None):
+        self._connection().execute("INSERT OR REPLACE INTO entries (key, value, expires_at) VALUES (?, ?, ?)",
+                                   (key, json.dumps(value), self._expires_at(ttl)))
+
+    # Store the value only when the key is missing or expired, True when it was stored
+    def add(self, key, value, ttl=None):
+        with self.transaction() as connection:
+            if self._read(connection, key) is not None:
+                return False
+            connection.execute("INSERT OR REPLACE INTO entries (key, value, expires_at) VALUES (?, ?, ?)",
+                               (key, json.dumps(value), self._expires_at(ttl)))
+            return True
+
+    # Replace the value with function(current value or None), atomically across processes
+    def update(self, key, function, ttl=None):
+        with self.transaction() as connection:
+            value = function(self._read(connection, key))
+            connection.execute("INSERT OR REPLACE INTO entries (key, value, expires_at) VALUES (?, ?, ?)",
+                               (key, json.dumps(value), self._expires_at(ttl)))
+            return value
+
+    def delete(self, key):
+        self._connection().execute("DELETE FROM entries WHERE key = ?", (key, ))
+
+    # Unexpired entries whose key starts with prefix, as {key: value}
+    def items(self, prefix=''):
+        rows = self._connection().execute(
+            "SELECT key, value FROM entries WHERE key >= ? AND key < ? AND (expires_at IS NULL OR expires_at > ?)",
+            (prefix, prefix + '\uffff', time.time())).fetchall()
+        return {key: json.loads(value) for key, value in rows}
+
+    # Drop expired entries, returns how many were removed
+    def purge(self):
+        return self._connection().execute(
+            "DELETE FROM entries WHERE expires_at IS NOT NULL AND expires_at <= ?", (time.time(), )).rowcount
+
+    def close(self):
+        connection = getattr(self._local, 'connection', None)
+        if connection is not None:
+            connection.close()
+            self._local.connection = None
+
+
+# The store of the app, in the instance folder unless LOCAL_STORE_PATH says otherwise
+def get_local_store(app):
+    store = app.extensions.get('local_store')
+    if store is None:
+        path = app.config.get('LOCAL_STORE_PATH') or os.path.join(app.instance_path, 'local_store.db')
+        store = app.extensions['local_store'] = LocalStore(path)
+    return store
@@ -0,0 +1,166 @@
+import logging
+import queue
+import threading
+import time
+from contextlib import ExitStack
+from app.utils.mail_setup import mail
+
+logger = logging.getLogger(__name__)
+
+# Sends outgoing mail from background workers so requests don't wait on SMTP.
+# Every worker keeps its own SMTP connection open between messages (closed after
+# MAIL_CONNECTION_IDLE_TIMEOUT seconds without mail), sends whatever is queued in
+# batches over that connection and retries failed messages with exponential backoff.
+class MailQueue:
+    def __init__(self, app):
+        self.app = app
+        self.workers = app.config['MAIL_QUEUE_WORKERS']
+        self.batch_size = app.config['MAIL_QUEUE_BATCH_SIZE']
+        self.max_retries = app.config['MAIL_QUEUE_MAX_RETRIES']
+        self.retry_backoff = app.config['MAIL_QUEUE_RETRY_BACKOFF']
+        self.idle_timeout = app.config['MAIL_CONNECTION_IDLE_TIMEOUT']
+        self._queue = queue.Queue(maxsize=app.config['MAIL_QUEUE_MAX_SIZE'])
+        self._threads = []
+        self._start_lock = threading.Lock()
+        self._stats_lock = threading.Lock()
+        self._waiting_retry = 0
+        self.enqueued = 0
+        self.sent = 0
+        self.failed = 0
+        self.retried = 0
+        self.connections_opened = 0
+
+    # Queue a flask_mail Message and return right away. on_failure(error) is called from
+    # a worker when the message is given up on after the last retry.
+    def send(self, message, on_failure=None):
+        self._ensure_workers()
+        try:
+            self._queue.put_nowait((message, 0, on_failure))
+        except queue.Full:
+            # Don't lose the mail, send it on the request thread instead
+            logger.warning("Mail queue is full, sending synchronously")
+            mail.send(message)
+            return
+        with self._stats_lock:
+            self.enqueued += 1
+
+    # Queue depth and delivery counters
+    def stats(self):
+        with self._stats_lock:
+            depth = self._queue.qsize()
+            return {
+                'depth': depth,
+                'in_flight': max(self._queue.unfinished_tasks - depth, 0),
+                'waiting_retry': self._waiting_retry,
+                'enqueued': self.enqueued,
+                'sent': self.sent,
+                'failed': self.failed,
+                'retried': self.retried,
+                'connections_opened': self.connections_opened
+            }
+
+    # Wait until everything queued so far was sent (or given up on)
+    def flush(self, timeout=None):
+        deadline = time.monotonic() + timeout if timeout is not None else None
+        while True:
+            # unfinished_tasks only drops once a message was handled, a retry is
+            # queued again before it stops counting as waiting
+            with self._stats_lock:
+                idle = self._queue.unfinished_tasks == 0 and self._waiting_retry == 0
+            if idle:
+                return True
+            if deadline is not None and time.monotonic() >= deadline:
+                return False
+            time.sleep(0.01)
+
+    def _ensure_workers(self):
+        if self._threads:
+            return
+        with self._start_lock:
+            if not self._threads:
+                for number in range(self.workers):
+                    thread = threading.Thread(target=self._run, name=f'mail-queue-{number}', daemon=True)
+                    thread.start()
+                    self._threads.append(thread)
+
+    def _run(self):
+        with self.app.app_context():
+            connection = None
+            while True:
+                try:
+                    item = self._queue.get(timeout=self.idle_timeout)
+                except queue.Empty:
+                    connection = self._close(connection)
+                    continue
+
+                # Take whatever else is waiting, it all goes over the same connection
+                batch = [item]
+                while len(batch) < self.batch_size:
+                    try:
+                        batch.append(self._queue.get_nowait())
+                    except queue.Empty:
+                        break
+
+                for message, attempt, on_failure in batch:
+                    try:
+                        if connection is None:
+                            connection = self._open()
+                        connection[1].send(message)
+                        with self._stats_lock:
+                            self.sent += 1
+                    except Exception as e:
+                        # The connection may be broken, start over with a fresh one
+                        connection = self._close(connection)
+                        self._retry(message, attempt, on_failure, e)
+                    finally:
+                        self._queue.task_done()
+
+    def _open(self):
+        stack = ExitStack()
+        smtp = stack.enter_context(mail.connect())
+        with self._stats_lock:
+            self.connections_opened += 1
+        return stack, smtp
+
+    def _close(self, connection):
+        if connection is not None:
+            try:
+                connection[0].close()
+            except Exception:
+                pass
+        return None
+
+    def _retry(self, message, attempt, on_failure, error):
+        if attempt >= self.max_retries:
+            logger.error(f"Giving up on mail to {message.recipients} after {attempt + 1} attempts: {error}")
+            with self._stats_lock:
+                self.failed += 1
+            if on_failure is not None:
+                try:
+                    on_failure(error)
+                except Exception:
+                    logger.exception("Mail failure callback failed")
+            return
+
+        delay = self.retry_backoff * (2 ** attempt)
+        logger.warning(f"Mail to {message.recipients} failed ({error}), retrying in {delay}s")
+        with self._stats_lock:
+            self.retried += 1
+            self._waiting_retry += 1
+        timer = threading.Timer(delay, self._requeue, args=(message, attempt + 1, on_failure))
+        timer.daemon = True
+        timer.start()
+
+    def _requeue(self, message, attempt, on_failure):
+        self._queue.put((message, attempt, on_failure))
+        with self._stats_lock:
+            self._waiting_retry -= 1
+
+# Create the mail queue when MAIL_QUEUE_ENABLED is set, workers start with the first message
+def init_mail_queue(app):
+    if not app.config.get('MAIL_QUEUE_ENABLED'):
+        return None
+
+    mail_queue = MailQueue(app)
+    app.extensions['mail_queue'] = mail_queue
+    return mail_queue
@@ -0,0 +1,218 @@
+import bisect
+import hmac
+import math
+import threading
+import time
+from contextlib import contextmanager
+from flask import Response, current_app, request
+
+# Minimal Prometheus instrumentation: counters and histograms kept in process
+# memory and rendered in the text exposition format on GET /metrics. Every
+# observation is a dict lookup and an add under a lock, cheap enough for the
+# request path. Each worker process has its own numbers (scrape every worker,
+# or aggregate by instance label).
+
+# Latency buckets in seconds, from fast cache hits to slow SMTP or DB calls
+DEFAULT_BUCKETS = (0.0005, 0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0)
+
+
+def _format_value(value):
+    if value == math.inf:
+        return '+Inf'
+    return str(value) if isinstance(value, int) else repr(float(value))
+
+
+def _escape(value):
+    return str(value).replace('\\', '\\\\').replace('\n', '\\n').replace('"', '\\"')
+
+
+def _labels(names, values, extra=()):
+    pairs = [f'{name}="{_escape(value)}"' for name, value in zip(names, values)] + list(extra)
+    return '{' + ','.join(pairs) + '}' if pairs else ''
+
+
+class Counter:
+    kind = 'counter'
+
+    def __init__(self, name, documentation, labelnames=()):
+        self.name = name
+        self.documentation = documentation
+        self.labelnames = tuple(labelnames)
+        self._values = {}
+        self._lock = threading.Lock()
+
+    def inc(self, amount=1, **labels):
+        key = tuple(labels[name] for name in self.labelnames)
+        with self._lock:
+            self._values[key] = self._values.get(key, 0) + amount
+
+    def value(self, **labels):
+        return self._values.get(tuple(labels[name] for name in self.labelnames), 0)
+
+    def samples(self):
+        with self._lock:
+            values = list(self._values.items())
+        for key, value in sorted(values):
+            yield f"{self.name}{_labels(self.labelnames, key)} {_format_value(value)}"
+
+
+class Histogram:
+    kind = 'histogram'
+
+    def __init__(self, name, documentation, labelnames=(), buckets=DEFAULT_BUCKETS):
+        self.name = name
+        self.documentation = documentation
+        self.labelnames = tuple(labelnames)
+        self.buckets = tuple(sorted(buckets))
+        # Per label set: [count per bucket (the last one is +Inf), sum]
+        self._values = {}
+        self._lock = threading.Lock()
+
+    def observe(self, value, **labels):
+        key = tuple(labels[name] for name in self.labelnames)
+        position = bisect.bisect_left(self.buckets, value)
+        with self._lock:
+            entry = self._values.get(key)
+            if entry is None:
+                entry = self._values[key] = [[0] * (len(self.buckets) + 1), 0.0]
+            entry[0][position] += 1
+            entry[1] += value
+
+    # with histogram.time(stage='predict'): ... records how long the block took
+    @contextmanager
+    def time(self, **labels):
+        started = time.perf_counter()
+        try:
+            yield
+        finally:
+            self.observe(time.perf_counter() - started, **labels)
+
+    def count(self, **labels):
+        entry = self._values.get(tuple(labels[name] for name in self.labelnames))
+        return sum(entry[0]) if entry else 0
+
+    def samples(self):
+        with self._lock:
+            values = [(key, list(counts), total) for key, (counts, total) in self._values.items()]
+        for key, counts, total in sorted(values):
+            cumulative = 0
+            for bound, count in zip(self.buckets + (math.inf,), counts):
+                cumulative += count
+                le = 'le="%s"' % _format_value(bound)
+                yield f"{self.name}_bucket{_labels(self.labelnames, key, [le])} {cumulative}"
+            yield f"{self.name}_sum{_labels(self.labelnames, key)} {_format_value(total)}"
+            yield f"{self.name}_count{_labels(self.labelnames, key)} {cumulative}"
+
+
+# Values read when /metrics is scraped, e.g. cache statistics. callback() returns
+# {label values tuple: value} for the current app.
+class CallbackMetric:
+    def __init__(self, name, documentation, labelnames, callback, kind='gauge'):
+        self.name = name
+        self.documentation = documentation
+        self.labelnames = tuple(labelnames)
+        self.callback = callback
+        self.kind = kind
+
+    def samples(self):
+        for key, value in sorted(self.callback().items()):
+            yield f"{self.name}{_labels(self.labelnames, key)} {_format_value(value)}"
+
+
+class MetricsRegistry:
+    def __init__(self):
+        self._metrics = {}
+
+    def register(self, metric):
+        self._metrics[metric.name] = metric
+        return metric
+
+    def counter(self, name, documentation, labelnames=()):
+        return self.register(Counter(name, documentation, labelnames))
+
+    def histogram(self, name, documentation, labelnames=(), buckets=DEFAULT_BUCKETS):
+        return self.register(Histogram(name, documentation, labelnames, buckets))
+
+    def callback(self, name, documentation, labelnames, callback, kind='gauge'):
+        return self.register(CallbackMetric(name, documentation, labelnames, callback, kind))
+
+    def render(self):
+        lines = []
+        for metric in self._metrics.values():
+            samples = list(metric.samples())
+            if not samples:
+                continue
+            lines.append(f"# HELP {metric.name} {metric.documentation}")
+            lines.append(f"# TYPE {metric.name} {metric.kind}")
+            lines.extend(samples)
+        return "\n".join(lines) + "\n"
+
+
+# The process wide registry and the metrics the app records
+registry = MetricsRegistry()
+
+HTTP_REQUESTS = registry.counter(
+    'http_requests_total', 'HTTP requests handled, by blueprint, method and status code.', ['blueprint', 'method', 'status'])
+HTTP_REQUEST_SECONDS = registry.histogram(
+    'http_request_duration_seconds', 'Time spent handling HTTP requests, by blueprint and endpoint.', ['blueprint', 'endpoint'])
+PREDICTION_STAGE_SECONDS = registry.histogram(
+    'prediction_stage_duration_seconds', 'Time spent in each stage of a prediction: load, preprocess, predict, persist.', ['stage'])
+DB_QUERY_SECONDS = registry.histogram(
+    'db_query_duration_seconds', 'Time spent on database queries, by operation.', ['operation'])
+
+
+# Hits, misses and size of the caches attached to the current app
+def _cache_stats():
+    caches = {'principal': current_app.extensions.get('principal_cache'),
+              'payload': current_app.extensions.get('payload_cache')}
+    model_registry = current_app.extensions.get('stroke_model')
+    if model_registry is not None:
+        caches['prediction'] = model_registry.prediction_cache
+    return {name: cache.stats() for name, cache in caches.items() if cache is not None}
+
+
+registry.callback('cache_hits_total', 'Cache lookups that found an entry.', ['cache'],
+                  lambda: {(name, ): stats['hits'] for name, stats in _cache_stats().items()}, kind='counter')
+registry.callback('cache_misses_total', 'Cache lookups that found nothing.', ['cache'],
+                  lambda: {(name, ): stats['misses'] for name, stats in _cache_stats().items()}, kind='counter')
+registry.callback('cache_hit_ratio', 'Share of cache lookups that were hits since the process started.', ['cache'],
+                  lambda: {(name, ): stats['hit_rate'] for name, stats in _cache_stats().items()})
+registry.callback('cache_entries', 'Entries currently held by a cache.', ['cache'],
+                  lambda: {(name, ): stats['size'] for name, stats in _cache_stats().items()})
+
+
+# True when the request may read /metrics: from an allowed address (METRICS_ALLOWED_IPS)
+# and with the bearer token when METRICS_TOKEN is set
+def metrics_access_allowed(config):
+    allowed_ips = [address.strip() for address in config.get('METRICS_ALLOWED_IPS', '').split(',') if address.strip()]
+    if allowed_ips and request.remote_addr not in allowed_ips:
+        return False
+    token = config.get('METRICS_TOKEN')
+    if token:
+        return hmac.compare_digest(request.headers.get('Authorization', ''), f"Bearer {token}")
+    return True
+
+
+# Count and time every request, and serve the metrics on GET /metrics (METRICS_ENABLED)
+def init_metrics(app):
+    if not app.config.get('METRICS_ENABLED', False):
+        return
+
+    @app.before_request
+    def start_timer():
+        request.metrics_started = time.perf_counter()
+
+    @app.after_request
+    def record_request(response):
+        started = getattr(request, 'metrics_started', None)
+        if started is not None and request.endpoint != 'metrics':
+            blueprint = request.blueprint or 'app'
+            HTTP_REQUESTS.inc(blueprint=blueprint, method=request.method, status=str(response.status_code))
+            HTTP_REQUEST_SECONDS.observe(time.perf_counter() - started, blueprint=blueprint, endpoint=request.endpoint or 'unknown')
+        return response
+
+    @app.route('/metrics', endpoint='metrics')
+    def metrics():
+        if not metrics_access_allowed(app.config):
+            return Response("Forbidden\n", status=403, mimetype='text/plain')
+        return Response(registry.render(), mimetype='text/plain; version=0.0.4')
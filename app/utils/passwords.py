@@ -0,0 +1,70 @@
+import threading
+from functools import cached_property
+from concurrent.futures import ProcessPoolExecutor
+from flask import current_app
+from werkzeug.security import generate_password_hash, check_password_hash
+
+# Password hashing with configurable work factors. Hashing is CPU bound and holds
+# the GIL, so with PASSWORD_HASH_WORKERS > 0 it runs in a separate process pool and
+# the request thread only waits on the result (other requests keep being served).
+class PasswordHasher:
+    def __init__(self, method, salt_length, workers=0):
+        self.method = method
+        self.salt_length = salt_length
+        self.workers = workers
+        self._executor = None
+        self._executor_lock = threading.Lock()
+
+    # The method string stored in new hashes, e.g. "scrypt" becomes "scrypt:32768:8:1"
+    @cached_property
+    def stored_method(self):
+        return generate_password_hash("", self.method, self.salt_length).split("$", 1)[0]
+
+    def hash(self, password):
+        return self._call(generate_password_hash, password, self.method, self.salt_length)
+
+    def verify(self, pwhash, password):
+        return self._call(check_password_hash, pwhash, password)
+
+    # Hash many passwords at once, spread over the pool
+    def hash_many(self, passwords):
+        if not self.workers:
+            return [generate_password_hash(password, self.method, self.salt_length) for password in passwords]
+        count = len(passwords)
+        return list(self._pool().map(generate_password_hash, passwords, [self.method] * count, [self.salt_length] * count))
+
+    # True when a stored hash was made with other parameters than the configured ones
+    def needs_rehash(self, pwhash):
+        parts = pwhash.split("$")
+        return len(parts) != 3 or parts[0] != self.stored_method or len(parts[1]) != self.salt_length
+
+    def _call(self, function, *args):
+        if not self.workers:
+            return function(*args)
+        return self._pool().submit(function, *args).result()
+
+    def _pool(self):
+        if self._executor is None:
+            with self._executor_lock:
+                if self._executor is None:
+                    self._executor = ProcessPoolExecutor(max_workers=self.workers)
+        return self._executor
+
+def init_password_hasher(app):
+    app.extensions['password_hasher'] = PasswordHasher(
+        app.config['PASSWORD_HASH_METHOD'],
+        app.config['PASSWORD_SALT_LENGTH'],
+        app.config['PASSWORD_HASH_WORKERS']
+    )
+
+def hash_password(password):
+    return current_app.extensions['password_hasher'].hash(password)
+
+def hash_passwords(passwords):
+    return current_app.extensions['password_hasher'].hash_many(passwords)
+
+def verify_password(pwhash, password):
+    return current_app.extensions['password_hasher'].verify(pwhash, password)
+
+def password_needs_rehash(pwhash):
+    return current_app.extensions['password_hasher'].needs_rehash(pwhash)
@@ -0,0 +1,162 @@
+import threading
+import time
+from collections import OrderedDict
+from flask import current_app, jsonify
+from app.utils.local_store import get_local_store
+from app.utils.metrics import registry
+
+# Token bucket rate limiting for the expensive public endpoints (/login hashes a
+# password, /forgotpassword sends a mail). Every client key (IP, username, email) has
+# a bucket that holds up to `capacity` tokens and refills at `rate` tokens per second,
+# a request takes one token and is refused with 429 when the bucket is empty.
+
+RATE_LIMITED = registry.counter(
+    'rate_limited_requests_total', 'Requests refused by a rate limit, by scope and key.', ['scope', 'key'])
+COALESCED = registry.counter(
+    'coalesced_requests_total', 'Requests answered without repeating work done for an identical request.', ['scope'])
+
+PERIODS = {'second': 1, 'minute': 60, 'hour': 3600, 'day': 86400}
+
+
+# "10/minute" -> (capacity 10, refilled at 10/60 tokens per second)
+def parse_limit(value):
+    count, _, period = value.partition('/')
+    count = int(count)
+    seconds = PERIODS.get(period.strip().rstrip('s'))
+    if count <= 0 or seconds is None:
+        raise ValueError(f"Invalid rate limit {value!r}, expected e.g. '10/minute'")
+    return count, count / seconds
+
+
+# Refill the bucket for the time since it was last used and take `cost` tokens.
+# state is [tokens, updated_at] or None for a full bucket. Returns the new state and
+# 0 when the request may go ahead, otherwise the seconds until enough tokens are back.
+def take_token(state, now, capacity, rate, cost=1):
+    tokens, updated_at = state if state else (capacity, now)
+    tokens = min(capacity, tokens + max(0.0, now - updated_at) * rate)
+    if tokens >= cost:
+        return [tokens - cost, now], 0.0
+    return [tokens, now], (cost - tokens) / rate
+
+
+# Buckets in process memory, each worker process counts on its own. The least recently
+# used buckets are dropped beyond max_keys, they have had the longest to refill.
+class MemoryBackend:
+    def __init__(self, max_keys=100000):
+        self.max_keys = max_keys
+        self._buckets = OrderedDict()
+        self._markers = {}
+        self._lock = threading.Lock()
+
+    def take(self, key, capacity, rate):
+        now = time.time()
+        with self._lock:
+            state, retry_after = take_token(self._buckets.get(key), now, capacity, rate)
+            self._buckets[key] = state
+            self._buckets.move_to_end(key)
+            while len(self._buckets) > self.max_keys:
+                self._buckets.popitem(last=False)
+        return retry_after
+
+    def add(self, key, ttl):
+        now = time.time()
+        with self._lock:
+            if self._markers.get(key, 0) > now:
+                return False
+            if len(self._markers) >= self.max_keys:
+                self._markers = {marker: expires_at for marker, expires_at in self._markers.items() if expires_at > now}
+            self._markers[key] = now + ttl
+            return True
+
+    def delete(self, key):
+        with self._lock:
+            self._markers.pop(key, None)
+
+
+# Buckets in the SQLite local store, shared by every worker process of the host
+class LocalStoreBackend:
+    def __init__(self, store):
+        self.store = store
+
+    def take(self, key, capacity, rate):
+        result = {}
+
+        def refill(state):
+            state, result['retry_after'] = take_token(state, time.time(), capacity, rate)
+            return state
+
+        # An untouched bucket is full again after capacity / rate seconds, it can expire then
+        self.store.update(f"bucket:{key}", refill, ttl=capacity / rate)
+        return result['retry_after']
+
+    def add(self, key, ttl):
+        return self.store.add(f"marker:{key}", 1, ttl)
+
+    def delete(self, key):
+        self.store.delete(f"marker:{key}")
+
+
+class RateLimiter:
+    def __init__(self, backend, limits, enabled=True):
+        self.backend = backend
+        # {(scope, key name): (capacity, rate)}
+        self.limits = limits
+        self.enabled = enabled
+
+    # Take a token from the bucket of every identifier, 0 when the request may go ahead,
+    # otherwise the seconds the client should wait
+    def hit(self, scope, **identifiers):
+        if not self.enabled:
+            return 0.0
+        for name, value in identifiers.items():
+            limit = self.limits.get((scope, name))
+            if limit is None or not value:
+                continue
+            retry_after = self.backend.take(f"{scope}:{name}:{str(value).lower()}", *limit)
+            if retry_after:
+                RATE_LIMITED.inc(scope=scope, key=name)
+                return retry_after
+        return 0.0
+
+    # True for the first call with this key within ttl seconds, False for the calls it covers
+    def first_within(self, scope, key, ttl):
+        if self.backend.add(f"{scope}:{str(key).lower()}", ttl):
+            return True
+        COALESCED.inc(scope=scope)
+        return False
+
+    def forget(self, scope, key):
+        self.backend.delete(f"{scope}:{str(key).lower()}")
+
+
+# 429 response for the view when a limit is hit, None otherwise
+def rate_limit(scope, **identifiers):
+    retry_after = current_app.extensions['rate_limiter'].hit(scope, **identifiers)
+    if not retry_after:
+        return None
+    response = jsonify({"error": "Too many requests, please try again later."})
+    response.status_code = 429
+    response.headers['Retry-After'] = str(max(1, int(retry_after + 0.999)))
+    return response
+
+
+# Limits come from RATE_LIMIT_<SCOPE>_PER_<KEY> config values such as "10/minute",
+# the buckets live in memory or in the local store (RATE_LIMIT_BACKEND)
+def init_rate_limiter(app):
+    limits = {}
+    for name, value in app.config.items():
+        if name.startswith('RATE_LIMIT_') and '_PER_' in name and value:
+            scope, _, key = name[len('RATE_LIMIT_'):].partition('_PER_')
+            limits[(scope.lower(), key.lower())] = parse_limit(value)
+
+    backend_name = app.config.get('RATE_LIMIT_BACKEND', 'memory')
+    if backend_name == 'local':
+        backend = LocalStoreBackend(get_local_store(app))
+    elif backend_name == 'memory':
+        backend = MemoryBackend()
+    else:
+        raise ValueError(f"Unknown RATE_LIMIT_BACKEND {backend_name!r}, expected 'memory' or 'local'")
+
+    limiter = RateLimiter(backend, limits, enabled=app.config.get('RATE_LIMIT_ENABLED', True))
+    app.extensions['rate_limiter'] = limiter
+    return limiter
@@ -0,0 +1,102 @@
+import heapq
+import threading
+import time
+from flask import current_app
+from app.utils.local_store import get_local_store
+from app.utils.metrics import registry
+
+# Revoked JWTs, by their jti claim. token_required checks every token against an
+# in-process dict, a membership test with no database round trip. An entry is only kept
+# until the token would have expired anyway, so the dict holds at most the tokens
+# revoked within one token lifetime.
+#
+# With the "local" backend a revocation is also written to the local store, and each
+# worker process pulls the revocations of the others at most every sync_interval seconds
+# (one primary key lookup while nothing changed).
+
+REVOCATIONS = registry.counter('token_revocations_total', 'Tokens revoked before they expired, by reason.', ['reason'])
+
+_VERSION_KEY = 'revocations:version'
+_PREFIX = 'revoked:'
+
+
+class RevocationList:
+    def __init__(self, store=None, sync_interval=1.0):
+        self.store = store
+        self.sync_interval = sync_interval
+        # {jti: exp}, and a heap of (exp, jti) to evict them once the token expired
+        self._revoked = {}
+        self._expiry = []
+        self._lock = threading.Lock()
+        self._version = None
+        self._next_sync = 0.0
+
+    def __len__(self):
+        return len(self._revoked)
+
+    # Called on every authenticated request: a dict lookup, plus a sync with the other
+    # workers when sync_interval has passed
+    def is_revoked(self, jti):
+        if self.store is not None and time.monotonic() >= self._next_sync:
+            self.sync()
+        return jti in self._revoked
+
+    # Revoke the token with this jti until exp (its expiry as a unix timestamp)
+    def revoke(self, jti, exp, reason='logout'):
+        now = time.time()
+        if not jti or exp <= now:
+            return
+        self._add(jti, exp, now)
+        if self.store is not None:
+            self.store.set(_PREFIX + jti, exp, ttl=exp - now)
+            # Bumped after the entry is stored, a worker that sees the new version finds it
+            self.store.update(_VERSION_KEY, lambda version: (version or 0) + 1)
+        REVOCATIONS.inc(reason=reason)
+
+    # Pull the revocations other workers stored since the last sync
+    def sync(self):
+        self._next_sync = time.monotonic() + self.sync_interval
+        version = self.store.get(_VERSION_KEY, 0)
+        if version == self._version:
+            self._evict(time.time())
+            return
+        now = time.time()
+        for key, exp in self.store.items(_PREFIX).items():
+            self._add(key[len(_PREFIX):], exp, now)
+        self._version = version
+
+    def _add(self, jti, exp, now):
+        with self._lock:
+            if jti not in self._revoked:
+                self._revoked[jti] = exp
+                heapq.heappush(self._expiry, (exp, jti))
+            self._evict_locked(now)
+
+    def _evict(self, now):
+        if self._expiry and self._expiry[0][0] <= now:
+            with self._lock:
+                self._evict_locked(now)
+
+    def _evict_locked(self, now):
+        while self._expiry and self._expiry[0][0] <= now:
+            _, jti = heapq.heappop(self._expiry)
+            self._revoked.pop(jti, None)
+
+
+# Revoke the token a decoded JWT payload belongs to, tokens without a jti can't be revoked
+def revoke_token(data, reason='logout'):
+    if data.get('jti') and data.get('exp'):
+        current_app.extensions['token_revocations'].revoke(data['jti'], data['exp'], reason)
+
+
+# Revocations are kept per worker process or shared through the local store (TOKEN_REVOCATION_BACKEND)
+def init_token_revocations(app):
+    backend_name = app.config.get('TOKEN_REVOCATION_BACKEND', 'memory')
+    if backend_name == 'local':
+        revocations = RevocationList(get_local_store(app), app.config.get('TOKEN_REVOCATION_SYNC_INTERVAL', 1.0))
+    elif backend_name == 'memory':
+        revocations = RevocationList()
+    else:
+        raise ValueError(f"Unknown TOKEN_REVOCATION_BACKEND {backend_name!r}, expected 'memory' or 'local'")
+    app.extensions['token_revocations'] = revocations
+    return revocations
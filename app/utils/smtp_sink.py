@@ -0,0 +1,142 @@
+import argparse
+import socketserver
+import threading
+import time
+
+# A tiny local SMTP server that accepts every message and keeps it in memory.
+# Stands in for MAIL_SERVER in tests and offline development:
+#   python -m app.utils.smtp_sink --port 1025
+# then run the app with MAIL_SERVER=127.0.0.1 MAIL_PORT=1025 MAIL_USE_TLS=False
+
+
+class _SMTPHandler(socketserver.StreamRequestHandler):
+    def reply(self, line):
+        self.wfile.write(line.encode() + b"\r\n")
+
+    def readline(self):
+        return self.rfile.readline().decode("utf-8", "replace").rstrip("\r\n")
+
+    def handle(self):
+        sink = self.server.sink
+        with sink.lock:
+            sink.connections += 1
+
+        sender, recipients = None, []
+        self.reply("220 smtp-sink ready")
+        while True:
+            line = self.readline()
+            if not line:
+                return
+            command = line.split(" ", 1)[0].upper()
+
+            if command == "EHLO":
+                self.reply("250-smtp-sink")
+                self.reply("250-AUTH PLAIN LOGIN")
+                self.reply("250 8BITMIME")
+            elif command == "HELO":
+                self.reply("250 smtp-sink")
+            elif command == "AUTH":
+                # Accept any credentials
+                parts = line.split()
+                if len(parts) == 2 and parts[1].upper() == "LOGIN":
+                    self.reply("334 VXNlcm5hbWU6")
+                    self.readline()
+                    self.reply("334 UGFzc3dvcmQ6")
+                    self.readline()
+                elif len(parts) == 2:
+                    self.reply("334 ")
+                    self.readline()
+                self.reply("235 Authentication successful")
+            elif command == "MAIL":
+                sender, recipients = line.split(":", 1)[1].strip(), []
+                self.reply("250 OK")
+            elif command == "RCPT":
+                recipients.append(line.split(":", 1)[1].strip())
+                self.reply("250 OK")
+            elif command == "DATA":
+                if sink.fail_next > 0:
+                    with sink.lock:
+                        sink.fail_next -= 1
+                    self.reply("451 Temporary failure, try again later")
+                    continue
+                self.reply("354 End data with <CR><LF>.<CR><LF>")
+                lines = []
+                while True:
+                    data_line = self.rfile.readline()
+                    if data_line in (b".\r\n", b".\n", b""):
+                        break
+                    # Undo dot-stuffing
+                    lines.append(data_line[1:] if data_line.startswith(b"..") else data_line)
+                with sink.lock:
+                    sink.messages.append({"sender": sender, "recipients": recipients, "data": b"".join(lines)})
+                sender, recipients = None, []
+                self.reply("250 OK: queued")
+            elif command == "RSET":
+                sender, recipients = None, []
+                self.reply("250 OK")
+            elif command == "NOOP":
+                self.reply("250 OK")
+            elif command == "QUIT":
+                self.reply("221 Bye")
+                return
+            else:
+                self.reply("502 Command not implemented")
+
+
+class _SinkServer(socketserver.ThreadingTCPServer):
+    daemon_threads = True
+    allow_reuse_address = True
+
+
+class SMTPSink:
+    def __init__(self, host="127.0.0.1", port=0):
+        self.messages = []
+        self.connections = 0
+        self.fail_next = 0  # Reject this many DATA commands with a temporary error
+        self.lock = threading.Lock()
+        self._server = _SinkServer((host, port), _SMTPHandler)
+        self._server.sink = self
+        self._thread = None
+
+    @property
+    def host(self):
+        return self._server.server_address[0]
+
+    @property
+    def port(self):
+        return self._server.server_address[1]
+
+    def start(self):
+        self._thread = threading.Thread(target=self._server.serve_forever, name="smtp-sink", daemon=True)
+        self._thread.start()
+        return self
+
+    def stop(self):
+        self._server.shutdown()
+        self._server.server_close()
+
+    def wait_for(self, count, timeout=5):
+        deadline = time.time() + timeout
+        while len(self.messages) < count and time.time() < deadline:
+            time.sleep(0.01)
+        return len(self.messages) >= count
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Local SMTP sink that prints every message it receives")
+    parser.add_argument("--host", default="127.0.0.1")
+    parser.add_argument("--port", type=int, default=1025)
+    args = parser.parse_args()
+
+    sink = SMTPSink(args.host, args.port).start()
+    print(f"SMTP sink listening on {sink.host}:{sink.port}")
+    seen = 0
+    try:
+        while True:
+            time.sleep(0.5)
+            for message in sink.messages[seen:]:
+                print(f"--- from {message['sender']} to {', '.join(message['recipients'])}")
+                print(message["data"].decode("utf-8", "replace"))
+            seen = len(sink.messages)
+    except KeyboardInterrupt:
+        sink.stop()
@@ -0,0 +1,12 @@
+# ASGI entry point: uvicorn asgi:application --workers 4
+#
+# The Flask app stays synchronous, a2wsgi runs every request on a bounded thread pool
+# (ASGI_THREADS) next to the event loop. The event loop keeps accepting and buffering
+# connections, so slow clients and idle keep-alive connections don't tie up a thread.
+from a2wsgi import WSGIMiddleware
+from dotenv import load_dotenv
+from app import create_app
+load_dotenv()
+
+app = create_app()
+application = WSGIMiddleware(app, workers=app.config['ASGI_THREADS'])
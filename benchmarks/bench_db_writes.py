@@ -0,0 +1,88 @@
+# Concurrent MedicalRecord inserts (one commit per record, like /predict) against a
+# SQLite file with SQLite's default settings vs. the WAL + synchronous=NORMAL profile,
+# and through the write-behind buffer that commits records in groups (RECORD_WRITE_BEHIND)
+# with both durability settings.
+#
+#   python -m benchmarks.bench_db_writes [--threads 8] [--records 200]
+import argparse
+import datetime
+import os
+import tempfile
+import threading
+import time
+from app import create_app, db
+from app.config import Config
+from app.models import MedicalRecord
+from app.risk_rollups import apply_rollups
+
+PROFILES = {
+    "sqlite defaults": {"SQLITE_WAL": False, "SQLITE_SYNCHRONOUS": "FULL"},
+    "wal + normal": {"SQLITE_WAL": True, "SQLITE_SYNCHRONOUS": "NORMAL"},
+    "group, sync": {"SQLITE_WAL": True, "SQLITE_SYNCHRONOUS": "NORMAL",
+                    "RECORD_WRITE_BEHIND": True, "RECORD_WRITE_DURABILITY": "sync"},
+    "group, async": {"SQLITE_WAL": True, "SQLITE_SYNCHRONOUS": "NORMAL",
+                     "RECORD_WRITE_BEHIND": True, "RECORD_WRITE_DURABILITY": "group"},
+}
+
+
+def build_app(database_path, settings):
+    Config.SQLALCHEMY_DATABASE_URI = f"sqlite:///{database_path}"
+    Config.MODEL_LOAD_MODE = "lazy"
+    Config.RECORD_WRITE_BEHIND = False
+    for name, value in settings.items():
+        setattr(Config, name, value)
+    app = create_app()
+    with app.app_context():
+        db.create_all()
+    return app
+
+
+def insert_records(app, threads, records):
+    writer = app.extensions.get('record_writer')
+
+    def worker():
+        with app.app_context():
+            for number in range(records):
+                fields = dict(
+                    gender="Male", age=40 + number % 40, hypertension=0, ever_married="Yes", work_type="Private",
+                    Residence_type="Urban", avg_glucose_level=105.3, bmi=27.1, smoking_status="Never smoked",
+                    stroke_risk="Low", prediction="0", created_at=datetime.datetime.utcnow()
+                )
+                if writer:
+                    writer.write(fields)
+                else:
+                    db.session.add(MedicalRecord(**fields))
+                    apply_rollups([fields])
+                    db.session.commit()
+            db.session.remove()
+
+    workers = [threading.Thread(target=worker) for _ in range(threads)]
+    started = time.perf_counter()
+    for thread in workers:
+        thread.start()
+    for thread in workers:
+        thread.join()
+    if writer:
+        # Records buffered with durability "group" count once they are committed
+        writer.close()
+    return threads * records / (time.perf_counter() - started)
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Concurrent MedicalRecord insert throughput per SQLite profile")
+    parser.add_argument("--threads", type=int, default=8)
+    parser.add_argument("--records", type=int, default=200, help="records inserted by each thread")
+    args = parser.parse_args()
+
+    print(f"threads={args.threads} records/thread={args.records}")
+    for label, settings in PROFILES.items():
+        with tempfile.TemporaryDirectory() as directory:
+            app = build_app(os.path.join(directory, "bench.db"), settings)
+            throughput = insert_records(app, args.threads, args.records)
+            with app.app_context():
+                assert MedicalRecord.query.count() == args.threads * args.records
+            print(f"{label:>16}: {throughput:8.1f} inserts/s")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,86 @@
+# Cold start cost of run.py: `python -X importtime -c "import run"` per MODEL_LOAD_MODE,
+# i.e. what a new worker pays before it can serve its first request.
+#
+#   python -m benchmarks.bench_importtime [--modes eager,lazy] [--runs 5] [--top 10]
+#   python -m benchmarks.bench_importtime --modes lazy --max-ms 400   # exit 1 above 400 ms
+#
+# Reports the median cumulative import time of run.py (create_app included), whether
+# the ML stack was imported, and the modules that took the longest themselves.
+import argparse
+import json
+import os
+import statistics
+import subprocess
+import sys
+import tempfile
+from tests.stroke_fixture import write_stroke_model
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+# Packages of the ML stack that a lazy start shouldn't import
+HEAVY_MODULES = ('numpy', 'pandas', 'sklearn', 'scipy', 'joblib')
+
+
+# {module: (self µs, cumulative µs)} from the stderr of python -X importtime
+def parse_importtime(output):
+    modules = {}
+    for line in output.splitlines():
+        if not line.startswith('import time:') or 'self [us]' in line:
+            continue
+        self_us, cumulative_us, name = line[len('import time:'):].split('|')
+        modules.setdefault(name.strip(), (int(self_us), int(cumulative_us)))
+    return modules
+
+
+def import_run(mode, model_dir):
+    env = dict(os.environ, MODEL_LOAD_MODE=mode, MODEL_BASE_PATH=model_dir, DATABASE_URL="sqlite:///:memory:")
+    completed = subprocess.run([sys.executable, "-X", "importtime", "-c", "import run"], cwd=ROOT, env=env,
+                               capture_output=True, text=True, check=True)
+    return parse_importtime(completed.stderr)
+
+
+def measure(mode, runs=5, top=10, model_dir=None):
+    with tempfile.TemporaryDirectory() as directory:
+        if model_dir is None:
+            model_dir = directory
+            write_stroke_model(model_dir)
+        samples = [import_run(mode, model_dir) for _ in range(runs)]
+
+    last = samples[-1]
+    slowest = sorted(last.items(), key=lambda item: item[1][0], reverse=True)[:top]
+    return {
+        "mode": mode,
+        "run_ms": round(statistics.median(sample["run"][1] for sample in samples) / 1000, 1),
+        "heavy_modules": [name for name in HEAVY_MODULES if name in last],
+        "slowest": [{"module": name, "self_ms": round(self_us / 1000, 1), "cumulative_ms": round(cumulative_us / 1000, 1)}
+                    for name, (self_us, cumulative_us) in slowest],
+    }
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Import time of run.py per MODEL_LOAD_MODE")
+    parser.add_argument("--modes", default="eager,lazy", help="comma separated MODEL_LOAD_MODE values")
+    parser.add_argument("--runs", type=int, default=5, help="imports per mode, the median is reported")
+    parser.add_argument("--top", type=int, default=10, help="slowest modules listed per mode")
+    parser.add_argument("--max-ms", type=float, help="exit 1 when a mode takes longer than this")
+    parser.add_argument("--json", help="also write the results to this file")
+    args = parser.parse_args(argv)
+
+    results = [measure(mode, args.runs, args.top) for mode in args.modes.split(",")]
+    status = 0
+    for result in results:
+        print(f"{result['mode']:<12}{result['run_ms']:>10.1f} ms   ML stack imported: {', '.join(result['heavy_modules']) or 'no'}")
+        for module in result["slowest"]:
+            print(f"    {module['module']:<48}{module['self_ms']:>8.1f} ms self{module['cumulative_ms']:>10.1f} ms total")
+        if args.max_ms is not None and result["run_ms"] > args.max_ms:
+            print(f"{result['mode']} took {result['run_ms']} ms, more than {args.max_ms} ms", file=sys.stderr)
+            status = 1
+
+    if args.json:
+        with open(args.json, "w") as output:
+            json.dump(results, output, indent=2)
+    return status
+
+
+if __name__ == "__main__":
+    sys.exit(main())
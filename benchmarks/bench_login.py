@@ -0,0 +1,90 @@
+# Login throughput with password hashing on the request thread vs. in a process pool.
+#
+#   python -m benchmarks.bench_login [--threads 8] [--seconds 5] [--method scrypt:32768:8:1]
+#
+# Besides logins/second (total and per core) it reports the latency of a cheap
+# endpoint (GET /users?limit=1) called during the login burst, which shows how much
+# hashing on the request thread holds up everything else on the worker.
+import argparse
+import os
+import statistics
+import tempfile
+import threading
+import time
+from app import create_app, db
+from app.config import Config
+
+PASSWORD = "AnotherP@ssw0rd"
+
+
+def build_app(database_path, method, workers):
+    Config.SQLALCHEMY_DATABASE_URI = f"sqlite:///{database_path}"
+    Config.PASSWORD_HASH_METHOD = method
+    Config.PASSWORD_HASH_WORKERS = workers
+    Config.MODEL_LOAD_MODE = "lazy"
+    Config.RATE_LIMIT_ENABLED = False
+    app = create_app()
+    with app.app_context():
+        db.create_all()
+    return app
+
+
+def run(app, threads, seconds, users):
+    stop = time.perf_counter() + seconds
+    logins = []
+    probe_latencies = []
+
+    def login(number):
+        with app.test_client() as client:
+            while time.perf_counter() < stop:
+                response = client.post('/login', json={"username": f"user{number % users}", "password": PASSWORD})
+                assert response.status_code == 200
+                logins.append(1)
+
+    def probe():
+        with app.test_client() as client:
+            while time.perf_counter() < stop:
+                started = time.perf_counter()
+                client.get('/users?limit=1')
+                probe_latencies.append(time.perf_counter() - started)
+                time.sleep(0.01)
+
+    workers = [threading.Thread(target=login, args=(number,)) for number in range(threads)]
+    workers.append(threading.Thread(target=probe))
+    started = time.perf_counter()
+    for worker in workers:
+        worker.start()
+    for worker in workers:
+        worker.join()
+    elapsed = time.perf_counter() - started
+
+    return len(logins) / elapsed, statistics.median(probe_latencies) * 1000
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Login throughput with and without the password hashing process pool")
+    parser.add_argument("--threads", type=int, default=8)
+    parser.add_argument("--seconds", type=float, default=5)
+    parser.add_argument("--users", type=int, default=20)
+    parser.add_argument("--method", default=Config.PASSWORD_HASH_METHOD)
+    parser.add_argument("--workers", type=int, default=os.cpu_count())
+    args = parser.parse_args()
+    cores = os.cpu_count()
+
+    print(f"method={args.method} threads={args.threads} cores={cores}")
+    for label, workers in (("request thread", 0), (f"process pool ({args.workers})", args.workers)):
+        with tempfile.TemporaryDirectory() as directory:
+            app = build_app(os.path.join(directory, "bench.db"), args.method, workers)
+            with app.test_client() as client:
+                for number in range(args.users):
+                    client.post('/register', json={
+                        "firstName": "Bench", "lastName": "User", "phoneNumber": f"07{number:08d}",
+                        "username": f"user{number}", "email": f"user{number}@example.com", "password": PASSWORD
+                    })
+            throughput, probe_ms = run(app, args.threads, args.seconds, args.users)
+            print(f"{label:>22}: {throughput:8.1f} logins/s  {throughput / cores:8.1f} logins/s/core  "
+                  f"GET /users p50 during burst {probe_ms:7.1f} ms")
+
+
+if __name__ == "__main__":
+    main()
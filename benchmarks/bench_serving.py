@@ -0,0 +1,162 @@
+# Throughput and latency of the serving modes under concurrent clients: the
+# Werkzeug development server, gunicorn with threaded workers (gunicorn.conf.py)
+# and uvicorn running the app through the ASGI entry point (asgi.py).
+#
+#   python -m benchmarks.bench_serving [--servers dev,gunicorn,uvicorn] [--concurrency 1,8,32]
+#                                      [--scenarios predict,users_page] [--requests 400] [--workers 2]
+#
+# Every server runs as its own process against the same synthetic model and seeded
+# SQLite database. Servers that aren't installed are skipped.
+import argparse
+import http.client
+import json
+import os
+import socket
+import subprocess
+import sys
+import tempfile
+import time
+from benchmarks.suite import SCENARIOS, build_app, run_scenario
+from app.config import Config
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+
+def server_command(name, port, workers):
+    if name == "dev":
+        return [sys.executable, "-m", "flask", "--app", "run:app", "run", "--port", str(port), "--with-threads", "--no-reload"]
+    if name == "gunicorn":
+        return [sys.executable, "-m", "gunicorn", "-c", "gunicorn.conf.py", "--bind", f"127.0.0.1:{port}",
+                "--workers", str(workers), "run:app"]
+    if name == "uvicorn":
+        return [sys.executable, "-m", "uvicorn", "asgi:application", "--port", str(port), "--workers", str(workers),
+                "--log-level", "warning", "--no-access-log"]
+    raise ValueError(f"Unknown server {name}")
+
+
+def server_available(name):
+    module = {"dev": "flask", "gunicorn": "gunicorn", "uvicorn": "uvicorn"}[name]
+    try:
+        __import__(module)
+        if name == "uvicorn":
+            __import__("a2wsgi")
+    except ImportError:
+        return False
+    return True
+
+
+def free_port():
+    with socket.socket() as probe:
+        probe.bind(("127.0.0.1", 0))
+        return probe.getsockname()[1]
+
+
+# Requests over HTTP to a server running in another process
+class HTTPTransport:
+    measures_allocations = False
+
+    def __init__(self, port):
+        self.port = port
+
+    def request(self, method, path, body, headers):
+        connection = http.client.HTTPConnection("127.0.0.1", self.port, timeout=60)
+        try:
+            payload = json.dumps(body).encode() if body is not None else None
+            request_headers = dict(headers, **({"Content-Type": "application/json"} if payload is not None else {}))
+            connection.request(method, path, body=payload, headers=request_headers)
+            response = connection.getresponse()
+            response.read()
+            return response.status
+        finally:
+            connection.close()
+
+
+class Server:
+    def __init__(self, name, env, workers):
+        self.name = name
+        self.port = free_port()
+        self.process = subprocess.Popen(server_command(name, self.port, workers), cwd=ROOT, env=env,
+                                        stdout=subprocess.DEVNULL, stderr=subprocess.PIPE)
+
+    # Wait until the server answers, the model is loaded before it starts listening
+    def wait_ready(self, timeout=60):
+        deadline = time.monotonic() + timeout
+        transport = HTTPTransport(self.port)
+        while time.monotonic() < deadline:
+            if self.process.poll() is not None:
+                raise RuntimeError(f"{self.name} exited: {self.process.stderr.read().decode(errors='replace')[-2000:]}")
+            try:
+                if transport.request("GET", "/users?limit=1", None, {}) == 200:
+                    return transport
+            except OSError:
+                time.sleep(0.2)
+        raise RuntimeError(f"{self.name} didn't start within {timeout}s")
+
+    def stop(self):
+        self.process.terminate()
+        try:
+            self.process.wait(10)
+        except subprocess.TimeoutExpired:
+            self.process.kill()
+            self.process.wait()
+
+
+def run(servers, concurrency_levels, scenarios, requests, workers, predict_workers, users, records, progress=None):
+    results = {}
+    with tempfile.TemporaryDirectory() as directory:
+        _, admin_headers = build_app(directory, users, records, Config.PASSWORD_HASH_METHOD)
+        env = dict(os.environ,
+                   DATABASE_URL=Config.SQLALCHEMY_DATABASE_URI, MODEL_BASE_PATH=Config.MODEL_BASE_PATH,
+                   PREDICT_EXECUTOR_WORKERS=str(predict_workers), RATE_LIMIT_ENABLED="False", FLASK_DEBUG="0")
+        for name in servers:
+            server = Server(name, env, workers)
+            try:
+                transport = server.wait_ready()
+                for concurrency in concurrency_levels:
+                    for scenario in scenarios:
+                        factory, _ = SCENARIOS[scenario]
+                        result = run_scenario(transport, factory, requests, concurrency, admin_headers, alloc_samples=0)
+                        key = f"{name}:{scenario}:c{concurrency}"
+                        results[key] = result
+                        if progress:
+                            progress(key, result)
+            finally:
+                server.stop()
+    return results
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Compare the serving modes under concurrent load")
+    parser.add_argument("--servers", default="dev,gunicorn,uvicorn")
+    parser.add_argument("--concurrency", default="1,8,32", help="comma separated client thread counts")
+    parser.add_argument("--scenarios", default="predict,users_page,records_stats")
+    parser.add_argument("--requests", type=int, default=400, help="requests per scenario and concurrency level")
+    parser.add_argument("--workers", type=int, default=2, help="worker processes of gunicorn and uvicorn")
+    parser.add_argument("--predict-workers", type=int, default=0, help="PREDICT_EXECUTOR_WORKERS of the servers")
+    parser.add_argument("--users", type=int, default=1000)
+    parser.add_argument("--records", type=int, default=5000)
+    args = parser.parse_args(argv)
+
+    servers = []
+    for name in args.servers.split(","):
+        if server_available(name):
+            servers.append(name)
+        else:
+            print(f"Skipping {name}, it isn't installed", file=sys.stderr)
+    scenarios = args.scenarios.split(",")
+    unknown = [name for name in scenarios if name not in SCENARIOS]
+    if unknown:
+        parser.error(f"unknown scenarios: {', '.join(unknown)}")
+
+    print(f"{'server:scenario:concurrency':<36}{'p50 ms':>10}{'p99 ms':>10}{'req/s':>10}")
+
+    def progress(key, result):
+        print(f"{key:<36}{result['p50_ms']:>10.2f}{result['p99_ms']:>10.2f}{result['rps']:>10.1f}", flush=True)
+
+    run(servers, [int(level) for level in args.concurrency.split(",")], scenarios, args.requests, args.workers,
+        args.predict_workers, args.users, args.records, progress=progress)
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
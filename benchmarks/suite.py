@@ -0,0 +1,369 @@
+# Offline benchmark suite for the HTTP API: latency (p50/p99), throughput and
+# allocations per request for the main endpoints, measured through the Flask test
+# client and through a real in-process WSGI server, against a synthetic stroke
+# model and a seeded SQLite database.
+#
+#   python -m benchmarks.suite                           # run and print the report
+#   python -m benchmarks.suite --save-baseline           # also store the numbers in benchmarks/baselines.json
+#   python -m benchmarks.suite --compare                 # fail (exit 1) when a run regressed beyond --threshold
+#   python -m benchmarks.suite --scenarios predict,login --transports client --requests 500
+#
+# Baselines are machine specific, record them on the machine that runs the comparison.
+import argparse
+import datetime
+import http.client
+import itertools
+import json
+import os
+import platform
+import statistics
+import sys
+import tempfile
+import threading
+import time
+import tracemalloc
+import jwt
+from sqlalchemy import insert
+from werkzeug.serving import WSGIRequestHandler, make_server
+from app import create_app, db
+from app.config import Config
+from app.models import MedicalRecord, User
+from app.routes.auth_routes import SECRET_KEY
+from app.utils.passwords import PasswordHasher
+from tests.stroke_fixture import SAMPLE_PATIENT, write_stroke_model
+
+DEFAULT_BASELINE = os.path.join(os.path.dirname(os.path.abspath(__file__)), "baselines.json")
+PASSWORD = "AnotherP@ssw0rd"
+
+# Metrics compared against the baseline and the direction that counts as worse.
+# p99 is reported but not compared, it is too noisy on shared machines.
+COMPARED_METRICS = {"p50_ms": "higher", "rps": "lower", "alloc_kib": "higher"}
+
+
+# A request of a scenario: (method, path, json body or None, needs the admin token)
+def _predict(number):
+    # A different age every time, so the prediction cache doesn't answer
+    return "POST", "/predict", dict(SAMPLE_PATIENT, age=1 + number % 90, bmi=20 + number % 997 / 50), False
+
+
+def _predict_cached(number):
+    return "POST", "/predict", SAMPLE_PATIENT, False
+
+
+def _predict_batch(number):
+    return "POST", "/predict/batch", [dict(SAMPLE_PATIENT, age=1 + (number + i) % 90) for i in range(100)], False
+
+
+def _login(number):
+    return "POST", "/login", {"username": f"user{number % 50}", "password": PASSWORD}, False
+
+
+_registrations = itertools.count()
+
+
+def _register(number):
+    # Every registration needs a new username, email and phone number, across transports too
+    unique = next(_registrations)
+    return "POST", "/register", {
+        "firstName": "Bench", "lastName": "User", "phoneNumber": f"08{unique:08d}",
+        "username": f"new{unique}", "email": f"new{unique}@example.com", "password": PASSWORD
+    }, False
+
+
+def _users_page(number):
+    return "GET", f"/users?limit=50&after_id={number % 900}", None, False
+
+
+def _users_all(number):
+    return "GET", "/users", None, False
+
+
+def _records_stats(number):
+    return "GET", "/records/stats?group_by=age_band", None, True
+
+
+# name: (request factory, share of --requests it runs, hashing makes some scenarios much slower)
+SCENARIOS = {
+    "predict": (_predict, 1.0),
+    "predict_cached": (_predict_cached, 1.0),
+    "predict_batch": (_predict_batch, 0.1),
+    "login": (_login, 0.1),
+    "register": (_register, 0.1),
+    "users_page": (_users_page, 1.0),
+    "users_all": (_users_all, 0.2),
+    "records_stats": (_records_stats, 0.5),
+}
+
+
+def build_app(directory, users, records, hash_method):
+    model_dir = os.path.join(directory, "model")
+    write_stroke_model(model_dir)
+    Config.MODEL_BASE_PATH = model_dir
+    Config.SQLALCHEMY_DATABASE_URI = f"sqlite:///{os.path.join(directory, 'bench.db')}"
+    Config.PASSWORD_HASH_METHOD = hash_method
+    Config.MODEL_LOAD_MODE = "eager"
+    # The scenarios log in far more often than the limits allow a single client
+    Config.RATE_LIMIT_ENABLED = False
+    app = create_app()
+
+    with app.app_context():
+        db.create_all()
+        hasher = PasswordHasher(hash_method, Config.PASSWORD_SALT_LENGTH)
+        # Only the first users can log in, hashing every seeded user would dominate the setup
+        hashes = hasher.hash_many([PASSWORD] * min(users, 50))
+        db.session.execute(insert(User), [{
+            "first_name": "Seed", "last_name": "User", "username": f"user{number}", "email": f"user{number}@example.com",
+            "phone_number": f"07{number:08d}", "password": hashes[number] if number < len(hashes) else hashes[0],
+            "role": "admin" if number == 0 else "user"
+        } for number in range(users)])
+        now = datetime.datetime.utcnow()
+        db.session.execute(insert(MedicalRecord), [dict(
+            SAMPLE_PATIENT, age=1 + number % 90, stroke_risk="High" if number % 7 == 0 else "Low",
+            prediction="1" if number % 7 == 0 else "0", created_at=now - datetime.timedelta(hours=number % 720)
+        ) for number in range(records)])
+        db.session.commit()
+        admin_id = db.session.execute(db.select(User.id).where(User.username == "user0")).scalar()
+
+    token = jwt.encode({
+        "user_id": admin_id, "username": "user0", "role": "admin",
+        "exp": datetime.datetime.utcnow() + datetime.timedelta(hours=6)
+    }, SECRET_KEY, algorithm="HS256")
+    return app, {"Authorization": f"Bearer {token}"}
+
+
+# Requests through the Flask test client, no sockets involved
+class ClientTransport:
+    name = "client"
+    measures_allocations = True
+
+    def __init__(self, app):
+        self.app = app
+        self._local = threading.local()
+
+    def request(self, method, path, body, headers):
+        client = getattr(self._local, "client", None)
+        if client is None:
+            client = self._local.client = self.app.test_client()
+        response = client.open(path, method=method, json=body, headers=headers)
+        response.get_data()
+        return response.status_code
+
+    def close(self):
+        pass
+
+
+class _QuietHandler(WSGIRequestHandler):
+    def log_request(self, *args, **kwargs):
+        pass
+
+
+# Requests over HTTP to a threaded WSGI server running in this process
+class WSGITransport:
+    name = "wsgi"
+    # Werkzeug's server drains every connection with a 10 MB read buffer, which would
+    # swamp the app's own allocations, those are measured through the test client
+    measures_allocations = False
+
+    def __init__(self, app):
+        self.server = make_server("127.0.0.1", 0, app, threaded=True, request_handler=_QuietHandler)
+        self.thread = threading.Thread(target=self.server.serve_forever, name="bench-wsgi", daemon=True)
+        self.thread.start()
+
+    def request(self, method, path, body, headers):
+        connection = http.client.HTTPConnection(self.server.host, self.server.port, timeout=60)
+        try:
+            payload = json.dumps(body).encode() if body is not None else None
+            request_headers = dict(headers, **({"Content-Type": "application/json"} if payload is not None else {}))
+            connection.request(method, path, body=payload, headers=request_headers)
+            response = connection.getresponse()
+            response.read()
+            return response.status
+        finally:
+            connection.close()
+
+    def close(self):
+        self.server.shutdown()
+        self.server.server_close()
+
+
+TRANSPORTS = {"client": ClientTransport, "wsgi": WSGITransport}
+
+
+def percentile(values, fraction):
+    ordered = sorted(values)
+    return ordered[min(len(ordered) - 1, int(round(fraction * (len(ordered) - 1))))]
+
+
+# Run one scenario: warm up, time `count` requests spread over `concurrency` threads,
+# then measure the peak memory allocated while handling a few more requests
+def run_scenario(transport, factory, count, concurrency, admin_headers, warmup=5, alloc_samples=20):
+    def send(number):
+        method, path, body, needs_admin = factory(number)
+        status = transport.request(method, path, body, admin_headers if needs_admin else {})
+        if status >= 400:
+            raise RuntimeError(f"{method} {path} answered {status}")
+
+    for number in range(warmup):
+        send(number)
+
+    latencies = []
+    errors = []
+    lock = threading.Lock()
+    counter = iter(range(warmup, warmup + count))
+
+    def worker():
+        while True:
+            with lock:
+                number = next(counter, None)
+            if number is None:
+                return
+            started = time.perf_counter()
+            try:
+                send(number)
+            except Exception as e:
+                errors.append(str(e))
+                continue
+            latencies.append(time.perf_counter() - started)
+
+    threads = [threading.Thread(target=worker) for _ in range(concurrency)]
+    started = time.perf_counter()
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+    elapsed = time.perf_counter() - started
+    if errors:
+        raise RuntimeError(f"{len(errors)} requests failed, first error: {errors[0]}")
+
+    # Allocations are measured separately, tracing slows everything down
+    peaks = []
+    tracemalloc.start()
+    try:
+        for number in range(alloc_samples if transport.measures_allocations else 0):
+            # Peak of the memory traced while the request is handled, above what was live before it
+            tracemalloc.reset_peak()
+            baseline = tracemalloc.get_traced_memory()[0]
+            send(warmup + count + number)
+            peaks.append(tracemalloc.get_traced_memory()[1] - baseline)
+    finally:
+        tracemalloc.stop()
+
+    return {
+        "requests": len(latencies),
+        "p50_ms": round(percentile(latencies, 0.50) * 1000, 3),
+        "p99_ms": round(percentile(latencies, 0.99) * 1000, 3),
+        "mean_ms": round(statistics.fmean(latencies) * 1000, 3),
+        "rps": round(len(latencies) / elapsed, 1),
+        "alloc_kib": round(statistics.fmean(peaks) / 1024, 1) if peaks else None,
+    }
+
+
+def run_suite(scenarios=None, transports=("client", "wsgi"), requests=200, concurrency=4, users=1000, records=5000,
+              hash_method=None, alloc_samples=20, progress=None):
+    results = {}
+    with tempfile.TemporaryDirectory() as directory:
+        app, admin_headers = build_app(directory, users, records, hash_method or Config.PASSWORD_HASH_METHOD)
+        for transport_name in transports:
+            transport = TRANSPORTS[transport_name](app)
+            try:
+                for name in scenarios or SCENARIOS:
+                    factory, share = SCENARIOS[name]
+                    count = max(10, int(requests * share))
+                    result = run_scenario(transport, factory, count, concurrency, admin_headers, alloc_samples=alloc_samples)
+                    results[f"{transport_name}:{name}"] = result
+                    if progress:
+                        progress(f"{transport_name}:{name}", result)
+            finally:
+                transport.close()
+    return results
+
+
+# Scenarios that got worse than the baseline by more than threshold (0.25 = 25%)
+def compare(results, baseline, threshold):
+    regressions = []
+    for key, result in results.items():
+        reference = baseline.get(key)
+        if not reference:
+            continue
+        for metric, worse in COMPARED_METRICS.items():
+            old, new = reference.get(metric), result.get(metric)
+            if not old or new is None:
+                continue
+            change = (new - old) / old
+            if (worse == "higher" and change > threshold) or (worse == "lower" and -change > threshold):
+                regressions.append({"scenario": key, "metric": metric, "baseline": old, "current": new, "change": round(change, 3)})
+    return regressions
+
+
+def load_baseline(path):
+    with open(path) as baseline:
+        return json.load(baseline)["results"]
+
+
+def save_baseline(path, results, settings):
+    with open(path, "w") as baseline:
+        json.dump({
+            "created_at": datetime.datetime.utcnow().isoformat(timespec="seconds"),
+            "python": platform.python_version(),
+            "machine": platform.machine(),
+            "cpus": os.cpu_count(),
+            "settings": settings,
+            "results": results,
+        }, baseline, indent=2, sort_keys=True)
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Latency, throughput and allocation benchmarks for the HTTP API")
+    parser.add_argument("--scenarios", help=f"comma separated, default all: {', '.join(SCENARIOS)}")
+    parser.add_argument("--transports", default="client,wsgi", help="client (Flask test client), wsgi (HTTP server) or both")
+    parser.add_argument("--requests", type=int, default=200, help="requests per scenario (slow scenarios run a share of it)")
+    parser.add_argument("--concurrency", type=int, default=4, help="client threads")
+    parser.add_argument("--users", type=int, default=1000, help="users seeded into the database")
+    parser.add_argument("--records", type=int, default=5000, help="medical records seeded into the database")
+    parser.add_argument("--hash-method", default=Config.PASSWORD_HASH_METHOD)
+    parser.add_argument("--baseline", default=DEFAULT_BASELINE)
+    parser.add_argument("--save-baseline", action="store_true", help="store this run as the baseline")
+    parser.add_argument("--compare", action="store_true", help="exit 1 when a scenario regressed beyond --threshold")
+    parser.add_argument("--threshold", type=float, default=0.25, help="allowed relative regression (0.25 = 25%%)")
+    parser.add_argument("--json", help="also write the results to this file")
+    args = parser.parse_args(argv)
+
+    scenarios = args.scenarios.split(",") if args.scenarios else list(SCENARIOS)
+    unknown = [name for name in scenarios if name not in SCENARIOS]
+    if unknown:
+        parser.error(f"unknown scenarios: {', '.join(unknown)}")
+    transports = args.transports.split(",")
+
+    print(f"{'scenario':<24}{'p50 ms':>10}{'p99 ms':>10}{'req/s':>10}{'KiB/req':>10}")
+
+    def progress(key, result):
+        alloc = "-" if result['alloc_kib'] is None else f"{result['alloc_kib']:.1f}"
+        print(f"{key:<24}{result['p50_ms']:>10.2f}{result['p99_ms']:>10.2f}{result['rps']:>10.1f}{alloc:>10}", flush=True)
+
+    settings = {name: getattr(args, name) for name in ("requests", "concurrency", "users", "records", "hash_method")}
+    results = run_suite(scenarios, transports, args.requests, args.concurrency, args.users, args.records,
+                        args.hash_method, progress=progress)
+
+    if args.json:
+        with open(args.json, "w") as output:
+            json.dump(results, output, indent=2, sort_keys=True)
+
+    status = 0
+    if args.compare:
+        if not os.path.exists(args.baseline):
+            print(f"No baseline at {args.baseline}, run with --save-baseline first", file=sys.stderr)
+            return 2
+        regressions = compare(results, load_baseline(args.baseline), args.threshold)
+        for regression in regressions:
+            print(f"REGRESSION {regression['scenario']} {regression['metric']}: "
+                  f"{regression['baseline']} -> {regression['current']} ({regression['change']:+.0%})", file=sys.stderr)
+        status = 1 if regressions else 0
+
+    if args.save_baseline:
+        save_baseline(args.baseline, results, settings)
+        print(f"Baseline saved to {args.baseline}")
+    return status
+
+
+if __name__ == "__main__":
+    sys.exit(main())
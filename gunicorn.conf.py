@@ -0,0 +1,31 @@
+# gunicorn -c gunicorn.conf.py run:app
+#
+# Threaded workers (gthread): most requests wait on the database or SMTP, so a few
+# processes with many threads serve them with far less memory than one process per
+# request. Every setting can be overridden from the environment.
+import os
+
+bind = os.getenv("GUNICORN_BIND", f"0.0.0.0:{os.getenv('PORT', 5000)}")
+workers = int(os.getenv("WEB_CONCURRENCY", (os.cpu_count() or 1) + 1))
+worker_class = "gthread"
+threads = int(os.getenv("GUNICORN_THREADS", 8))
+timeout = int(os.getenv("GUNICORN_TIMEOUT", 30))
+keepalive = int(os.getenv("GUNICORN_KEEPALIVE", 5))
+
+# Load the app (and the stroke model) once in the master, workers share the pages after fork.
+# Use MODEL_LOAD_MODE=eager with it, a background warm-up thread doesn't survive the fork.
+preload_app = os.getenv("GUNICORN_PRELOAD", "True").lower() in ["true", "1", "t"]
+
+# Restart workers now and then, spread out so they don't all restart at once
+max_requests = int(os.getenv("GUNICORN_MAX_REQUESTS", 0))
+max_requests_jitter = max_requests // 10
+
+
+# Connections the master may have opened while loading the app must not be shared
+# with the workers, each worker opens its own
+def post_fork(server, worker):
+    if preload_app:
+        from run import app
+        from app.utils import db
+        with app.app_context():
+            db.engine.dispose(close=False)
@@ -0,0 +1,48 @@
+import pytest
+from app import create_app, db
+from app.config import Config
+from tests.stroke_fixture import write_stroke_model
+
+
+@pytest.fixture
+def model_dir(tmp_path):
+    """Fixture that writes a synthetic stroke model to a temporary directory."""
+    write_stroke_model(str(tmp_path))
+    return str(tmp_path)
+
+
+@pytest.fixture
+def app(model_dir, monkeypatch):
+    """Fixture to set up the Flask app with the synthetic model and an in-memory database."""
+    monkeypatch.setattr(Config, 'MODEL_BASE_PATH', model_dir)
+    monkeypatch.setattr(Config, 'SQLALCHEMY_DATABASE_URI', 'sqlite:///:memory:')
+    app = create_app()
+    app.config['TESTING'] = True
+
+    with app.app_context():
+        db.create_all()
+        yield app
+        db.session.remove()
+        db.drop_all()
+
+
+@pytest.fixture
+def admin_headers(app):
+    """Fixture that stores an admin user and returns an Authorization header for it."""
+    import datetime
+    import jwt
+    from app.models import User
+    from app.routes.auth_routes import SECRET_KEY
+
+    admin = User(first_name="Ada", last_name="Admin", username="admin", email="admin@example.com",
+                 phone_number="0700000000", password="hashedpassword", role="admin")
+    db.session.add(admin)
+    db.session.commit()
+
+    token = jwt.encode({
+        'user_id': admin.id,
+        'username': admin.username,
+        'role': admin.role,
+        'exp': datetime.datetime.utcnow() + datetime.timedelta(hours=1)
+    }, SECRET_KEY, algorithm="HS256")
+    return {"Authorization": f"Bearer {token}"}
@@ -0,0 +1,62 @@
+import os
+import shutil
+import joblib
+import numpy as np
+import pandas as pd
+from sklearn.ensemble import RandomForestClassifier
+
+STROKE_MODELS_DIR = os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), 'app', 'StrokeModels')
+
+FEATURES = [
+    'gender', 'age', 'hypertension', 'heart_disease',
+    'ever_married', 'work_type', 'Residence_type',
+    'avg_glucose_level', 'bmi', 'smoking_status'
+]
+
+# A valid /predict payload
+SAMPLE_PATIENT = {
+    "gender": "Male",
+    "age": 67,
+    "hypertension": 1,
+    "heart_disease": 1,
+    "ever_married": "Yes",
+    "work_type": "Private",
+    "Residence_type": "Urban",
+    "avg_glucose_level": 228.69,
+    "bmi": 36.6,
+    "smoking_status": "Formerly smoked"
+}
+
+
+# Random but reproducible patients, already label encoded
+def synthetic_features(n_rows, seed=0):
+    rng = np.random.default_rng(seed)
+    return pd.DataFrame({
+        'gender': rng.integers(0, 3, n_rows),
+        'age': rng.integers(1, 90, n_rows),
+        'hypertension': rng.integers(0, 2, n_rows),
+        'heart_disease': rng.integers(0, 2, n_rows),
+        'ever_married': rng.integers(0, 2, n_rows),
+        'work_type': rng.integers(0, 5, n_rows),
+        'Residence_type': rng.integers(0, 2, n_rows),
+        'avg_glucose_level': rng.uniform(55, 270, n_rows).round(2),
+        'bmi': rng.uniform(12, 60, n_rows).round(1),
+        'smoking_status': rng.integers(0, 4, n_rows),
+    })[FEATURES]
+
+
+# Train a small stand-in for stroke_prediction_model.pkl and write it, together
+# with the real category maps, to base_dir
+def write_stroke_model(base_dir, seed=0, n_estimators=8):
+    os.makedirs(base_dir, exist_ok=True)
+    for name in os.listdir(STROKE_MODELS_DIR):
+        if name.endswith('_map.pkl'):
+            shutil.copy(os.path.join(STROKE_MODELS_DIR, name), base_dir)
+
+    X = synthetic_features(500, seed)
+    y = ((X['age'] > 55) & (X['hypertension'] + X['heart_disease'] > 0)) | (X['avg_glucose_level'] > 220)
+    model = RandomForestClassifier(n_estimators=n_estimators, max_depth=6, random_state=seed)
+    model.fit(X, y.astype(int))
+
+    joblib.dump(model, os.path.join(base_dir, 'stroke_prediction_model.pkl'))
+    return model
@@ -0,0 +1,82 @@
+import pytest
+from sqlalchemy import event
+from app.utils import db
+from app.models import User
+
+
+@pytest.fixture
+def queries(app):
+    """Fixture that records the SQL statements sent to the database."""
+    statements = []
+
+    def record(conn, cursor, statement, parameters, context, executemany):
+        statements.append(statement)
+
+    event.listen(db.engine, "before_cursor_execute", record)
+    yield statements
+    event.remove(db.engine, "before_cursor_execute", record)
+
+
+def login(client, username="janesmith"):
+    """Register and log in a user, returning the Authorization header."""
+    client.post('/register', json={
+        "firstName": "Jane",
+        "lastName": "Smith",
+        "phoneNumber": "9876543210",
+        "username": username,
+        "email": f"{username}@example.com",
+        "password": "AnotherP@ssw0rd"
+    })
+    response = client.post('/login', json={"username": username, "password": "AnotherP@ssw0rd"})
+    token = response.headers['Set-Cookie'].split('token=')[1].split(';')[0]
+    return {"Authorization": f"Bearer {token}"}
+
+
+def user_queries(statements):
+    return [statement for statement in statements if 'FROM users' in statement]
+
+
+def test_principal_cached_between_requests(client, queries):
+    """Only the first protected request looks the user up in the database."""
+    headers = login(client)
+    queries.clear()
+
+    for _ in range(3):
+        assert client.get('/home', headers=headers).status_code == 200
+    assert len(user_queries(queries)) == 1
+
+
+def test_role_change_invalidates_cache(client):
+    """Updating the user's role applies to the very next request."""
+    headers = login(client)
+    assert client.get('/home', headers=headers).status_code == 200
+
+    user_id = User.query.filter_by(username="janesmith").first().id
+    client.put(f'/users/{user_id}', json={'role': 'admin'})
+    assert client.get('/home', headers=headers).status_code == 403
+    assert client.get('/dashboard', headers=headers).status_code == 200
+
+
+def test_deleted_user_rejected(client):
+    """Deleting the user rejects their token right away."""
+    headers = login(client)
+    assert client.get('/home', headers=headers).status_code == 200
+
+    user_id = User.query.filter_by(username="janesmith").first().id
+    client.delete(f'/users/{user_id}')
+    assert client.get('/home', headers=headers).status_code == 404
+
+
+def test_trusted_role_claim_skips_database(app, client, queries):
+    """With AUTH_TRUST_TOKEN_ROLE the role claim of fresh tokens is used as is."""
+    app.config['AUTH_TRUST_TOKEN_ROLE'] = True
+    headers = login(client)
+    queries.clear()
+
+    assert client.get('/home', headers=headers).status_code == 200
+    assert user_queries(queries) == []
+
+    # Once the claim is older than AUTH_ROLE_CLAIM_MAX_AGE the database decides again
+    app.config['AUTH_ROLE_CLAIM_MAX_AGE'] = -1
+    assert client.get('/home', headers=headers).status_code == 200
+    assert len(user_queries(queries)) == 1
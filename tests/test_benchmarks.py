@@ -0,0 +1,37 @@
+import pytest
+from app.config import Config
+from benchmarks.suite import compare, run_suite
+
+
+@pytest.fixture
+def restore_config(monkeypatch):
+    """The suite configures the app through Config, put everything back afterwards."""
+    for name in ('MODEL_BASE_PATH', 'SQLALCHEMY_DATABASE_URI', 'PASSWORD_HASH_METHOD', 'MODEL_LOAD_MODE', 'RATE_LIMIT_ENABLED'):
+        monkeypatch.setattr(Config, name, getattr(Config, name))
+
+
+def test_suite_reports_every_scenario(restore_config):
+    """A short run measures latency, throughput and allocations over both transports."""
+    results = run_suite(['predict', 'users_page', 'records_stats'], transports=('client', 'wsgi'), requests=10,
+                        concurrency=2, users=20, records=50, hash_method='pbkdf2:sha256:1000', alloc_samples=2)
+    assert set(results) == {f'{transport}:{scenario}' for transport in ('client', 'wsgi')
+                            for scenario in ('predict', 'users_page', 'records_stats')}
+    for key, result in results.items():
+        assert result['requests'] == 10
+        assert 0 < result['p50_ms'] <= result['p99_ms']
+        assert result['rps'] > 0
+    assert results['client:predict']['alloc_kib'] > 0
+    assert results['wsgi:predict']['alloc_kib'] is None
+
+
+def test_compare_flags_regressions_beyond_threshold():
+    """Slower, lower throughput or more allocating scenarios fail, small changes don't."""
+    baseline = {'client:predict': {'p50_ms': 10.0, 'rps': 100.0, 'alloc_kib': 50.0},
+                'client:login': {'p50_ms': 20.0, 'rps': 50.0, 'alloc_kib': 40.0}}
+    results = {'client:predict': {'p50_ms': 11.0, 'rps': 60.0, 'alloc_kib': 50.0},
+               'client:login': {'p50_ms': 30.0, 'rps': 52.0, 'alloc_kib': None},
+               'client:users_page': {'p50_ms': 5.0, 'rps': 200.0, 'alloc_kib': 10.0}}
+    regressions = compare(results, baseline, threshold=0.25)
+    assert [(regression['scenario'], regression['metric']) for regression in regressions] == [
+        ('client:predict', 'rps'), ('client:login', 'p50_ms')
+    ]
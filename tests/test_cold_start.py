@@ -0,0 +1,94 @@
+from sqlalchemy import inspect, text
+from app import create_app, db
+from app.models import MedicalRecord
+from app.config import Config
+from benchmarks.bench_importtime import measure
+from tests.stroke_fixture import SAMPLE_PATIENT
+
+
+def test_lazy_start_skips_ml_stack(model_dir):
+    """With MODEL_LOAD_MODE=lazy importing run.py doesn't import NumPy, pandas, scikit-learn or joblib."""
+    result = measure('lazy', runs=1, top=3, model_dir=model_dir)
+    assert result['heavy_modules'] == []
+    assert result['run_ms'] > 0 and len(result['slowest']) == 3
+
+
+def test_first_prediction_warms_lazy_model(model_dir, monkeypatch):
+    """A lazy app is ready right away and the first prediction loads the model."""
+    monkeypatch.setattr(Config, 'MODEL_BASE_PATH', model_dir)
+    monkeypatch.setattr(Config, 'SQLALCHEMY_DATABASE_URI', 'sqlite:///:memory:')
+    monkeypatch.setattr(Config, 'MODEL_LOAD_MODE', 'lazy')
+    app = create_app()
+    assert 'stroke_model' not in app.extensions
+
+    with app.app_context():
+        db.create_all()
+        client = app.test_client()
+        response = client.get('/ready')
+        assert response.status_code == 200
+        assert response.json['model'] == 'cold'
+
+        assert client.post('/predict', json=SAMPLE_PATIENT).status_code == 200
+        response = client.get('/ready')
+        assert response.json['model'] == 'warm' and response.json['model_version']
+
+
+def test_ready_waits_for_model(app, client, tmp_path, monkeypatch):
+    """An eagerly loaded model is reported warm, one that failed to load keeps /ready at 503."""
+    response = client.get('/ready')
+    assert response.status_code == 200
+    assert response.json['model'] == 'warm' and response.json['ready']
+
+    monkeypatch.setattr(Config, 'MODEL_BASE_PATH', str(tmp_path / 'missing'))
+    broken = create_app()
+    response = broken.test_client().get('/ready')
+    assert response.status_code == 503
+    assert response.json['model'] == 'failed' and 'error' in response.json
+
+
+def test_init_db_command(tmp_path, monkeypatch):
+    """create_app leaves the schema alone, flask init-db creates the tables."""
+    monkeypatch.setattr(Config, 'SQLALCHEMY_DATABASE_URI', f"sqlite:///{tmp_path / 'app.db'}")
+    monkeypatch.setattr(Config, 'MODEL_LOAD_MODE', 'lazy')
+    app = create_app()
+
+    with app.app_context():
+        assert inspect(db.engine).get_table_names() == []
+        result = app.test_cli_runner().invoke(args=['init-db'])
+        assert result.exit_code == 0, result.output
+        assert {'users', 'medical_records', 'risk_rollups'} <= set(inspect(db.engine).get_table_names())
+
+
+def test_init_db_upgrades_existing_tables(model_dir, tmp_path, monkeypatch):
+    """flask init-db adds the columns and indexes an older medical_records table lacks."""
+    monkeypatch.setattr(Config, 'MODEL_BASE_PATH', model_dir)
+    monkeypatch.setattr(Config, 'SQLALCHEMY_DATABASE_URI', f"sqlite:///{tmp_path / 'app.db'}")
+    monkeypatch.setattr(Config, 'MODEL_LOAD_MODE', 'lazy')
+    app = create_app()
+
+    with app.app_context():
+        with db.engine.begin() as connection:
+            connection.execute(text(
+                "CREATE TABLE medical_records (id INTEGER PRIMARY KEY, gender VARCHAR(20), age INTEGER, "
+                "hypertension INTEGER, ever_married VARCHAR(20), work_type VARCHAR(50), "
+                "Residence_type VARCHAR(50), avg_glucose_level FLOAT, bmi FLOAT, smoking_status VARCHAR(50), "
+                "stroke_risk VARCHAR(50), prediction VARCHAR(50))"))
+            connection.execute(text("INSERT INTO medical_records (gender, age, stroke_risk) VALUES ('Male', 67, 'High')"))
+
+        result = app.test_cli_runner().invoke(args=['init-db'])
+        assert result.exit_code == 0, result.output
+        assert 'Added column medical_records.created_at.' in result.output
+        assert 'Added column medical_records.heart_disease.' in result.output
+
+        columns = {column['name']: column for column in inspect(db.engine).get_columns('medical_records')}
+        assert {'created_at', 'user_id', 'heart_disease'} <= set(columns) and not columns['created_at']['nullable']
+        indexes = {index['name'] for index in inspect(db.engine).get_indexes('medical_records')}
+        assert {index.name for index in MedicalRecord.__table__.indexes} <= indexes
+        assert db.session.execute(text("SELECT COUNT(*) FROM medical_records WHERE created_at IS NULL")).scalar() == 0
+
+        assert app.test_client().post('/predict', json=SAMPLE_PATIENT).status_code == 200
+        assert db.session.query(MedicalRecord).count() == 2
+
+        # Nothing left to add the second time
+        result = app.test_cli_runner().invoke(args=['init-db'])
+        assert result.exit_code == 0 and 'Added' not in result.output
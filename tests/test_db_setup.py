@@ -0,0 +1,29 @@
+from sqlalchemy import text
+from app import create_app, db
+from app.config import Config
+
+
+def test_sqlite_profile_applied(tmp_path, monkeypatch):
+    """File based SQLite connections use WAL, synchronous=NORMAL and a busy timeout."""
+    monkeypatch.setattr(Config, 'SQLALCHEMY_DATABASE_URI', f"sqlite:///{tmp_path / 'app.db'}")
+    monkeypatch.setattr(Config, 'MODEL_LOAD_MODE', 'lazy')
+    app = create_app()
+
+    with app.app_context():
+        assert db.session.execute(text("PRAGMA journal_mode")).scalar() == "wal"
+        assert db.session.execute(text("PRAGMA synchronous")).scalar() == 1  # NORMAL
+        assert db.session.execute(text("PRAGMA busy_timeout")).scalar() == Config.SQLITE_BUSY_TIMEOUT
+        assert db.engine.pool.size() == Config.DB_POOL_SIZE
+
+
+def test_sqlite_profile_can_be_disabled(tmp_path, monkeypatch):
+    """SQLITE_WAL and SQLITE_SYNCHRONOUS can switch back to SQLite's defaults."""
+    monkeypatch.setattr(Config, 'SQLALCHEMY_DATABASE_URI', f"sqlite:///{tmp_path / 'app.db'}")
+    monkeypatch.setattr(Config, 'MODEL_LOAD_MODE', 'lazy')
+    monkeypatch.setattr(Config, 'SQLITE_WAL', False)
+    monkeypatch.setattr(Config, 'SQLITE_SYNCHRONOUS', 'FULL')
+    app = create_app()
+
+    with app.app_context():
+        assert db.session.execute(text("PRAGMA journal_mode")).scalar() == "delete"
+        assert db.session.execute(text("PRAGMA synchronous")).scalar() == 2  # FULL
@@ -0,0 +1,80 @@
+import threading
+from app.drift_monitor import DriftMonitor, LocalStoreBackend, MemoryBackend, empty_sketch, add_to_sketch, histogram_quantiles
+from app.utils.local_store import LocalStore
+from tests.stroke_fixture import SAMPLE_PATIENT
+
+
+def test_sketch_quantiles_follow_the_inputs():
+    """The histogram quantiles land within one bin width of the exact ones."""
+    sketch = empty_sketch()
+    for age in range(20, 81):
+        add_to_sketch(sketch, dict(SAMPLE_PATIENT, age=age), 'Low')
+    quantiles = histogram_quantiles(sketch['numeric']['age']['bins'], 0, 5)
+    assert abs(quantiles['p50'] - 50) <= 5
+    assert abs(quantiles['p95'] - 77) <= 5
+    assert sketch['categorical']['gender'] == {SAMPLE_PATIENT['gender']: 61}
+
+
+def test_workers_merge_through_the_local_store(tmp_path):
+    """The sketches of two workers add up to one window sketch in the local store."""
+    path = str(tmp_path / "store.db")
+    worker_a = DriftMonitor(LocalStoreBackend(LocalStore(path)), flush_interval=60)
+    worker_b = DriftMonitor(LocalStoreBackend(LocalStore(path)), flush_interval=60)
+
+    for _ in range(3):
+        worker_a.record(SAMPLE_PATIENT, 'High')
+    worker_b.record(dict(SAMPLE_PATIENT, gender="Female"), 'Low')
+    worker_b.flush()
+
+    sketch = worker_a.sketch()
+    assert (sketch['count'], sketch['high_risk']) == (4, 3)
+    assert sketch['categorical']['gender'] == {SAMPLE_PATIENT['gender']: 3, 'Female': 1}
+
+
+
+def test_record_does_not_wait_for_a_merge():
+    """Records are added while another thread merges the pending sketch into the backend."""
+    merging, release = threading.Event(), threading.Event()
+
+    class SlowBackend(MemoryBackend):
+        def merge(self, window, sketch, ttl):
+            merging.set()
+            assert release.wait(5)
+            super().merge(window, sketch, ttl)
+
+    monitor = DriftMonitor(SlowBackend(), flush_interval=60)
+    monitor.record(SAMPLE_PATIENT, 'High')
+    flusher = threading.Thread(target=monitor.flush)
+    flusher.start()
+    assert merging.wait(5)
+
+    recorder = threading.Thread(target=monitor.record, args=(SAMPLE_PATIENT, 'Low'))
+    recorder.start()
+    recorder.join(1)
+    alive = recorder.is_alive()
+    release.set()
+    flusher.join()
+    recorder.join()
+    assert not alive
+    assert monitor.sketch()['count'] == 2
+
+def test_drift_against_the_records_baseline(app, client, admin_headers, tmp_path):
+    """Predictions like the stored records show no drift, much older patients shift the age distribution."""
+    app.config['DRIFT_BASELINE_PATH'] = str(tmp_path / "baseline.json")
+    for age in range(30, 60):
+        assert client.post('/predict', json=dict(SAMPLE_PATIENT, age=age)).status_code == 200
+
+    result = app.test_cli_runner().invoke(args=['records', 'drift-baseline'])
+    assert result.exit_code == 0, result.output
+
+    report = client.get('/records/drift', headers=admin_headers).json
+    assert report['predictions'] == 30
+    assert report['baseline']['records'] == 30
+    assert report['features']['age']['psi'] < 0.01
+    assert report['drifted'] == []
+
+    for age in range(80, 100):
+        client.post('/predict/batch', json=[dict(SAMPLE_PATIENT, age=age)])
+    report = client.get('/records/drift', headers=admin_headers).json
+    assert report['predictions'] == 50
+    assert report['drifted'] == ['age']
@@ -0,0 +1,91 @@
+import pytest
+from flask_mail import Message
+from app.models import User
+from app.utils import db, mail
+from app.utils.mail_queue import init_mail_queue
+from app.utils.smtp_sink import SMTPSink
+
+
+@pytest.fixture
+def smtp_sink():
+    """Fixture that runs a local SMTP server standing in for MAIL_SERVER."""
+    sink = SMTPSink().start()
+    yield sink
+    sink.stop()
+
+
+@pytest.fixture
+def mail_queue(app, smtp_sink, monkeypatch):
+    """Fixture that sends mail through the queue to the local SMTP sink."""
+    monkeypatch.setenv("MAIL_USERNAME", "noreply@example.com")
+    app.config.update(
+        MAIL_SERVER=smtp_sink.host,
+        MAIL_PORT=smtp_sink.port,
+        MAIL_USE_TLS=False,
+        MAIL_SUPPRESS_SEND=False,
+        MAIL_QUEUE_ENABLED=True,
+        MAIL_QUEUE_WORKERS=1,
+        MAIL_QUEUE_RETRY_BACKOFF=0.01
+    )
+    mail.init_app(app)
+    return init_mail_queue(app)
+
+
+def message(number):
+    return Message(f"Message {number}", sender="noreply@example.com", recipients=[f"user{number}@example.com"], body="Hello")
+
+
+def test_forgot_password_queues_mail(client, mail_queue, smtp_sink):
+    """POST /forgotpassword returns without waiting for the SMTP server."""
+    db.session.add(User(first_name="Test", last_name="User", email="test@example.com", phone_number="1234567890",
+                        username="testuser", password="hashedpassword"))
+    db.session.commit()
+
+    response = client.post('/forgotpassword', json={"email": "test@example.com"})
+    assert response.status_code == 200
+    assert mail_queue.stats()['enqueued'] == 1
+
+    assert mail_queue.flush(timeout=5)
+    assert smtp_sink.messages[0]['recipients'] == ["<test@example.com>"]
+    assert b"resetpassword" in smtp_sink.messages[0]['data']
+
+
+def test_messages_share_a_connection(mail_queue, smtp_sink):
+    """Queued messages are sent in batches over one SMTP connection."""
+    for number in range(10):
+        mail_queue.send(message(number))
+
+    assert mail_queue.flush(timeout=5)
+    assert len(smtp_sink.messages) == 10
+    assert smtp_sink.connections == 1
+    assert mail_queue.stats()['sent'] == 10
+
+
+def test_failed_sends_are_retried(mail_queue, smtp_sink):
+    """A temporary SMTP error is retried with backoff until the message goes through."""
+    smtp_sink.fail_next = 2
+    mail_queue.send(message(1))
+
+    assert mail_queue.flush(timeout=5)
+    stats = mail_queue.stats()
+    assert len(smtp_sink.messages) == 1
+    assert stats['retried'] == 2
+    assert stats['failed'] == 0
+
+
+def test_undeliverable_reset_mail_allows_a_new_request(app, client, mail_queue, smtp_sink):
+    """When the queue gives up on a reset mail, the next /forgotpassword sends a new one."""
+    mail_queue.max_retries = 1
+    db.session.add(User(first_name="Test", last_name="User", email="test@example.com", phone_number="1234567890",
+                        username="testuser", password="hashedpassword"))
+    db.session.commit()
+
+    smtp_sink.fail_next = 2
+    assert client.post('/forgotpassword', json={"email": "test@example.com"}).status_code == 200
+    assert mail_queue.flush(timeout=5)
+    assert mail_queue.stats()['failed'] == 1
+
+    assert client.post('/forgotpassword', json={"email": "test@example.com"}).status_code == 200
+    assert mail_queue.flush(timeout=5)
+    assert mail_queue.stats()['enqueued'] == 2
+    assert len(smtp_sink.messages) == 1
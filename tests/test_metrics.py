@@ -0,0 +1,90 @@
+import pytest
+from app.config import Config
+from app.utils.metrics import Counter, Histogram, HTTP_REQUESTS, PREDICTION_STAGE_SECONDS, DB_QUERY_SECONDS
+from tests.stroke_fixture import SAMPLE_PATIENT
+
+
+@pytest.fixture
+def metrics_enabled(monkeypatch):
+    """Fixture that turns the metrics on for the apps created after it."""
+    monkeypatch.setattr(Config, 'METRICS_ENABLED', True)
+
+
+@pytest.fixture
+def app(metrics_enabled, app):
+    """The conftest app, created with the metrics turned on."""
+    return app
+
+
+def test_histogram_and_counter_exposition():
+    """Histograms render cumulative buckets, sum and count in the Prometheus text format."""
+    histogram = Histogram('test_seconds', 'Test.', ['stage'], buckets=(0.1, 1.0))
+    histogram.observe(0.05, stage='a')
+    histogram.observe(0.5, stage='a')
+    histogram.observe(3, stage='a')
+    assert list(histogram.samples()) == [
+        'test_seconds_bucket{stage="a",le="0.1"} 1',
+        'test_seconds_bucket{stage="a",le="1.0"} 2',
+        'test_seconds_bucket{stage="a",le="+Inf"} 3',
+        'test_seconds_sum{stage="a"} 3.55',
+        'test_seconds_count{stage="a"} 3',
+    ]
+
+    counter = Counter('test_total', 'Test.', ['status'])
+    counter.inc(status='200')
+    counter.inc(2, status='200')
+    assert list(counter.samples()) == ['test_total{status="200"} 3']
+
+
+def test_prediction_stages_are_timed(client):
+    """A prediction records preprocess, predict and persist timings and the request count."""
+    before = {stage: PREDICTION_STAGE_SECONDS.count(stage=stage) for stage in ('preprocess', 'predict', 'persist')}
+    requests_before = HTTP_REQUESTS.value(blueprint='auth', method='POST', status='200')
+
+    assert client.post('/predict', json=dict(SAMPLE_PATIENT, age=41)).status_code == 200
+    for stage, count in before.items():
+        assert PREDICTION_STAGE_SECONDS.count(stage=stage) == count + 1
+    assert HTTP_REQUESTS.value(blueprint='auth', method='POST', status='200') == requests_before + 1
+
+
+def test_metrics_endpoint(client, admin_headers):
+    """GET /metrics exposes request counts, DB query timings and cache statistics."""
+    queries_before = DB_QUERY_SECONDS.count(operation='load_principal')
+    client.get('/records/stats', headers=admin_headers)
+    client.get('/records/stats', headers=admin_headers)
+    assert DB_QUERY_SECONDS.count(operation='load_principal') == queries_before + 1
+    client.post('/predict', json=dict(SAMPLE_PATIENT, age=42))
+    client.post('/predict', json=dict(SAMPLE_PATIENT, age=42))
+
+    response = client.get('/metrics')
+    assert response.status_code == 200
+    assert response.mimetype == 'text/plain'
+    body = response.get_data(as_text=True)
+    assert '# TYPE http_requests_total counter' in body
+    assert 'http_requests_total{blueprint="records",method="GET",status="200"}' in body
+    assert 'prediction_stage_duration_seconds_bucket{stage="predict",le="+Inf"}' in body
+    assert 'db_query_duration_seconds_count{operation="load_principal"}' in body
+    assert 'cache_hits_total{cache="principal"} 1' in body
+    assert 'cache_hits_total{cache="prediction"} 1' in body
+    assert 'cache_hit_ratio{cache="prediction"} 0.5' in body
+
+
+def test_metrics_endpoint_is_restricted(app, client):
+    """Only allowed addresses get /metrics, with the token when METRICS_TOKEN is set."""
+    app.config['METRICS_ALLOWED_IPS'] = '10.0.0.5'
+    assert client.get('/metrics').status_code == 403
+    assert client.get('/metrics', environ_base={'REMOTE_ADDR': '10.0.0.5'}).status_code == 200
+
+    app.config.update(METRICS_ALLOWED_IPS='', METRICS_TOKEN='s3cret')
+    assert client.get('/metrics').status_code == 403
+    assert client.get('/metrics', headers={'Authorization': 'Bearer wrong'}).status_code == 403
+    assert client.get('/metrics', headers={'Authorization': 'Bearer s3cret'}).status_code == 200
+
+
+def test_metrics_are_off_by_default(model_dir, monkeypatch):
+    """Without METRICS_ENABLED there is no /metrics endpoint."""
+    from app import create_app
+    monkeypatch.setattr(Config, 'METRICS_ENABLED', False)
+    monkeypatch.setattr(Config, 'MODEL_BASE_PATH', model_dir)
+    monkeypatch.setattr(Config, 'SQLALCHEMY_DATABASE_URI', 'sqlite:///:memory:')
+    assert create_app().test_client().get('/metrics').status_code == 404
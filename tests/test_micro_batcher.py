@@ -0,0 +1,77 @@
+import threading
+import pytest
+from app.micro_batcher import MicroBatcher
+from app.stroke_model import get_model_registry, predict_stroke_risk
+from tests.stroke_fixture import SAMPLE_PATIENT
+
+
+def test_concurrent_requests_share_a_batch(app):
+    """Requests submitted together are scored in one batch and get their own results."""
+    batcher = MicroBatcher(get_model_registry(), window_ms=50, max_rows=64)
+    patients = [dict(SAMPLE_PATIENT, age=age, avg_glucose_level=80 + age * 2) for age in range(20, 80, 3)]
+
+    futures = [batcher.submit(patient) for patient in patients]
+    results = [future.result(timeout=5) for future in futures]
+
+    assert results == [predict_stroke_risk(patient) for patient in patients]
+    stats = batcher.stats()
+    assert stats['rows'] == len(patients)
+    assert stats['batches'] < len(patients)
+
+
+def test_invalid_request_fails_alone(app):
+    """An invalid request gets its own error, the rest of the batch is still scored."""
+    batcher = MicroBatcher(get_model_registry(), window_ms=50, max_rows=64)
+
+    good = batcher.submit(SAMPLE_PATIENT)
+    bad = batcher.submit(dict(SAMPLE_PATIENT, gender="Robot"))
+
+    assert good.result(timeout=5) == predict_stroke_risk(SAMPLE_PATIENT)
+    with pytest.raises(ValueError, match="Unmapped columns: \\['gender'\\]"):
+        bad.result(timeout=5)
+
+
+def test_badly_typed_request_fails_alone(app):
+    """A request with a list where a number belongs doesn't fail the requests sharing its window."""
+    batcher = MicroBatcher(get_model_registry(), window_ms=200, max_rows=64)
+    patient = dict(SAMPLE_PATIENT, age=61)
+
+    bad = batcher.submit(dict(SAMPLE_PATIENT, age=[1]))
+    good = batcher.submit(patient)
+
+    assert good.result(timeout=5) == predict_stroke_risk(patient)
+    with pytest.raises(ValueError, match="Preprocessing Error"):
+        bad.result(timeout=5)
+    assert batcher.stats()['batches'] == 1
+
+
+def test_max_rows_bounds_batch_size(app):
+    """A batch never holds more than max_rows requests."""
+    batcher = MicroBatcher(get_model_registry(), window_ms=50, max_rows=4)
+
+    futures = [batcher.submit(SAMPLE_PATIENT) for _ in range(10)]
+    for future in futures:
+        future.result(timeout=5)
+    assert batcher.stats()['largest_batch'] <= 4
+
+
+def test_predict_route_uses_micro_batcher(app):
+    """With micro-batching enabled /predict goes through the batcher."""
+    app.config['PREDICT_MICROBATCH_ENABLED'] = True
+    from app.micro_batcher import init_micro_batcher
+    batcher = init_micro_batcher(app)
+
+    responses = []
+
+    def call(age):
+        with app.test_client() as client:
+            responses.append(client.post('/predict', json=dict(SAMPLE_PATIENT, age=age)))
+
+    threads = [threading.Thread(target=call, args=(age,)) for age in range(30, 38)]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+
+    assert [response.status_code for response in responses] == [200] * 8
+    assert batcher.stats()['rows'] == 8
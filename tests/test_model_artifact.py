@@ -0,0 +1,99 @@
+import os
+import numpy as np
+import pytest
+from sklearn.linear_model import LogisticRegression
+from sklearn.tree import DecisionTreeClassifier
+from app.model_artifact import ARTIFACT_FILE, ArtifactError, ArtifactModel, compare_predictions, write_artifact
+from app.stroke_model import ModelRegistry, export_artifact, load_category_maps, load_model, predict_stroke_risk
+from tests.stroke_fixture import SAMPLE_PATIENT, synthetic_features, write_stroke_model
+
+
+def category_maps(base_dir):
+    _, *maps = load_model(base_dir)
+    return dict(zip(['gender', 'ever_married', 'work_type', 'Residence_type', 'smoking_status'], maps))
+
+
+def test_forest_artifact_matches_pickled_model(tmp_path):
+    """The NumPy forest predicts exactly what scikit-learn predicts, split points included."""
+    model = write_stroke_model(str(tmp_path), n_estimators=25)
+    path = str(tmp_path / ARTIFACT_FILE)
+    manifest = write_artifact(path, model, category_maps(str(tmp_path)))
+    assert all(spec['offset'] % 64 == 0 for spec in manifest['arrays'].values())
+
+    artifact = ArtifactModel.load(path)
+    X = synthetic_features(2000, seed=7)
+    assert np.array_equal(artifact.predict(X.to_numpy()), model.predict(X))
+    assert np.allclose(artifact.predict_proba(X.to_numpy()), model.predict_proba(X))
+    assert compare_predictions(model, artifact, category_maps(str(tmp_path)), n_rows=5000) == 0
+    assert list(artifact.feature_names_in_) == list(model.feature_names_in_)
+
+
+@pytest.mark.parametrize('estimator', [DecisionTreeClassifier(max_depth=8, random_state=0), LogisticRegression(max_iter=1000)])
+def test_tree_and_linear_artifacts(tmp_path, estimator):
+    """Single trees and logistic regression export too."""
+    X = synthetic_features(800, seed=3)
+    y = ((X['age'] > 50) & (X['avg_glucose_level'] > 120)).astype(int)
+    estimator.fit(X, y)
+    path = str(tmp_path / ARTIFACT_FILE)
+    write_artifact(path, estimator, {})
+
+    artifact = ArtifactModel.load(path)
+    X_test = synthetic_features(1000, seed=4)
+    assert np.array_equal(artifact.predict(X_test.to_numpy()), estimator.predict(X_test))
+
+
+def test_corrupted_artifact_is_rejected(tmp_path):
+    """A flipped byte in the arrays fails the checksum, a foreign file fails the magic."""
+    model = write_stroke_model(str(tmp_path))
+    path = str(tmp_path / ARTIFACT_FILE)
+    write_artifact(path, model, {})
+    with open(path, 'r+b') as artifact:
+        artifact.seek(-1, os.SEEK_END)
+        last = artifact.read(1)
+        artifact.seek(-1, os.SEEK_END)
+        artifact.write(bytes([last[0] ^ 0xFF]))
+
+    with pytest.raises(ArtifactError, match='Checksum mismatch'):
+        ArtifactModel.load(path)
+    ArtifactModel.load(path, verify=False)
+
+    with pytest.raises(ArtifactError, match='not a stroke model artifact'):
+        ArtifactModel.load(str(tmp_path / 'gender_map.pkl'))
+
+
+def test_registry_prefers_artifact(app, model_dir):
+    """Once exported the registry maps the artifact and predictions stay the same."""
+    pickled = ModelRegistry({'MODEL_BASE_PATH': model_dir, 'MODEL_ARTIFACT': 'off'}).get()
+    export_artifact(model_dir)
+
+    registry = ModelRegistry({'MODEL_BASE_PATH': model_dir})
+    bundle = registry.get()
+    assert isinstance(bundle.model, ArtifactModel)
+    assert bundle.gender_map == {'Male': 0, 'Female': 1, 'Other': 2}
+    assert load_category_maps(model_dir)['smoking_status'] == bundle.smoking_status_map
+
+    app.extensions['stroke_model'] = registry
+    for age in (25, 58, 67, 80):
+        data = dict(SAMPLE_PATIENT, age=age)
+        assert predict_stroke_risk(dict(data))['prediction'] == int(pickled.array_model.predict(pickled.encode(data))[0])
+
+    # With MODEL_ARTIFACT=off the pickle is loaded as before
+    assert not isinstance(ModelRegistry({'MODEL_BASE_PATH': model_dir, 'MODEL_ARTIFACT': 'off'}).get().model, ArtifactModel)
+
+
+def test_stale_artifact_falls_back_to_pickle(model_dir):
+    """A pickle newer than the artifact means the artifact is out of date."""
+    export_artifact(model_dir)
+    pickle = os.path.join(model_dir, 'stroke_prediction_model.pkl')
+    stat = os.stat(os.path.join(model_dir, ARTIFACT_FILE))
+    os.utime(pickle, ns=(stat.st_atime_ns, stat.st_mtime_ns + 10**9))
+    assert not isinstance(ModelRegistry({'MODEL_BASE_PATH': model_dir}).get().model, ArtifactModel)
+
+
+def test_export_command(app, model_dir):
+    """flask model export writes the artifact after checking it against the pickle."""
+    result = app.test_cli_runner().invoke(args=['model', 'export', '--check-rows', '2000'])
+    assert result.exit_code == 0, result.output
+    assert 'Exported RandomForestClassifier' in result.output
+    assert os.path.exists(os.path.join(model_dir, ARTIFACT_FILE))
+    assert not os.path.exists(os.path.join(model_dir, ARTIFACT_FILE + '.new'))
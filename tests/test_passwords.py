@@ -0,0 +1,65 @@
+from werkzeug.security import generate_password_hash
+from app.models import User
+from app.utils import db
+from app.utils.passwords import PasswordHasher
+
+
+def add_user(password_hash):
+    db.session.add(User(first_name="Jane", last_name="Smith", email="jane@example.com", phone_number="9876543210",
+                        username="janesmith", password=password_hash))
+    db.session.commit()
+
+
+def test_login_rehashes_outdated_hash(client):
+    """A hash made with other parameters is replaced on the next successful login."""
+    add_user(generate_password_hash("AnotherP@ssw0rd", "pbkdf2:sha256:1000"))
+
+    response = client.post('/login', json={"username": "janesmith", "password": "AnotherP@ssw0rd"})
+    assert response.status_code == 200
+
+    stored = User.query.filter_by(username="janesmith").first().password
+    assert stored.startswith("scrypt:32768:8:1$")
+
+    # The new hash still logs in
+    response = client.post('/login', json={"username": "janesmith", "password": "AnotherP@ssw0rd"})
+    assert response.status_code == 200
+
+
+def test_failed_login_keeps_hash(client):
+    """Wrong passwords never touch the stored hash."""
+    old_hash = generate_password_hash("AnotherP@ssw0rd", "pbkdf2:sha256:1000")
+    add_user(old_hash)
+
+    response = client.post('/login', json={"username": "janesmith", "password": "wrong"})
+    assert response.status_code == 401
+    assert User.query.filter_by(username="janesmith").first().password == old_hash
+
+
+def test_needs_rehash():
+    """Method, work factors and salt length all count as parameters."""
+    hasher = PasswordHasher("pbkdf2:sha256:1000", 16)
+    assert not hasher.needs_rehash(generate_password_hash("secret", "pbkdf2:sha256:1000", 16))
+    assert hasher.needs_rehash(generate_password_hash("secret", "pbkdf2:sha256:2000", 16))
+    assert hasher.needs_rehash(generate_password_hash("secret", "pbkdf2:sha256:1000", 8))
+    assert hasher.needs_rehash("plaintext")
+
+
+def test_process_pool_hashing(app, client):
+    """With workers configured hashing runs in a process pool and gives the same results."""
+    hasher = PasswordHasher("pbkdf2:sha256:1000", 16, workers=1)
+    app.extensions['password_hasher'] = hasher
+
+    client.post('/register', json={
+        "firstName": "Jane",
+        "lastName": "Smith",
+        "phoneNumber": "9876543210",
+        "username": "janesmith",
+        "email": "jane@example.com",
+        "password": "AnotherP@ssw0rd"
+    })
+    response = client.post('/login', json={"username": "janesmith", "password": "AnotherP@ssw0rd"})
+    assert response.status_code == 200
+    assert hasher._executor is not None
+
+    hashes = hasher.hash_many(["a", "b"])
+    assert [hasher.verify(pwhash, password) for pwhash, password in zip(hashes, ["a", "b"])] == [True, True]
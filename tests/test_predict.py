@@ -0,0 +1,61 @@
+import json
+from app.models import MedicalRecord
+from tests.stroke_fixture import SAMPLE_PATIENT
+
+
+def test_predict(client):
+    """Test the POST /predict route."""
+    response = client.post('/predict', json=SAMPLE_PATIENT)
+    assert response.status_code == 200
+    assert response.json['stroke_risk'] in ("High", "Low")
+    assert MedicalRecord.query.count() == 1
+
+
+def test_predict_batch_matches_single_predictions(client):
+    """Every record of a batch gets the same result as a single /predict call."""
+    patients = [
+        SAMPLE_PATIENT,
+        dict(SAMPLE_PATIENT, age=23, hypertension=0, heart_disease=0, avg_glucose_level=85.2),
+        dict(SAMPLE_PATIENT, gender="Female", smoking_status="Never smoked", bmi=22.1),
+    ]
+    response = client.post('/predict/batch', json=patients)
+    assert response.status_code == 200
+    assert response.json['succeeded'] == 3
+
+    for patient, result in zip(patients, response.json['results']):
+        single = client.post('/predict', json=patient).json
+        assert result['stroke_risk'] == single['stroke_risk']
+        assert result['prediction'] == single['prediction']
+
+
+def test_predict_batch_reports_errors_per_record(client):
+    """Invalid records are reported without failing the rest of the batch."""
+    missing_age = {key: value for key, value in SAMPLE_PATIENT.items() if key != 'age'}
+    patients = [SAMPLE_PATIENT, missing_age, dict(SAMPLE_PATIENT, gender="Robot"), dict(SAMPLE_PATIENT, bmi="heavy")]
+
+    response = client.post('/predict/batch', json=patients)
+    assert response.status_code == 200
+    results = response.json['results']
+    assert 'prediction' in results[0]
+    assert results[1]['error'] == "Preprocessing Error: Missing required features: age"
+    assert "Unmapped columns: ['gender']" in results[2]['error']
+    assert "Unmapped columns: ['bmi']" in results[3]['error']
+
+    # Only the valid record is stored
+    assert response.json['failed'] == 3
+    assert MedicalRecord.query.count() == 1
+
+
+def test_predict_batch_ndjson(client):
+    """NDJSON bodies are accepted, one record per line."""
+    body = "\n".join([json.dumps(SAMPLE_PATIENT), "{not json", json.dumps(SAMPLE_PATIENT)]) + "\n"
+    response = client.post('/predict/batch', data=body, content_type='application/x-ndjson')
+    assert response.status_code == 200
+    assert [('error' in result) for result in response.json['results']] == [False, True, False]
+    assert MedicalRecord.query.count() == 2
+
+
+def test_predict_batch_rejects_non_array(client):
+    """A body that is neither a JSON array nor NDJSON is rejected."""
+    response = client.post('/predict/batch', json=SAMPLE_PATIENT)
+    assert response.status_code == 400
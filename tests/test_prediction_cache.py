@@ -0,0 +1,53 @@
+import time
+from app.stroke_model import get_model_registry, predict_stroke_risk
+from app.utils.helpers import TTLCache
+from tests.stroke_fixture import SAMPLE_PATIENT
+
+
+def test_repeated_predictions_are_cached(app, mocker):
+    """Identical inputs only run the model once, even when numbers are sent as int or float."""
+    registry = get_model_registry()
+    spy = mocker.spy(registry.get().array_model, 'predict')
+
+    first = predict_stroke_risk(SAMPLE_PATIENT)
+    second = predict_stroke_risk(dict(SAMPLE_PATIENT, age=67.0, hypertension=1.0, comment="retry"))
+
+    assert first == second
+    assert spy.call_count == 1
+    assert registry.prediction_cache.stats()['hits'] == 1
+
+
+def test_invalid_input_is_not_cached(app):
+    """Validation errors are raised every time and nothing is stored."""
+    registry = get_model_registry()
+    for _ in range(2):
+        try:
+            predict_stroke_risk(dict(SAMPLE_PATIENT, gender="Robot"))
+        except ValueError:
+            pass
+    assert len(registry.prediction_cache) == 0
+
+
+def test_cache_cleared_on_reload(app):
+    """Reloading the model drops every cached prediction."""
+    registry = get_model_registry()
+    predict_stroke_risk(SAMPLE_PATIENT)
+    assert len(registry.prediction_cache) == 1
+
+    registry.reload()
+    assert len(registry.prediction_cache) == 0
+
+
+def test_ttl_cache_limits():
+    """Entries are evicted least recently used first and expire after the TTL."""
+    cache = TTLCache(2, ttl=0.05)
+    cache.set('a', 1)
+    cache.set('b', 2)
+    cache.get('a')
+    cache.set('c', 3)
+    assert cache.get('b') is None
+    assert cache.get('a') == 1
+
+    time.sleep(0.06)
+    assert cache.get('a') is None
+    assert cache.stats()['misses'] == 2
@@ -0,0 +1,90 @@
+from app.models import User
+from app.utils import db
+from app.utils.local_store import LocalStore
+from app.utils.rate_limit import LocalStoreBackend, MemoryBackend, RateLimiter, parse_limit, take_token
+from app.utils.passwords import hash_password
+
+
+def add_user():
+    db.session.add(User(first_name="Jane", last_name="Smith", email="jane@example.com", phone_number="0712345678",
+                        username="janesmith", password=hash_password("AnotherP@ssw0rd")))
+    db.session.commit()
+
+
+def test_token_bucket_refills_over_time():
+    """A bucket allows a burst of capacity requests, then one per 1/rate seconds."""
+    capacity, rate = parse_limit("3/minute")
+    assert (capacity, rate) == (3, 0.05)
+
+    state = None
+    for _ in range(3):
+        state, retry_after = take_token(state, 100.0, capacity, rate)
+        assert retry_after == 0
+    state, retry_after = take_token(state, 100.0, capacity, rate)
+    assert retry_after == 20.0
+
+    state, retry_after = take_token(state, 120.0, capacity, rate)
+    assert retry_after == 0
+
+
+def test_login_is_limited_per_username(app, client):
+    """Guessing one account's password is refused with 429 once its bucket is empty, other accounts still work."""
+    app.extensions['rate_limiter'].limits[('login', 'username')] = parse_limit("3/minute")
+    add_user()
+
+    statuses = [client.post('/login', json={"username": "janesmith", "password": "wrong"}).status_code for _ in range(4)]
+    assert statuses == [401, 401, 401, 429]
+
+    response = client.post('/login', json={"username": "janesmith", "password": "AnotherP@ssw0rd"})
+    assert response.status_code == 429
+    assert int(response.headers['Retry-After']) > 0
+    assert client.post('/login', json={"username": "someoneelse", "password": "wrong"}).status_code == 401
+
+
+def test_login_is_limited_per_ip(app, client):
+    """One client trying many usernames runs into the per IP limit."""
+    app.extensions['rate_limiter'].limits[('login', 'ip')] = parse_limit("5/minute")
+
+    statuses = [client.post('/login', json={"username": f"user{number}", "password": "wrong"}).status_code
+                for number in range(6)]
+    assert statuses == [401] * 5 + [429]
+
+
+def test_forgot_password_sends_one_mail(app, client, mocker):
+    """Repeated reset requests for one email within the link's lifetime send a single mail."""
+    send = mocker.patch('app.routes.auth_routes.send_mail')
+    add_user()
+
+    for _ in range(3):
+        response = client.post('/forgotpassword', json={"email": "jane@example.com"})
+        assert response.status_code == 200
+    assert send.call_count == 1
+
+    # Once the link is used a new one can be requested
+    token = send.call_args[0][0].body.rsplit('/', 1)[1]
+    assert client.post(f'/resetpassword/{token}', json={"newPassword": "N3wP@ssword"}).status_code == 200
+    client.post('/forgotpassword', json={"email": "jane@example.com"})
+    assert send.call_count == 2
+
+
+def test_local_store_backend_is_shared(tmp_path):
+    """Limiters of different workers using the same store file share their buckets and markers."""
+    limits = {('login', 'ip'): parse_limit("2/hour")}
+    first = RateLimiter(LocalStoreBackend(LocalStore(str(tmp_path / 'store.db'))), limits)
+    second = RateLimiter(LocalStoreBackend(LocalStore(str(tmp_path / 'store.db'))), limits)
+
+    assert first.hit('login', ip='10.0.0.1') == 0
+    assert second.hit('login', ip='10.0.0.1') == 0
+    assert first.hit('login', ip='10.0.0.1') > 0
+    assert second.hit('login', ip='10.0.0.2') == 0
+
+    assert first.first_within('password_reset', 'jane@example.com', 60)
+    assert not second.first_within('password_reset', 'JANE@example.com', 60)
+
+
+def test_memory_backend_drops_oldest_buckets():
+    """The memory backend keeps at most max_keys buckets."""
+    backend = MemoryBackend(max_keys=2)
+    for key in ('a', 'b', 'c'):
+        backend.take(key, 1, 1.0)
+    assert list(backend._buckets) == ['b', 'c']
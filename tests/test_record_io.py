@@ -0,0 +1,117 @@
+import csv
+import io
+import pytest
+from sqlalchemy import select, func
+from app.models import MedicalRecord
+from app.record_io import EXPORT_COLUMNS, import_records, export_records
+from app.risk_rollups import check_rollups
+from app.utils import db
+from tests.stroke_fixture import SAMPLE_PATIENT
+
+HEADER = list(SAMPLE_PATIENT) + ['stroke_risk', 'prediction', 'created_at']
+
+
+def csv_source(rows, header=HEADER):
+    buffer = io.StringIO()
+    writer = csv.DictWriter(buffer, fieldnames=header, extrasaction='ignore')
+    writer.writeheader()
+    writer.writerows(rows)
+    return io.BytesIO(buffer.getvalue().encode())
+
+
+def patient(**changes):
+    return {**SAMPLE_PATIENT, 'stroke_risk': 'High', 'prediction': '1', 'created_at': '2024-06-15T12:00:00', **changes}
+
+
+def record_count():
+    return db.session.execute(select(func.count()).select_from(MedicalRecord)).scalar()
+
+
+def test_import_csv_in_batches(app):
+    """Valid rows are inserted batch by batch and the rollups stay consistent."""
+    rows = [patient(age=20 + i) for i in range(25)]
+    summary = import_records(csv_source(rows), 'csv', batch_size=10)
+    assert summary == {'read': 25, 'inserted': 25, 'skipped': 0, 'errors': []}
+    assert record_count() == 25
+    assert check_rollups() == []
+
+    record = db.session.execute(select(MedicalRecord).order_by(MedicalRecord.id)).scalars().first()
+    assert record.age == 20
+    assert record.heart_disease == SAMPLE_PATIENT['heart_disease']
+    assert record.created_at.isoformat() == '2024-06-15T12:00:00'
+
+
+def test_import_reports_invalid_rows(app):
+    """Rows with unknown categories or bad numbers are skipped with their line number."""
+    rows = [patient(), patient(gender='Robot'), patient(age='old'), patient(stroke_risk='Maybe'), patient()]
+    summary = import_records(csv_source(rows), 'csv', batch_size=2)
+    assert summary['inserted'] == 2
+    assert summary['skipped'] == 3
+    assert summary['errors'] == [
+        {'line': 3, 'error': 'invalid gender'},
+        {'line': 4, 'error': 'invalid age'},
+        {'line': 5, 'error': 'invalid stroke_risk'},
+    ]
+    assert record_count() == 2
+
+
+def test_import_missing_columns(app):
+    """A file without the required columns is rejected before anything is stored."""
+    with pytest.raises(ValueError, match='Missing required columns: stroke_risk'):
+        import_records(csv_source([patient()], header=list(SAMPLE_PATIENT)), 'csv')
+    assert record_count() == 0
+
+
+def test_import_with_scoring(app):
+    """With score the model computes stroke_risk and prediction for every row."""
+    source = csv_source([SAMPLE_PATIENT] * 3, header=list(SAMPLE_PATIENT))
+    summary = import_records(source, 'csv', score=True)
+    assert summary['inserted'] == 3
+    records = db.session.execute(select(MedicalRecord)).scalars().all()
+    assert {record.stroke_risk for record in records} <= {'High', 'Low'}
+    assert all(record.prediction in ('0', '1') for record in records)
+
+
+def test_export_round_trip(app, tmp_path):
+    """Exported records can be imported again."""
+    import_records(csv_source([patient(age=30 + i) for i in range(5)]), 'csv')
+    path = tmp_path / 'records.csv'
+    assert export_records(str(path), 'csv', chunk_size=2) == 5
+
+    with open(path) as exported:
+        rows = list(csv.DictReader(exported))
+    assert list(rows[0]) == EXPORT_COLUMNS
+    assert [int(row['age']) for row in rows] == [30, 31, 32, 33, 34]
+
+    with open(path, 'rb') as exported:
+        assert import_records(exported, 'csv')['inserted'] == 5
+    assert record_count() == 10
+
+
+def test_parquet_round_trip(app, tmp_path):
+    """Parquet files go through the same import and export."""
+    pytest.importorskip('pyarrow')
+    import_records(csv_source([patient(age=40 + i) for i in range(3)]), 'csv')
+    path = tmp_path / 'records.parquet'
+    assert export_records(str(path), 'parquet', chunk_size=2) == 3
+    assert import_records(str(path), 'parquet', batch_size=2)['inserted'] == 3
+    assert record_count() == 6
+
+
+def test_import_and_export_routes(client, admin_headers):
+    """The HTTP endpoints stream CSV in and out and are admin only."""
+    body = csv_source([patient(), patient(smoking_status='Sometimes')]).getvalue()
+    response = client.post('/records/import?batch_size=1', data=body, headers=admin_headers, content_type='text/csv')
+    assert response.status_code == 200
+    assert response.json['inserted'] == 1
+    assert response.json['errors'] == [{'line': 3, 'error': 'invalid smoking_status'}]
+
+    response = client.get('/records/export', headers=admin_headers)
+    assert response.status_code == 200
+    assert response.mimetype == 'text/csv'
+    lines = response.get_data(as_text=True).splitlines()
+    assert lines[0] == ','.join(EXPORT_COLUMNS)
+    assert len(lines) == 2
+
+    assert client.post('/records/import?format=xlsx', data=body, headers=admin_headers).status_code == 400
+    assert client.get('/records/export').status_code == 403
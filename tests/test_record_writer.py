@@ -0,0 +1,93 @@
+import datetime
+import threading
+import time
+from app.models import MedicalRecord, RiskRollup
+from app.record_writer import RecordWriter, init_record_writer
+from app.risk_rollups import check_rollups
+from app.routes.auth_routes import medical_record_fields
+from app.utils import db
+from tests.stroke_fixture import SAMPLE_PATIENT
+
+
+def record(number):
+    return dict(medical_record_fields(dict(SAMPLE_PATIENT, age=20 + number % 60), "Low", "0"), user_id=None)
+
+
+def test_concurrent_writes_share_transactions(app, monkeypatch):
+    """Records written at the same time are committed together, each writer returns once its record is stored."""
+    writer = RecordWriter(app, max_rows=50, durability='sync')
+    store = RecordWriter._store
+
+    def slow_store(rows):
+        time.sleep(0.01)  # A commit that takes a while, like an fsync
+        store(rows)
+
+    monkeypatch.setattr(writer, '_store', slow_store)
+    threads = [threading.Thread(target=writer.write, args=(record(number), )) for number in range(20)]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+
+    stats = writer.stats()
+    assert stats['written'] == 20
+    assert stats['batches'] < 20
+    assert MedicalRecord.query.count() == 20
+    assert sum(bucket.count for bucket in RiskRollup.query.all()) == 20
+    assert check_rollups() == []
+    writer.close()
+
+
+def test_group_durability_returns_before_commit(app):
+    """With durability "group" write returns right away and close writes what is still buffered."""
+    writer = RecordWriter(app, max_rows=10, max_delay_ms=200, durability='group')
+    for number in range(25):
+        writer.write(record(number))
+    assert writer.stats()['buffered'] == 25
+
+    writer.close()
+    assert MedicalRecord.query.count() == 25
+    assert writer.stats()['batches'] >= 3
+
+
+def test_full_buffer_writes_on_caller(app, monkeypatch):
+    """When the buffer stays full the caller stores its record itself."""
+    writer = RecordWriter(app, max_buffer=1, put_timeout=0.01, durability='group')
+    monkeypatch.setattr(writer, '_ensure_worker', lambda: None)  # Nothing drains the buffer
+    writer.write(record(1))
+    writer.write(record(2))
+
+    assert writer.stats()['written_inline'] == 1
+    assert MedicalRecord.query.count() == 1
+
+
+def test_failed_group_is_retried(app, monkeypatch):
+    """A transaction that fails is retried before the records are given up on."""
+    writer = RecordWriter(app, durability='sync', retry_backoff=0.001)
+    store = RecordWriter._store
+    failures = [RuntimeError("database is locked")]
+
+    def flaky_store(rows):
+        if failures:
+            raise failures.pop()
+        store(rows)
+
+    monkeypatch.setattr(writer, '_store', flaky_store)
+    writer.write(record(1))
+    assert MedicalRecord.query.count() == 1
+    assert writer.stats()['failed'] == 0
+    writer.close()
+
+
+def test_predict_uses_record_writer(app, client):
+    """With RECORD_WRITE_BEHIND the predict view hands its record to the writer."""
+    app.config.update(RECORD_WRITE_BEHIND=True, RECORD_WRITE_DURABILITY='group')
+    writer = init_record_writer(app)
+
+    response = client.post('/predict', json=SAMPLE_PATIENT)
+    assert response.status_code == 200
+    assert writer.flush(timeout=5)
+    stored = db.session.execute(db.select(MedicalRecord)).scalar_one()
+    assert stored.created_at <= datetime.datetime.utcnow()
+    assert writer.stats()['written'] == 1
+    writer.close()
@@ -0,0 +1,81 @@
+from datetime import datetime, timedelta
+from app.models import MedicalRecord
+from app.utils import db
+from app.routes.records import stats_query
+from tests.stroke_fixture import SAMPLE_PATIENT
+
+
+def add_record(created_at, age, smoking_status, stroke_risk, work_type="Private"):
+    db.session.add(MedicalRecord(
+        gender="Male", age=age, hypertension=0, ever_married="Yes", work_type=work_type, Residence_type="Urban",
+        avg_glucose_level=100.0, bmi=25.0, smoking_status=smoking_status, stroke_risk=stroke_risk,
+        prediction="1" if stroke_risk == "High" else "0", created_at=created_at
+    ))
+
+
+def seed_records():
+    now = datetime(2024, 6, 15, 12, 0)
+    add_record(now, 65, "Smokes", "High")
+    add_record(now, 62, "Smokes", "Low")
+    add_record(now, 45, "Never smoked", "Low")
+    add_record(now - timedelta(days=1), 48, "Never smoked", "High")
+    add_record(now - timedelta(days=60), 70, "Smokes", "High")
+    db.session.commit()
+
+
+def test_stats_by_age_band(client, admin_headers):
+    """High risk rate by age band, aggregated by the database."""
+    seed_records()
+    response = client.get('/records/stats?group_by=age_band', headers=admin_headers)
+    assert response.status_code == 200
+    assert response.json['total'] == 5
+    assert [(group['key'], group['total'], group['high_risk']) for group in response.json['groups']] == [
+        (40, 2, 1), (60, 2, 1), (70, 1, 1)
+    ]
+
+
+def test_stats_by_smoking_status_in_window(client, admin_headers):
+    """Only records inside the time window are counted."""
+    seed_records()
+    response = client.get('/records/stats?group_by=smoking_status&from=2024-06-01&to=2024-07-01', headers=admin_headers)
+    assert response.status_code == 200
+    groups = {group['key']: group for group in response.json['groups']}
+    assert groups['Smokes']['total'] == 2
+    assert groups['Smokes']['high_risk_rate'] == 0.5
+    assert groups['Never smoked']['total'] == 2
+    assert response.json['total'] == 4
+
+
+def test_stats_filters_and_validation(client, admin_headers):
+    """Demographic filters narrow the records, invalid arguments are rejected."""
+    seed_records()
+    response = client.get('/records/stats?group_by=work_type&smoking_status=Smokes', headers=admin_headers)
+    assert response.json['groups'] == [{'key': 'Private', 'total': 3, 'high_risk': 2, 'high_risk_rate': 2 / 3}]
+
+    assert client.get('/records/stats?group_by=password', headers=admin_headers).status_code == 400
+    assert client.get('/records/stats?from=yesterday', headers=admin_headers).status_code == 400
+
+
+def test_stats_requires_admin_or_manager(client):
+    """The statistics are not public."""
+    assert client.get('/records/stats').status_code == 403
+
+
+def test_predict_links_record_to_user(client, admin_headers):
+    """Predictions made while signed in are stored with the user's id and a timestamp."""
+    client.post('/predict', json=SAMPLE_PATIENT, headers=admin_headers)
+    client.post('/predict', json=SAMPLE_PATIENT)
+
+    records = MedicalRecord.query.order_by(MedicalRecord.id).all()
+    assert records[0].user_id is not None
+    assert records[1].user_id is None
+    assert all(record.created_at is not None for record in records)
+
+
+def test_time_window_uses_index(app):
+    """The query /records/stats runs for a time window doesn't scan the whole table."""
+    query = stats_query('smoking_status', start=datetime(2024, 1, 1), end=datetime(2024, 2, 1))
+    compiled = query.compile(dialect=db.engine.dialect)
+    parameters = tuple(str(compiled.params[name]) for name in compiled.positiontup)
+    plan = db.session.connection().exec_driver_sql(f"EXPLAIN QUERY PLAN {compiled}", parameters).all()
+    assert any(row[-1].startswith('SEARCH medical_records USING INDEX ix_medical_records_created_at') for row in plan)
@@ -0,0 +1,73 @@
+import pytest
+from app.models import User
+from app.utils import db
+
+JANE = {"firstName": "Jane", "lastName": "Smith", "phoneNumber": "0712345678", "username": "janesmith",
+        "email": "jane@example.com", "password": "AnotherP@ssw0rd"}
+
+
+@pytest.mark.parametrize('changes, field', [
+    ({"email": "other@example.com", "phoneNumber": "0700000001"}, "username"),
+    ({"username": "other", "phoneNumber": "0700000001"}, "email"),
+    ({"username": "other", "email": "other@example.com"}, "phoneNumber"),
+])
+def test_register_reports_conflicting_field(client, changes, field):
+    """A taken username, email or phone number is rejected with 409 naming the field."""
+    assert client.post('/register', json=JANE).status_code == 201
+
+    response = client.post('/register', json={**JANE, **changes})
+    assert response.status_code == 409
+    assert response.json['field'] == field
+    assert User.query.count() == 1
+
+
+def test_register_needs_no_lookup(client, mocker):
+    """Registration inserts straight away, the unique constraints do the checking."""
+    spy = mocker.spy(db.session, 'execute')
+    assert client.post('/register', json=JANE).status_code == 201
+    assert not any('SELECT' in str(call.args[0]) for call in spy.call_args_list)
+
+
+def test_import_users(client, admin_headers):
+    """Users are imported in one request, conflicting or incomplete rows are reported and skipped."""
+    rows = [
+        {**JANE, "username": f"user{number}", "email": f"user{number}@example.com", "phoneNumber": f"07100000{number:02d}"}
+        for number in range(5)
+    ]
+    rows.append({**rows[0], "email": "again@example.com", "phoneNumber": "0799999999"})  # username of row 0
+    rows.append({**JANE, "username": "admin", "email": "new@example.com", "phoneNumber": "0788888888"})  # taken by the admin
+    rows.append({"username": "incomplete"})
+
+    response = client.post('/users/import', json=rows, headers=admin_headers)
+    assert response.status_code == 200
+    assert response.json['imported'] == 5
+    assert response.json['skipped'] == 3
+    assert [(error['row'], error.get('field')) for error in response.json['errors']] == [
+        (5, 'username'), (6, 'username'), (7, None)
+    ]
+
+    user = User.query.filter_by(username="user3").one()
+    assert user.password.startswith("scrypt:") and user.role == "user"
+    assert client.post('/login', json={"username": "user3", "password": JANE["password"]}).status_code == 200
+
+
+def test_import_users_requires_admin(client):
+    """Only admins can import users."""
+    response = client.post('/users/import', json=[JANE])
+    assert response.status_code in (401, 403)
+    assert User.query.count() == 0
+
+
+def test_import_users_reports_invalid_values(client, admin_headers):
+    """A password that isn't a string or an unknown role fails its row, not the import."""
+    rows = [
+        {**JANE, "password": 123},
+        {**JANE, "username": "boss", "email": "boss@example.com", "phoneNumber": "0700000009", "role": "superuser"},
+        {**JANE, "role": "manager"},
+    ]
+    response = client.post('/users/import', json=rows, headers=admin_headers)
+    assert response.status_code == 200
+    assert response.json['imported'] == 1
+    assert [(error['row'], error.get('field')) for error in response.json['errors']] == [(0, None), (1, 'role')]
+    assert "password" in response.json['errors'][0]['error']
+    assert User.query.filter_by(username="janesmith").one().role == "manager"
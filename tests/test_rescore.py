@@ -0,0 +1,91 @@
+import json
+from sqlalchemy import select, update
+from app.models import MedicalRecord
+from app.rescore import rescore_records
+from app.risk_rollups import check_rollups, rebuild_rollups
+from app.utils import db
+from tests.stroke_fixture import SAMPLE_PATIENT
+
+PATIENTS = [
+    dict(SAMPLE_PATIENT, age=20 + i, avg_glucose_level=80.0 + 7 * i, bmi=20.0 + i % 9,
+         smoking_status=["Never smoked", "Smokes", "Formerly smoked"][i % 3])
+    for i in range(30)
+]
+
+
+def stored_scores():
+    return {record.id: (record.stroke_risk, record.prediction) for record in db.session.execute(select(MedicalRecord)).scalars()}
+
+
+# Store predictions, then flip every stored result as if an older model had made them
+def seed_stale_records(client):
+    assert client.post('/predict/batch', json=PATIENTS).status_code == 200
+    expected = stored_scores()
+    for record_id, (stroke_risk, _) in expected.items():
+        flipped = "Low" if stroke_risk == "High" else "High"
+        db.session.execute(update(MedicalRecord).where(MedicalRecord.id == record_id).values(
+            stroke_risk=flipped, prediction="1" if flipped == "High" else "0"))
+    db.session.commit()
+    rebuild_rollups()
+    return expected
+
+
+def test_rescore_restores_scores_and_rollups(client):
+    """Rescoring writes the current model's results back and moves the rollups with them."""
+    expected = seed_stale_records(client)
+    summary = rescore_records(n_jobs=1, chunk_size=7)
+    assert summary['scored'] == 30
+    assert summary['changed'] == 30
+    assert summary['last_id'] == max(expected)
+    assert stored_scores() == expected
+
+    # The stale results were counted by the rollups, the rescore moved them to the right buckets
+    assert check_rollups() == []
+
+    # Nothing changes the second time
+    assert rescore_records(n_jobs=1, chunk_size=7)['changed'] == 0
+
+
+def test_rescore_in_worker_processes(client):
+    """Chunks scored in a process pool give the same results as scoring in process."""
+    expected = seed_stale_records(client)
+    summary = rescore_records(n_jobs=2, chunk_size=4)
+    assert summary['scored'] == 30
+    assert stored_scores() == expected
+    assert check_rollups() == []
+
+
+def test_rescore_resumes_and_skips_legacy_records(client, tmp_path):
+    """A run starting after a checkpointed id leaves earlier and legacy records alone."""
+    expected = seed_stale_records(client)
+    ids = sorted(expected)
+    db.session.execute(update(MedicalRecord).where(MedicalRecord.id == ids[-1]).values(heart_disease=None))
+    db.session.commit()
+
+    checkpoint = tmp_path / 'rescore.json'
+    summary = rescore_records(n_jobs=1, chunk_size=5, start_after=ids[9], checkpoint=str(checkpoint))
+    assert summary['scored'] == 19
+    assert json.loads(checkpoint.read_text()) == {'last_id': ids[-2], 'model_version': summary['model_version']}
+
+    scores = stored_scores()
+    assert all(scores[record_id] != expected[record_id] for record_id in ids[:10] + ids[-1:])
+    assert all(scores[record_id] == expected[record_id] for record_id in ids[10:-1])
+
+
+def test_rescore_command_uses_checkpoint(app, client, tmp_path):
+    """flask records rescore reports progress and resumes from its checkpoint."""
+    seed_stale_records(client)
+    checkpoint = str(tmp_path / 'rescore.json')
+    runner = app.test_cli_runner()
+
+    result = runner.invoke(args=['records', 'rescore', '--n-jobs', '1', '--chunk-size', '10', '--checkpoint', checkpoint])
+    assert result.exit_code == 0, result.output
+    assert 'rows/s' in result.output
+    assert 'Rescored 30 records' in result.output
+
+    result = runner.invoke(args=['records', 'rescore', '--n-jobs', '1', '--checkpoint', checkpoint])
+    assert 'Resuming after record' in result.output
+    assert 'Rescored 0 records' in result.output
+
+    result = runner.invoke(args=['records', 'rescore', '--n-jobs', '1', '--checkpoint', checkpoint, '--restart'])
+    assert 'Rescored 30 records' in result.output
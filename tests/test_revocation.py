@@ -0,0 +1,53 @@
+import time
+from app.models import User
+from app.utils import db
+from app.utils.local_store import LocalStore
+from app.utils.passwords import hash_password
+from app.utils.revocation import RevocationList
+
+
+def login(client):
+    db.session.add(User(first_name="Jane", last_name="Smith", email="jane@example.com", phone_number="0712345678",
+                        username="janesmith", password=hash_password("AnotherP@ssw0rd"), role="admin"))
+    db.session.commit()
+    response = client.post('/login', json={"username": "janesmith", "password": "AnotherP@ssw0rd"})
+    token = response.headers['Set-Cookie'].split('token=')[1].split(';')[0]
+    return {"Authorization": f"Bearer {token}"}
+
+
+def test_logout_revokes_the_token(app, client):
+    """A token passed to /logout is refused by protected routes afterwards."""
+    headers = login(client)
+    assert client.get('/dashboard', headers=headers).status_code == 200
+
+    assert client.get('/logout', headers=headers).status_code == 200
+    response = client.get('/dashboard', headers=headers)
+    assert response.status_code == 403
+    assert response.get_json() == {"error": "Token has been revoked"}
+    assert len(app.extensions['token_revocations']) == 1
+
+
+def test_revocations_expire_with_the_token():
+    """An entry is dropped once the token it revokes has expired on its own."""
+    revocations = RevocationList()
+    revocations.revoke('expired', 1.0)
+    assert not revocations.is_revoked('expired')
+    revocations.revoke('short', time.time() + 0.05)
+    revocations.revoke('long', time.time() + 3600)
+    assert revocations.is_revoked('short') and revocations.is_revoked('long')
+    time.sleep(0.06)
+    revocations.revoke('other', time.time() + 3600)
+    assert not revocations.is_revoked('short')
+    assert len(revocations) == 2
+
+
+def test_revocations_are_shared_through_the_local_store(tmp_path):
+    """A token revoked by one worker is refused by another after its next sync."""
+    path = str(tmp_path / "store.db")
+    worker_a = RevocationList(LocalStore(path), sync_interval=0)
+    worker_b = RevocationList(LocalStore(path), sync_interval=0)
+    assert not worker_b.is_revoked('abc')
+
+    worker_a.revoke('abc', time.time() + 3600)
+    assert worker_b.is_revoked('abc')
+    assert not worker_b.is_revoked('def')
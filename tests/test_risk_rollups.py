@@ -0,0 +1,67 @@
+from app.models import RiskRollup
+from app.risk_rollups import check_rollups, rebuild_rollups
+from app.utils import db
+from tests.stroke_fixture import SAMPLE_PATIENT
+
+PATIENTS = [
+    SAMPLE_PATIENT,
+    dict(SAMPLE_PATIENT, age=23, hypertension=0, heart_disease=0, avg_glucose_level=85.2, smoking_status="Never smoked"),
+    dict(SAMPLE_PATIENT, age=61, gender="Female", bmi=22.1),
+    dict(SAMPLE_PATIENT, age=64, bmi=30.0),
+]
+
+
+def test_predictions_update_rollups(client):
+    """Single and batch predictions keep the rollups in sync with the records."""
+    for patient in PATIENTS[:2]:
+        client.post('/predict', json=patient)
+    client.post('/predict/batch', json=PATIENTS[2:])
+
+    assert sum(bucket.count for bucket in RiskRollup.query.all()) == 4
+    male_sixties = [bucket for bucket in RiskRollup.query.filter_by(gender="Male", age_band=60).all()]
+    assert sum(bucket.count for bucket in male_sixties) == 2
+    assert sum(bucket.sum_bmi for bucket in male_sixties) == 66.6
+    assert check_rollups() == []
+
+
+def test_rebuild_matches_incremental(client):
+    """Rebuilding from the raw records gives the same buckets."""
+    client.post('/predict/batch', json=PATIENTS)
+    incremental = sorted((b.day, b.gender, b.age_band, b.smoking_status, b.stroke_risk, b.count) for b in RiskRollup.query.all())
+
+    assert rebuild_rollups() == len(incremental)
+    db.session.expire_all()
+    rebuilt = sorted((b.day, b.gender, b.age_band, b.smoking_status, b.stroke_risk, b.count) for b in RiskRollup.query.all())
+    assert rebuilt == incremental
+
+
+def test_check_and_rebuild_commands(app, client):
+    """flask records check-rollups finds drift that rebuild-rollups repairs."""
+    client.post('/predict/batch', json=PATIENTS)
+    RiskRollup.query.first().count += 5
+    db.session.commit()
+
+    runner = app.test_cli_runner()
+    result = runner.invoke(args=['records', 'check-rollups'])
+    assert result.exit_code != 0
+    assert "don't match" in result.output
+
+    assert runner.invoke(args=['records', 'rebuild-rollups']).exit_code == 0
+    assert runner.invoke(args=['records', 'check-rollups']).exit_code == 0
+
+
+def test_rollups_endpoint(client, admin_headers):
+    """GET /records/rollups answers dashboard queries from the buckets."""
+    client.post('/predict/batch', json=PATIENTS)
+
+    response = client.get('/records/rollups?group_by=age_band', headers=admin_headers)
+    assert response.status_code == 200
+    groups = {group['key']: group for group in response.json['groups']}
+    assert groups[60]['total'] == 3
+    assert groups[20]['avg_glucose_level'] == 85.2
+    assert response.json['total'] == 4
+
+    response = client.get('/records/rollups?group_by=gender&smoking_status=Never smoked', headers=admin_headers)
+    assert [(group['key'], group['total']) for group in response.json['groups']] == [("Male", 1)]
+
+    assert client.get('/records/rollups?group_by=email', headers=admin_headers).status_code == 400
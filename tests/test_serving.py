@@ -0,0 +1,108 @@
+import asyncio
+import importlib
+import json
+import os
+import sys
+import pytest
+from app import db
+from app.config import Config
+from app.prediction_executor import PredictionExecutor
+from app.stroke_model import get_model_registry, predict_stroke_risk
+from tests.stroke_fixture import SAMPLE_PATIENT
+
+
+def test_executor_matches_inline_scoring(app):
+    """Predictions scored in a worker process are the ones scored on the request thread."""
+    executor = PredictionExecutor(get_model_registry(), workers=1)
+    patients = [dict(SAMPLE_PATIENT, age=age, avg_glucose_level=70 + age * 3) for age in range(18, 90, 9)]
+    try:
+        results = [executor.predict(dict(patient), timeout=60) for patient in patients]
+    finally:
+        executor.shutdown()
+
+    get_model_registry().prediction_cache.clear()
+    assert results == [predict_stroke_risk(dict(patient)) for patient in patients]
+
+
+def test_worker_doesnt_load_another_model_version(app, mocker):
+    """A worker asked for a version the files on disk don't have refuses without loading them."""
+    from app.stroke_model import ModelVersionMismatch, worker_bundle
+    registry = get_model_registry()
+    load = mocker.patch('app.stroke_model.load_bundle')
+
+    for _ in range(3):
+        with pytest.raises(ModelVersionMismatch):
+            worker_bundle(registry.base_dir, registry.artifact_mode, 'oldversion00')
+    load.assert_not_called()
+
+
+def test_executor_scores_inline_when_files_changed(app, model_dir):
+    """When the model files changed after the app loaded them, the rows are scored with the app's model."""
+    executor = PredictionExecutor(get_model_registry(), workers=1)
+    get_model_registry().get()
+    for name in os.listdir(model_dir):
+        os.utime(os.path.join(model_dir, name), ns=(1, 1))
+    try:
+        result = executor.predict(dict(SAMPLE_PATIENT), timeout=60)
+    finally:
+        executor.shutdown()
+
+    get_model_registry().prediction_cache.clear()
+    assert result == predict_stroke_risk(dict(SAMPLE_PATIENT))
+    assert executor._stale_version == get_model_registry().get().version
+
+
+def test_predict_route_uses_executor(app, client, monkeypatch):
+    """With PREDICT_EXECUTOR_WORKERS set the predict view goes through the executor."""
+    calls = []
+
+    class RecordingExecutor:
+        def predict(self, data, timeout=None):
+            calls.append(timeout)
+            return predict_stroke_risk(data)
+
+    app.extensions['prediction_executor'] = RecordingExecutor()
+    response = client.post('/predict', json=SAMPLE_PATIENT)
+
+    assert response.status_code == 200
+    assert calls == [app.config['PREDICT_EXECUTOR_TIMEOUT']]
+
+
+def test_asgi_entry_point(model_dir, monkeypatch):
+    """asgi.application serves the Flask app to an ASGI server."""
+    pytest.importorskip('a2wsgi')
+    monkeypatch.setattr(Config, 'MODEL_BASE_PATH', model_dir)
+    monkeypatch.setattr(Config, 'SQLALCHEMY_DATABASE_URI', 'sqlite:///:memory:')
+    monkeypatch.delitem(sys.modules, 'asgi', raising=False)
+    asgi = importlib.import_module('asgi')
+    with asgi.app.app_context():
+        db.create_all()
+
+    async def call(method, path, body=b''):
+        scope = {
+            'type': 'http', 'asgi': {'version': '3.0'}, 'http_version': '1.1', 'method': method, 'scheme': 'http',
+            'path': path, 'raw_path': path.encode(), 'query_string': b'', 'root_path': '',
+            'headers': [(b'host', b'testserver'), (b'content-type', b'application/json'),
+                        (b'content-length', str(len(body)).encode())],
+            'client': ('127.0.0.1', 50000), 'server': ('testserver', 80),
+        }
+        messages = [{'type': 'http.request', 'body': body, 'more_body': False}]
+        sent = []
+
+        async def receive():
+            return messages.pop(0) if messages else {'type': 'http.disconnect'}
+
+        async def send(message):
+            sent.append(message)
+
+        await asgi.application(scope, receive, send)
+        status = next(message['status'] for message in sent if message['type'] == 'http.response.start')
+        return status, b''.join(message.get('body', b'') for message in sent if message['type'] == 'http.response.body')
+
+    try:
+        status, body = asyncio.run(call('POST', '/predict', json.dumps(SAMPLE_PATIENT).encode()))
+    finally:
+        monkeypatch.delitem(sys.modules, 'asgi', raising=False)
+
+    assert status == 200
+    assert json.loads(body)['stroke_risk'] in ('High', 'Low')
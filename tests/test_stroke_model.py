@@ -0,0 +1,137 @@
+import os
+import time
+import joblib
+import pytest
+from app import create_app
+from app.config import Config
+from app.stroke_model import get_model_registry, predict_stroke_risk, preprocess_input, CATEGORICAL_FEATURES
+from tests.stroke_fixture import write_stroke_model, synthetic_features, SAMPLE_PATIENT
+
+
+def test_model_loaded_at_startup(app):
+    """The model is loaded by create_app and not again for each prediction."""
+    registry = get_model_registry()
+    assert registry.loaded
+
+    bundle = registry.get()
+    with app.test_client() as client:
+        for _ in range(3):
+            response = client.post('/predict', json=SAMPLE_PATIENT)
+            assert response.status_code == 200
+            assert response.json['stroke_risk'] in ("High", "Low")
+    assert registry.get() is bundle
+
+
+def test_lazy_loading(model_dir, monkeypatch):
+    """With MODEL_LOAD_MODE=lazy the model is only loaded on first use."""
+    monkeypatch.setattr(Config, 'MODEL_BASE_PATH', model_dir)
+    monkeypatch.setattr(Config, 'MODEL_LOAD_MODE', 'lazy')
+    app = create_app()
+
+    with app.app_context():
+        registry = get_model_registry()
+        assert not registry.loaded
+        registry.get()
+        assert registry.loaded
+
+
+def test_hot_reload(app, model_dir):
+    """Replacing the model files swaps in a new model without a restart."""
+    registry = get_model_registry()
+    old_bundle = registry.get()
+
+    write_stroke_model(model_dir, seed=1, n_estimators=3)
+    # Make sure the modification time changes even on coarse filesystems
+    path = os.path.join(model_dir, 'stroke_prediction_model.pkl')
+    os.utime(path, ns=(time.time_ns(), time.time_ns() + 10**9))
+
+    app.config['MODEL_RELOAD_INTERVAL'] = 0.01
+    time.sleep(0.02)
+    registry.get()  # Detects the change and reloads in the background
+
+    deadline = time.time() + 5
+    while registry.get() is old_bundle and time.time() < deadline:
+        time.sleep(0.01)
+
+    new_bundle = registry.get()
+    assert new_bundle is not old_bundle
+    assert new_bundle.version != old_bundle.version
+    assert len(new_bundle.model.estimators_) == 3
+
+
+def test_broken_reload_keeps_old_model(app, model_dir):
+    """A model file that can't be loaded doesn't replace the working model."""
+    registry = get_model_registry()
+    old_bundle = registry.get()
+
+    with open(os.path.join(model_dir, 'stroke_prediction_model.pkl'), 'wb') as f:
+        f.write(b'not a pickle')
+
+    with pytest.raises(Exception):
+        registry.reload()
+    assert registry.get() is old_bundle
+    assert joblib.load(os.path.join(model_dir, 'gender_map.pkl')) == old_bundle.gender_map
+
+
+def pandas_path(data, bundle):
+    """Score a record with the original DataFrame based preprocessing."""
+    try:
+        processed_data = preprocess_input(data, *bundle.maps)
+    except ValueError as e:
+        return f"Preprocessing Error: {e}"
+    return int(bundle.model.predict(processed_data[bundle.feature_names])[0])
+
+
+def fast_path(data):
+    """Score a record with predict_stroke_risk (NumPy fast path)."""
+    try:
+        return predict_stroke_risk(data)['prediction']
+    except ValueError as e:
+        return str(e)
+
+
+def test_fast_path_matches_pandas_path(app):
+    """The NumPy fast path gives the same predictions and errors as preprocess_input."""
+    bundle = get_model_registry().get()
+    decode = {
+        feature: {value: key for key, value in getattr(bundle, attribute).items()}
+        for feature, attribute in CATEGORICAL_FEATURES.items()
+    }
+
+    records = []
+    for row in synthetic_features(300, seed=7).to_dict('records'):
+        records.append({
+            feature: decode[feature][value] if feature in decode else value
+            for feature, value in row.items()
+        })
+    records += [
+        {key: value for key, value in SAMPLE_PATIENT.items() if key not in ('bmi', 'gender')},
+        dict(SAMPLE_PATIENT, gender="Robot", work_type="Astronaut"),
+        dict(SAMPLE_PATIENT, smoking_status=None),
+        dict(SAMPLE_PATIENT, bmi=None),
+        dict(SAMPLE_PATIENT, avg_glucose_level=float('nan')),
+        dict(SAMPLE_PATIENT, age="67", hypertension=True),
+    ]
+
+    for record in records:
+        assert fast_path(record) == pandas_path(record, bundle)
+
+
+def test_feature_name_warning_is_only_silenced_for_the_model(app):
+    """The fast path doesn't warn about missing feature names, and doesn't silence that warning for anything else."""
+    import warnings
+    with warnings.catch_warnings(record=True) as caught:
+        warnings.simplefilter("always")
+        predict_stroke_risk(dict(SAMPLE_PATIENT, age=52))
+        assert not [warning for warning in caught if "feature names" in str(warning.message)]
+
+        warnings.warn("X does not have valid feature names, but Estimator was fitted with feature names", UserWarning)
+        assert [warning for warning in caught if "feature names" in str(warning.message)]
+
+
+def test_fast_path_model_has_no_feature_names(app):
+    """The fast path scores a copy without feature names, the model itself keeps them for the pandas paths."""
+    bundle = get_model_registry().get()
+    assert hasattr(bundle.model, 'feature_names_in_')
+    assert not hasattr(bundle.array_model, 'feature_names_in_')
+    assert bundle.feature_names == list(bundle.model.feature_names_in_)
@@ -71,3 +71,99 @@ def test_delete_user_not_found(test_client, mocker):
     response = test_client.delete('/users/999')
     assert response.status_code == 404
     assert response.json['error'] == "User not found"
+
+
+@pytest.fixture
+def seeded_users(app):
+    """Fixture that stores a handful of users with different roles."""
+    users = [
+        User(first_name=f"First{i}", last_name=f"Last{i}", username=f"user{i}", email=f"user{i}@example.com",
+             phone_number=f"07000000{i:02d}", password="hashedpassword", role="admin" if i % 3 == 0 else "user")
+        for i in range(7)
+    ]
+    db.session.add_all(users)
+    db.session.commit()
+    return users
+
+
+def test_all_users_keyset_pagination(client, seeded_users):
+    """GET /users?limit=... pages through the users with after_id."""
+    seen = []
+    after_id = 0
+    while after_id is not None:
+        response = client.get(f'/users?limit=3&after_id={after_id}')
+        assert response.status_code == 200
+        seen += [user['username'] for user in response.json['users']]
+        after_id = response.json['next_after_id']
+    assert seen == [user.username for user in seeded_users]
+
+
+def test_all_users_role_filter_and_fields(client, seeded_users):
+    """Users can be filtered by role and only the requested fields are returned."""
+    response = client.get('/users?role=admin&fields=id,username')
+    assert response.status_code == 200
+    assert response.json == [{'id': user.id, 'username': user.username} for user in seeded_users if user.role == "admin"]
+
+
+def test_all_users_never_returns_password(client, seeded_users):
+    """The password hash can't be requested."""
+    assert 'password' not in client.get('/users').json[0]
+    assert client.get('/users?fields=username,password').status_code == 400
+
+
+def test_all_users_ndjson_stream(client, seeded_users):
+    """format=ndjson streams one user per line."""
+    response = client.get('/users?format=ndjson&fields=username')
+    assert response.status_code == 200
+    assert response.mimetype == 'application/x-ndjson'
+    lines = response.get_data(as_text=True).splitlines()
+    assert [json.loads(line) for line in lines] == [{'username': user.username} for user in seeded_users]
+
+
+def test_all_users_invalid_limit(client):
+    """Out of range or non numeric paging arguments are rejected."""
+    assert client.get('/users?limit=0').status_code == 400
+    assert client.get('/users?limit=abc').status_code == 400
+    assert client.get('/users?after_id=abc').status_code == 400
+
+
+def test_all_users_unchanged_poll_gets_304(app, client, seeded_users):
+    """A poll with the current ETag gets a 304 without listing the users, a change gives a new ETag."""
+    from app.utils.metrics import DB_QUERY_SECONDS
+
+    response = client.get('/users')
+    etag = response.headers['ETag']
+    listed = DB_QUERY_SECONDS.count(operation='list_users')
+
+    response = client.get('/users', headers={'If-None-Match': etag})
+    assert response.status_code == 304
+    assert response.get_data() == b''
+    assert client.get('/users').json[0]['username'] == 'user0'
+    assert DB_QUERY_SECONDS.count(operation='list_users') == listed  # served from the payload cache
+
+    assert client.put(f'/users/{seeded_users[1].id}', json={'role': 'admin'}).status_code == 200
+    response = client.get('/users', headers={'If-None-Match': etag})
+    assert response.status_code == 200
+    assert response.headers['ETag'] != etag
+    assert response.json[1]['role'] == 'admin'
+
+
+def test_all_users_large_responses_are_gzipped(app, client, seeded_users):
+    """Clients accepting gzip get a compressed body above COMPRESS_MIN_BYTES, with its own ETag."""
+    import gzip
+    app.config['COMPRESS_MIN_BYTES'] = 100
+
+    plain = client.get('/users')
+    assert 'Content-Encoding' not in plain.headers
+
+    response = client.get('/users', headers={'Accept-Encoding': 'gzip'})
+    assert response.headers['Content-Encoding'] == 'gzip'
+    assert response.headers['Vary'] == 'Accept-Encoding'
+    assert gzip.decompress(response.get_data()) == plain.get_data()
+    assert response.headers['ETag'] != plain.headers['ETag']
+
+    response = client.get('/users', headers={'Accept-Encoding': 'gzip', 'If-None-Match': response.headers['ETag']})
+    assert response.status_code == 304
+
+    app.config['COMPRESS_MIN_BYTES'] = 100000
+    assert 'Content-Encoding' not in client.get('/users?limit=2', headers={'Accept-Encoding': 'gzip'}).headers